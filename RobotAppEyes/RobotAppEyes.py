@@ -16,19 +16,40 @@
 #  limitations under the License.
 
 import os
+import time
+import json
+import atexit
+import threading
+import contextlib
 import httplib
-import base64
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import InvalidElementStateException
-from robot.libraries.BuiltIn import BuiltIn
-from applitools import logger
-from applitools.logger import StdoutLogger
 from applitools.geometry import Region
-from applitools.eyes import Eyes, BatchInfo
-from applitools.utils import _image_utils
-from applitools._webdriver import EyesScreenshot
+from applitools.errors import EyesError, TestFailedError
+from checkqueue import CheckQueue
+from imagebatch import ImageBatch, ImageResult, find_images
+import fullpage
+from imagesource import PngFile, create_match_data, retag_match_data
+from eyeslog import EyesLog, ROBOT, install as install_eyes_log
+from duplicates import DuplicateFilter, REUSE, RECORD
+from payload import PayloadReducer
+from screenshotcache import ScreenshotCache, image_digest
+from sessions import EyesSession, HeldStep, SessionRegistry
+from localcompare import LocalAgentConnector
+from spool import SpoolAgentConnector
+from transport import HttpPool, PooledAgentConnector
+from locators import REGIONS_SCRIPT, STRATEGIES, ElementRect, LocatorCache, parse_locator, selector_name
+from stability import frame_signature, changed_area, wait_for_stable_frames
+from viewports import ViewportCheck, parse_sizes, size_name, viewport_batch, NEW, UNRESOLVED
+from timing import NULL_RECORDER, TimingRecorder, phase, LOCATE, DECODE, HASH, ENCODE, WAIT
 from version import VERSION
 
+# Selenium, the Eyes SDK (with requests) and Robot Framework's BuiltIn library are imported by the keywords
+# that use them, so importing the library stays cheap for the many processes of a parallel run.
+
+
+def _builtin():
+    from robot.libraries.BuiltIn import BuiltIn
+    return BuiltIn()
+
 _version_ = VERSION
 
 
@@ -73,6 +94,23 @@ class RobotAppEyes:
     ROBOT_LIBRARY_SCOPE = 'GLOBAL'
     ROBOT_LIBRARY_VERSION = VERSION
 
+    # The threads closing the sessions passed to Close Eyes Session with deferred=True, and how many closes may be
+    # pending before Close Eyes Session blocks.
+    _CLOSE_WORKERS = 8
+    _MAX_PENDING_CLOSES = 64
+    # The selectors supported by Check Eyes Region By Element; Check Eyes Region By Selector supports every selector.
+    _ELEMENT_SELECTORS = ('XPATH', 'ID', 'CLASS NAME', 'CSS SELECTOR')
+    # The most steps a session holds back, see HeldStep; the oldest is sent beyond it.
+    _MAX_HELD_STEPS = 32
+
+    def __init__(self):
+        self._sessions = SessionRegistry()
+        self._closer = None
+        self._deferred_closes = []
+        self._http_pools = {}
+        self._http_pools_lock = threading.Lock()
+        self._eyes_log = None
+
     def open_eyes_session(self,
                           appname,
                           testname,
@@ -87,7 +125,39 @@ class RobotAppEyes:
                           baselineName=None,
                           batchName=None,
                           branchname=None,
-                          parentbranch=None):
+                          parentbranch=None,
+                          asyncChecks=False,
+                          asyncWorkers=4,
+                          asyncMaxPending=16,
+                          asyncMaxPendingMB=256,
+                          screenshotCache=None,
+                          screenshotCacheMaxEntries=10000,
+                          screenshotCacheMaxAgeDays=7,
+                          alias=None,
+                          localBaseline=None,
+                          localCompareMode='exact',
+                          localTolerance=0,
+                          serverUrl=None,
+                          timing=False,
+                          timingExport=None,
+                          recordDirectory=None,
+                          payloadReduction=False,
+                          payloadCrop=False,
+                          payloadPalette=True,
+                          payloadCompression=9,
+                          payloadWorkers=4,
+                          locatorCache=False,
+                          duplicatePolicy=None,
+                          duplicateScope='tag',
+                          duplicateHistory=8,
+                          httpPool=False,
+                          httpMaxConnections=8,
+                          httpMaxRetries=3,
+                          httpTimeout=300,
+                          eyesLog=None,
+                          eyesLogLevel='DEBUG',
+                          eyesLogSampling=1.0,
+                          eyesLogBuffer=10000):
         """
         Starts a session with the Applitools Eyes Website.
 
@@ -104,9 +174,45 @@ class RobotAppEyes:
                 |  HTTP Debug Log (default=False)       | The HTTP Debug logs will not be included by default. To activate, pass 'True' in the variable.              |
                 |  Branch Name (default=False)          | The branch to use to check test                                                                             |
                 |  Parent Branch (default=False)        | Parent Branch to base the new Branch on                                                                     |
+                |  Async Checks (default=False)         | Check keywords capture the screenshot and return at once, the upload and match run in the background.       |
+                |  Async Workers (default=4)            | The number of worker threads that encode and upload screenshots when Async Checks is on.                    |
+                |  Async Max Pending (default=16)       | The maximum number of checks waiting to be matched before a check keyword blocks.                           |
+                |  Async Max Pending MB (default=256)   | The maximum size, in megabytes, of screenshots waiting to be matched before a check keyword blocks.         |
+                |  Screenshot Cache (default=None)      | A directory in which to remember the checks that passed, so identical screenshots are not uploaded again.   |
+                |  Screenshot Cache Max Entries         | The number of checks the screenshot cache remembers, the least recently used are evicted (default=10000).   |
+                |  Screenshot Cache Max Age Days        | The number of days a check is remembered by the screenshot cache (default=7).                               |
+                |  Alias (default=None)                 | A name for the session, which can be passed to Switch Eyes Session.                                         |
+                |  Local Baseline (default=None)        | A directory of baseline screenshots to match against instead of the Eyes server. Needs NumPy.               |
+                |  Local Compare Mode (default=exact)   | How the local baseline is matched - can be exact, tolerance or antialias.                                   |
+                |  Local Tolerance (default=0)          | The difference allowed in each colour channel by the tolerance and antialias modes, from 0 to 255.          |
+                |  Server URL (default=None)            | The URL of the Eyes server, for a private cloud or on-premise server. Defaults to the Eyes public cloud.    |
+                |  Timing (default=False)               | Logs the time spent in each phase of every check keyword, and their totals when the session is closed.      |
+                |  Timing Export (default=None)         | A file to export the timings to when the session is closed: JSON lines, or a Prometheus textfile (.prom).   |
+                |  Record Directory (default=None)      | A spool directory to record the checks to instead of sending them to Eyes, see robotappeyes-upload.         |
+                |  Payload Reduction (default=False)    | Re-encodes every screenshot to a smaller PNG before it is uploaded, and logs the bytes saved by each check. |
+                |  Payload Crop (default=False)         | With Payload Reduction, crops the screenshots to their content, see below.                                  |
+                |  Payload Palette (default=True)       | With Payload Reduction, writes screenshots of at most 256 colours as palette images.                        |
+                |  Payload Compression (default=9)      | With Payload Reduction, the zlib compression level of the screenshots, from 1 to 9.                         |
+                |  Payload Workers (default=4)          | With Payload Reduction, the number of threads compressing each large screenshot.                            |
+                |  Locator Cache (default=False)        | Finds the elements of the region keywords with one script, caching their rectangles until the page changes. |
+                |  Duplicate Policy (default=None)      | What to do with a check whose screenshot repeats a recent one - can be skip, reuse or record, see below.     |
+                |  Duplicate Scope (default=tag)        | With a Duplicate Policy, whether only repeats of the same tag count - tag, or any repeat - session.          |
+                |  Duplicate History (default=8)        | With a Duplicate Policy, the number of recent checks the session remembers.                                 |
+                |  HTTP Pool (default=False)            | Sends the requests to Eyes over kept-alive connections shared by the sessions, retrying transient failures. |
+                |  HTTP Max Connections (default=8)     | With HTTP Pool, the most requests sent to Eyes at a time by all the sessions using the same pool settings.  |
+                |  HTTP Max Retries (default=3)         | With HTTP Pool, the number of times a request is sent again after a transient failure.                      |
+                |  HTTP Timeout (default=300)           | With HTTP Pool, the seconds to wait for the answer to a request.                                            |
+                |  Eyes Log (default=None)              | Where to write the Eyes log - robot, stdout or a file (a .jsonl file gets JSON lines), see below.           |
+                |  Eyes Log Level (default=DEBUG)       | With an Eyes Log, the lowest level of the records written - DEBUG or INFO.                                  |
+                |  Eyes Log Sampling (default=1.0)      | With an Eyes Log, the share of checks whose records are written, from 0 to 1.                               |
+                |  Eyes Log Buffer (default=10000)      | With an Eyes Log, the number of records kept until they are written, the oldest are dropped beyond it.      |
 
         Creates an instance of the Selenium2Library webdriver.
-        Defines a global driver and sets the Selenium2Library webdriver to the global driver.
+        The session is created for the current Selenium2Library browser and becomes the current Eyes session,
+        the check keywords and Close Eyes Session act on the current session. Returns the index of the session.
+
+        Several sessions can be open at the same time, for example one per browser. Use Switch Eyes Session to
+        change the current session. Each thread has its own current session, so threads can each run a session.
 
         Checks if there has been a width or height value passed in.
         If there no are values passed in, eyes calls the method open without the width and height values.
@@ -114,6 +220,107 @@ class RobotAppEyes:
 
         The Height resolution should not be greater than 1000, this is currently Applitools maximum setting.
 
+        When Async Checks is on, every check keyword is matched once, without the retry window Eyes normally
+        applies, and a mismatch is only reported when Close Eyes Session waits for the pending checks.
+        Screenshots are still sent to Eyes in the order they were taken.
+
+        With a Screenshot Cache, Payload Reduction or a Duplicate Policy, the check keywords capture the screenshot
+        themselves. Without Async Checks, a check that does not match is still retried as Eyes retries it: a new
+        screenshot is matched every half second until the match timeout of Eyes runs out.
+
+        When a Screenshot Cache directory is given, each check is keyed by a hash of its pixels together with the
+        application name, test name, tag, viewport size and match level. A check whose key passed the last time it
+        was sent to Eyes is answered from the cache. Eyes pairs the steps of a test with the steps of its baseline by
+        their position, so a check answered from the cache is held back and is still uploaded and matched when a
+        later check of the session is: only the checks answered from the cache at the end of the session are not
+        uploaded. A cache hit in the middle of a session therefore does not save its upload; a session whose checks
+        all hit the cache, or whose last checks do, uploads none of them. Eyes reports the checks that were not
+        uploaded as missing, Close Eyes Session does not count them as failures. The cache hits and misses, and the
+        number of checks that were not uploaded, are logged.
+
+        When a Local Baseline directory is given, screenshots are matched on this machine and nothing is sent to
+        Eyes, so the API key is not used. The baseline of each test is kept in <app>/<test>/<viewport size> (or
+        the baseline name instead of the viewport size) and is created by the first run. The screenshots and diff
+        masks of the steps that did not match are written to its 'results' directory, and their mismatch
+        percentages are logged by Close Eyes Session. The antialias mode ignores the pixels on edges whose colour
+        lies between the colours of their neighbours, which is how anti-aliasing usually differs between runs.
+
+        When Timing is on, each check keyword and Compare Image logs the seconds spent in each phase as JSON:
+        locate (finding the element), session (starting the Eyes session, on the first check), capture (taking
+        the screenshot in the browser), decode (decoding and stitching the screenshot), hash (for the screenshot
+        cache), encode (reducing the payload and building the match request), upload and match (the request to
+        Eyes), wait (for the worker threads of Check Eyes Regions) and other.
+        The phases of asynchronous checks finish after the keyword returns, they are included in the totals
+        logged by Close Eyes Session and in the export. A JSON lines export gets one line per check appended,
+        a Prometheus textfile gets the totals of the session, replacing those of earlier runs of the same test.
+        Use Invalidate Eyes Screenshot Cache after accepting new baselines.
+
+        When a Record Directory is given, the checks are not sent to Eyes during the test: each session is written
+        to its own directory in the spool directory, with the match request of every check and the application,
+        test, batch, branch and viewport of the session, and every check passes. Upload the spool directory
+        afterwards, from any machine, with ``robotappeyes-upload <directory>`` (or ``python -m RobotAppEyes.spool``),
+        which sends several sessions at a time, writes the result of each session next to it and exits with 1 when
+        a session did not match. Running it again uploads the sessions whose upload failed.
+        Record Directory can not be combined with Local Baseline.
+
+        When Payload Reduction is on, the check keywords, Compare Image and Compare Images In Directory re-encode the
+        screenshot before it is sent: an alpha channel that is opaque everywhere is dropped, an image of at most 256
+        colours becomes a palette image, and the rows are filtered and compressed at the Payload Compression level,
+        large images in pieces compressed on several threads. The pixels are not changed. An image file is sent as it
+        was when the result is not smaller; a screenshot of the browser is always sent reduced, since measuring the PNG
+        Eyes would send means encoding it once more, and only the size sent is logged for it. The pixels are looked at
+        with NumPy when it is installed; without it, screenshots of more than a million pixels are sent as they were.
+        With Payload Crop the rows and columns around the content that have
+        the colour of the top left pixel are removed as well, so Eyes only compares the content; baselines taken
+        without cropping will not match. The size sent for each check is logged, and the total by Close Eyes Session.
+
+        When Locator Cache is on, Check Eyes Region, Check Eyes Region By Element, Check Eyes Region By Selector and
+        Check Eyes Regions find their elements and rectangles with one script run in the browser, instead of a request
+        to find each element and more to get its location and size, and keep the rectangles until the page changes.
+        The browser counts the changes to the page that can move an element: DOM mutations, resizing, scrolling, loaded
+        images and finished animations. Each check asks for the count along with the rectangles it does not have, and
+        every rectangle is found again once it changed. A check whose rectangles are all cached still runs the script,
+        to read the count: the cache saves the requests to find the elements, not that round trip to the browser. Use
+        Mark Eyes Locators Dirty after a change the browser does not report. An element the script does not find is
+        looked for by Selenium, which reports the error. The hit rate of the cache is logged by Close Eyes Session.
+
+        When a Duplicate Policy is given, the session remembers the hash of the screenshots of its last Duplicate
+        History checks, and the Eyes results of those checks, so a check whose screenshot is identical to one of them
+        is not uploaded again. With the tag scope only a repeat with the same tag counts, with the session scope any
+        repeat does. With record, the step is sent to Eyes under its own tag, with the screenshot already encoded for
+        the check it repeats. With skip, the check is held back like a screenshot cache hit: Eyes pairs the steps with
+        the baseline by their position, so its step is sent the same way when a later check is sent, and only the
+        repeats at the end of the session are not sent. With reuse, it is held back as well and gets the result of the
+        check it repeats: a repeat of a check that did not match is logged as a warning, and is reported as a mismatch
+        by Check Eyes Regions and by the asynchronous checks. Eyes reports the steps that were not sent as missing,
+        Close Eyes Session does not count them as failures and logs the number of checks skipped, reused and recorded.
+
+        When HTTP Pool is on, the requests of the session are sent through a connection pool that the library keeps
+        for the sessions opened with the same HTTP settings, so the connections to Eyes, and their TLS handshakes,
+        are reused by the following checks and sessions. At most HTTP Max Connections requests are sent at a time,
+        the other checks wait for a free connection. A request that could not connect or was answered with 503 is
+        sent again, up to HTTP Max Retries times, after waiting a random time up to a delay that doubles with each
+        retry, or the time asked for by the server. The request closing a session is also sent again when it timed
+        out or was answered with 502 or 504, the matches and session starts are not, as Eyes may have handled them.
+        Close Eyes Session logs the number of requests of each kind, their retries and failures, and their median,
+        95th percentile and longest times. The connections are closed by Wait For Eyes Sessions To Close and when
+        Robot Framework exits. HTTP Pool is not used with a Local Baseline or a Record Directory, which send nothing
+        to Eyes.
+
+        When an Eyes Log is given, the log of the Eyes SDK is configured once, for this session and the keywords that
+        follow, instead of by each keyword given Include Eyes Log. It stays configured until every session is closed,
+        then the Eyes SDK gets back the logger it had. The records are kept in a buffer as they are logged and written
+        by a background thread to stdout or to the file, which is appended to, so logging does not slow the test down.
+        Robot Framework only takes messages from the thread of the test, so the records meant for the Robot log are
+        logged at the end of each keyword; the records of asynchronous checks and deferred closes are logged by the
+        keywords that follow them, Close Eyes Session and Wait For Eyes Sessions To Close. Each check keyword gets a
+        correlation ID, which every record logged for the check carries, including the records of asynchronous checks
+        logged by the worker threads; the first record of a check names its keyword and tag. With sampling below 1
+        only the records of that share of the checks are written, the records logged outside the checks always are.
+        The number of records dropped because the buffer was full is logged as a warning. The Eyes SDK has one log for
+        all the sessions, an Eyes Log given to a later session replaces it. Include Eyes Log sends the Eyes log to the
+        Robot log when no Eyes Log was given.
+
         Starts a session with the Applitools Eyes Website. See https://eyes.applitools.com/app/sessions/
 
         Example:
@@ -125,17 +332,29 @@ class RobotAppEyes:
         | Close Eyes Session |  False                   |                   |                            |                     |        |       |                  |                       |                      |                       |                     |
 
         """
-        global driver
-        global eyes
+        if localBaseline is not None and recordDirectory is not None:
+            raise EyesError('Local Baseline and Record Directory can not be used together.')
+        from applitools.eyes import Eyes, BatchInfo
         eyes = Eyes()
+        if localBaseline is not None:
+            eyes._agent_connector = LocalAgentConnector(localBaseline, localCompareMode, int(localTolerance))
+        if serverUrl is not None:
+            eyes.server_url = serverUrl
+        if httpPool is True and localBaseline is None and recordDirectory is None:
+            eyes._agent_connector = PooledAgentConnector(
+                self._http_pool(int(httpMaxConnections), int(httpMaxRetries), float(httpTimeout)), eyes.server_url)
+        if recordDirectory is not None:
+            connector = SpoolAgentConnector(recordDirectory)
+            connector.server_url = eyes.server_url
+            connector.save_new_tests, connector.save_failed_tests = eyes.save_new_tests, eyes.save_failed_tests
+            eyes._agent_connector = connector
         eyes.api_key = apikey
-        s2l = BuiltIn().get_library_instance('Selenium2Library')
-        webdriver = s2l._current_browser()
-        driver = webdriver
+        driver = self._current_browser()
 
-        if includeEyesLog is True:
-            logger.set_logger(StdoutLogger())
-            logger.open_()
+        if eyesLog is not None:
+            self._install_eyes_log(EyesLog(eyesLog, eyesLogLevel, float(eyesLogSampling), int(eyesLogBuffer)))
+        elif includeEyesLog is True:
+            self._include_eyes_log()
         if httpDebugLog is True:
             httplib.HTTPConnection.debuglevel = 1
         if osname is not None:
@@ -159,10 +378,35 @@ class RobotAppEyes:
             intwidth = int(width)
             intheight = int(height)
             eyes.open(driver, appname, testname, {'width': intwidth, 'height': intheight})
-
+        fullpage.install(eyes)
+        check_queue = None
+        if asyncChecks is True:
+            check_queue = CheckQueue(int(asyncWorkers), int(asyncMaxPending),
+                                     int(asyncMaxPendingMB) * 1024 * 1024)
+        screenshot_cache = None
+        if screenshotCache is not None:
+            screenshot_cache = ScreenshotCache(screenshotCache, int(screenshotCacheMaxEntries),
+                                               float(screenshotCacheMaxAgeDays))
+            screenshot_cache.evict()
+        recorder = NULL_RECORDER
+        if timing is True or timingExport is not None:
+            recorder = TimingRecorder(appname, testname, self._log_check_timing, timingExport)
+            recorder.instrument(eyes)
+        payload = None
+        if payloadReduction is True:
+            payload = PayloadReducer(payloadCrop is True, payloadPalette is True, int(payloadCompression),
+                                     int(payloadWorkers))
+        locators = LocatorCache() if locatorCache is True else None
+        duplicates = None
+        if duplicatePolicy is not None:
+            duplicates = DuplicateFilter(duplicatePolicy, duplicateScope, int(duplicateHistory))
+        index = self._sessions.register(EyesSession(eyes, driver, check_queue, screenshot_cache, recorder, payload,
+                                                    locators, duplicates), alias)
+        self._log_eyes_log()
+        return index
 
     def check_eyes_window(self, name, force_full_page_screenshot=False,
-                          includeEyesLog=False, httpDebugLog=False):
+                          includeEyesLog=False, httpDebugLog=False, segmentHeight=None):
         """
         Takes a snapshot from the browser using the web driver and matches it with
         the expected output.
@@ -172,6 +416,14 @@ class RobotAppEyes:
                 |  Force Full Page Screenshot (default=False)   | Will force the browser to take a screenshot of whole page.                                      |
                 |  Include Eyes Log (default=False)             | The Eyes logs will not be included by default. To activate, pass 'True' in the variable.        |
                 |  HTTP Debug Log (default=False)               | The HTTP Debug logs will not be included by default. To activate, pass 'True' in the variable.  |
+                |  Segment Height (default=None)                | With a full page screenshot, checks a page taller than this many pixels in several segments.    |
+
+        Full page screenshots are stitched into a single buffer the size of the page, allocated once the height of the
+        page is known: each scrolled screenshot is decoded a row at a time straight into its place and dropped, so the
+        memory needed is about the size of the final image. With a Segment Height, each segment of the page is stitched,
+        matched and dropped before the next one is scrolled to, as a check named after the window with its number,
+        e.g. 'NaviNet Home (2/5)', which bounds the memory needed for very tall pages to one segment. A segment answered
+        by the Screenshot Cache or the Duplicate Policy of the session is sent to Eyes at once rather than held back.
 
         Example:
 
@@ -183,13 +435,20 @@ class RobotAppEyes:
 
         """
         if includeEyesLog is True:
-            logger.set_logger(StdoutLogger())
-            logger.open_()
+            self._include_eyes_log()
         if httpDebugLog is True:
             httplib.HTTPConnection.debuglevel = 1
 
-        eyes.force_full_page_screenshot = force_full_page_screenshot
-        eyes.check_window(name)
+        session = self._sessions.current
+        with self._check(session, 'Check Eyes Window', name):
+            if force_full_page_screenshot and segmentHeight is not None:
+                self._check_segments(session, name, int(segmentHeight))
+                return
+            if session.captures_checks():
+                self._check_captured(session, name, lambda task: task._get_screenshot(force_full_page_screenshot))
+                return
+            session.eyes.force_full_page_screenshot = force_full_page_screenshot
+            session.eyes.check_window(name)
 
     def check_eyes_region(self, element, width, height, name, includeEyesLog=False, httpDebugLog=False):
         """
@@ -213,18 +472,21 @@ class RobotAppEyes:
         | Close Eyes Session |  False                       |                   |                             |                    |        |       |
         """
         if includeEyesLog is True:
-            logger.set_logger(StdoutLogger())
-            logger.open_()
+            self._include_eyes_log()
         if httpDebugLog is True:
             httplib.HTTPConnection.debuglevel = 1
 
         intwidth = int(width)
         intheight = int(height)
 
-        searchElement = driver.find_element_by_xpath(element)
-        location = searchElement.location
-        region = Region(location["x"], location["y"], intwidth, intheight)
-        eyes.check_region(region, name)
+        session = self._sessions.current
+        with self._check(session, 'Check Eyes Region', name):
+            location = self._locate(session, 'XPATH', element).location
+            region = Region(location["x"], location["y"], intwidth, intheight)
+            if session.captures_checks():
+                self._check_captured(session, name, lambda task: task._get_screenshot(False).get_sub_screenshot_by_region(region))
+                return
+            session.eyes.check_region(region, name)
 
     def check_eyes_region_by_element(self, selector, value, name, includeEyesLog=False, httpDebugLog=False):
         """
@@ -247,24 +509,19 @@ class RobotAppEyes:
 
         """
         if includeEyesLog is True:
-            logger.set_logger(StdoutLogger())
-            logger.open_()
+            self._include_eyes_log()
         if httpDebugLog is True:
             httplib.HTTPConnection.debuglevel = 1
 
-        searchElement = None
+        selector = selector_name(selector, self._ELEMENT_SELECTORS)
+        session = self._sessions.current
 
-        if selector.upper() == 'XPATH':
-            searchElement = driver.find_element_by_xpath(value)
-        elif selector.upper() == 'ID':
-            searchElement = driver.find_element_by_id(value)
-        elif selector.upper() == 'CLASS NAME':
-            searchElement = driver.find_element_by_class_name(value)
-        elif selector.upper() == 'CSS SELECTOR':
-            searchElement = driver.find_element_by_css_selector(value)
-        else:
-            raise InvalidElementStateException('Please select a valid selector: XPATH, ID, CLASS NAME, CSS SELECTOR')
-        eyes.check_region_by_element(searchElement, name)
+        with self._check(session, 'Check Eyes Region By Element', name):
+            searchElement = self._locate(session, selector, value)
+            if session.captures_checks():
+                self._check_captured(session, name, lambda task: task._get_screenshot(False).get_sub_screenshot_by_element(searchElement))
+                return
+            session.eyes.check_region_by_element(searchElement, name)
 
     def check_eyes_region_by_selector(self, selector, value, name, includeEyesLog=False, httpDebugLog=False):
         """
@@ -287,37 +544,233 @@ class RobotAppEyes:
 
         """
         if includeEyesLog is True:
-            logger.set_logger(StdoutLogger())
-            logger.open_()
+            self._include_eyes_log()
         if httpDebugLog is True:
             httplib.HTTPConnection.debuglevel = 1
 
-        searchElement = None
-
-        if selector.upper() == 'CSS SELECTOR':
-            searchElement = By.CSS_SELECTOR
-        elif selector.upper() == 'XPATH':
-            searchElement = By.XPATH
-        elif selector.upper() == 'ID':
-            searchElement = By.ID
-        elif selector.upper() == 'LINK TEXT':
-            searchElement = By.LINK_TEXT
-        elif selector.upper() == 'PARTIAL LINK TEXT':
-            searchElement = By.PARTIAL_LINK_TEXT
-        elif selector.upper() == 'NAME':
-            searchElement = By.NAME
-        elif selector.upper() == 'TAG NAME':
-            searchElement = By.TAG_NAME
-        elif selector.upper() == 'CLASS NAME':
-            searchElement = By.CLASS_NAME
-        else:
-            raise InvalidElementStateException('Please select a valid selector: CSS SELECTOR, XPATH, ID, LINK TEXT, PARTIAL LINK TEXT, NAME, TAG NAME, CLASS NAME')
+        selector = selector_name(selector)
+        session = self._sessions.current
+
+        with self._check(session, 'Check Eyes Region By Selector', name):
+            if session.captures_checks() or session.locators is not None:
+                element = self._locate(session, selector, value, session.eyes._driver)
+                if session.captures_checks():
+                    self._check_captured(session, name, lambda task: task._get_screenshot(False).get_sub_screenshot_by_element(element))
+                    return
+                session.eyes.check_region_by_element(element, name)
+                return
+            session.eyes.check_region_by_selector(STRATEGIES[selector][0], value, name)
+
+    def check_eyes_regions(self, locators, names=None, force_full_page_screenshot=False, threads=4,
+                           includeEyesLog=False, httpDebugLog=False):
+        """
+        Takes one snapshot of the page and matches the region of each locator in it with the expected output.
+        Returns the list of names of the regions that did not match.
+
+        The rectangles of all the elements are found with a single script run in the browser, the regions are
+        cropped from the one screenshot and sent to Eyes by a pool of worker threads, in the order of the locators.
+        This is much faster than a Check Eyes Region By Selector for each element of a page with many regions.
+
+        Arguments:
+                |  Locators (list)                              | The elements to check, as selector=value, e.g. css=.navbar or xpath=//div[@id="main"]. The supported selectors are CSS SELECTOR (or css), XPATH, ID, LINK TEXT (or link), PARTIAL LINK TEXT (or partial link), NAME, TAG NAME (or tag) and CLASS NAME (or class). A locator starting with // is an xpath. |
+                |  Names (list, default=None)                   | The names that will be given to the regions in Eyes. Defaults to the locators.                     |
+                |  Force Full Page Screenshot (default=False)   | Takes a screenshot of the whole page, needed when some of the elements are outside the viewport.   |
+                |  Threads (default=4)                          | The number of threads uploading the regions, unless the session was opened with Async Checks.     |
+                |  Include Eyes Log (default=False)             | The Eyes logs will not be included by default. To activate, pass 'True' in the variable.           |
+                |  HTTP Debug Log (default=False)               | The HTTP Debug logs will not be included by default. To activate, pass 'True' in the variable.     |
 
-        eyes.check_region_by_selector(searchElement, value, name)
+        Elements inside frames are not supported. When the session was opened with Async Checks, the regions are
+        queued and their mismatches are reported by Close Eyes Session, and an empty list is returned.
+
+        Example:
+
+        | *Keywords*            |  *Parameters*                                                                                                 |
+        | Open Browser          |  http://www.navinet.net/  |  gc                       |                            |                    |        |       |
+        | Open Eyes Session     |  http://www.navinet.net/  |  RobotAppEyes_Test        |  NaviNet_RobotAppEyes_Test |  YourApplitoolsKey |  1024  |  768  |
+        | @{locators}=          |  Create List              |  css=.first.expanded.dropdown  |  id=navbar            |  link=RESOURCES    |        |       |
+        | @{names}=             |  Create List              |  Dropdown                 |  Navbar                    |  Resources link    |        |       |
+        | ${mismatches}=        |  Check Eyes Regions       |  ${locators}              |  ${names}                  |                    |        |       |
+        | Close Eyes Session    |                           |                           |                            |                    |        |       |
+        """
+        if includeEyesLog is True:
+            self._include_eyes_log()
+        if httpDebugLog is True:
+            httplib.HTTPConnection.debuglevel = 1
+
+        if isinstance(locators, basestring):
+            locators = [locators]
+        if names is None:
+            names = list(locators)
+        elif isinstance(names, basestring):
+            names = [names]
+        if len(names) != len(locators):
+            raise EyesError('%d names were given for %d locators' % (len(names), len(locators)))
+        parsed = [list(parse_locator(locator)) for locator in locators]
+
+        session = self._sessions.current
+        with self._check(session, 'Check Eyes Regions', ', '.join(names)):
+            with phase(LOCATE):
+                if session.locators is not None:
+                    rects = session.locators.rects(session.driver, parsed)
+                else:
+                    rects = session.driver.execute_script(REGIONS_SCRIPT, parsed)
+            missing = [locator for locator, rect in zip(locators, rects) if rect is None]
+            if missing:
+                raise EyesError('No element found for: %s' % ', '.join(missing))
+
+            eyes = session.eyes
+            eyes._prepare_to_check()
+            screenshot = eyes._match_window_task._get_screenshot(force_full_page_screenshot)
+            eyes._last_screenshot = screenshot
+            queue = session.check_queue
+            if queue is None:
+                queue = CheckQueue(int(threads))
+            try:
+                checks = []
+                for name, rect in zip(names, rects):
+                    region = screenshot.get_sub_screenshot_by_element(ElementRect(*rect))
+                    image = region._screenshot
+                    nbytes = image.width * image.height * image.pixel_size
+                    checks.append((name, self._match(session, name, region, False, nbytes, queue)))
+            finally:
+                if queue is not session.check_queue:
+                    with phase(WAIT):
+                        queue.shutdown()
+        if queue is session.check_queue:
+            return []
+        self._log_payload(session.payload)
+
+        errors = ["'%s': %s" % (name, check.error) for name, check in checks if check is not None and check.error]
+        if errors:
+            raise EyesError('%d region(s) could not be matched: %s' % (len(errors), '; '.join(errors)))
+        mismatches = [name for name, check in checks if check is not None and not check.result]
+        if mismatches and not eyes._running_session['is_new_session']:
+            _builtin().log('%d of %d regions did not match: %s' % (len(mismatches), len(names), ', '.join(mismatches)),
+                           'WARN')
+        return mismatches
+
+    def wait_until_page_is_visually_stable(self, timeout=10, stableFrames=3, interval=0.1, locator=None):
+        """
+        Waits until the page, or the region of one element, stops changing, and returns the seconds waited.
+        Use it instead of a fixed Sleep before a check, to let animations, spinners and lazy-loaded images settle.
+
+        Screenshots are taken every Interval seconds until Stable Frames screenshots in a row are identical.
+        Frames are compared by checksum: the whole page is checksummed as the PNG the browser returns, without
+        decoding it, and a region by the checksum of each 128 pixel tile of the element, decoding only the rows
+        down to the element. The region's rectangle is part of the comparison, so an element that moves is not
+        stable either. Fails after Timeout seconds, naming the area of the region that changed last.
+
+        Arguments:
+                |  Timeout (default=10)             | The seconds to wait for the page to be stable before failing.                                        |
+                |  Stable Frames (default=3)        | The number of identical screenshots in a row for the page to be stable.                              |
+                |  Interval (default=0.1)           | The seconds to wait between screenshots.                                                             |
+                |  Locator (default=None)           | Only waits for the region of this element, e.g. css=.spinner or xpath=//div[@id="main"], see Check Eyes Regions. |
+
+        Uses the browser of the current Eyes session, or the current Selenium2Library browser when no session is open.
+
+        Example:
+
+        | *Keywords*                            |  *Parameters*                                                                                      |
+        | Open Browser                          |  http://www.navinet.net/  |  gc                    |                            |                    |
+        | Open Eyes Session                     |  RobotAppEyes_Test        |  NaviNet_RobotAppEyes_Test |  YourApplitoolsKey     |  1024              |
+        | Wait Until Page Is Visually Stable    |  timeout=15               |  stableFrames=4        |                            |                    |
+        | Check Eyes Window                     |  NaviNet Home             |                        |                            |                    |
+        | Wait Until Page Is Visually Stable    |  locator=id=navbar        |                        |                            |                    |
+        | Check Eyes Region By Selector         |  ID                       |  navbar                |  NaviNet Navbar            |                    |
+        | Close Eyes Session                    |                           |                        |                            |                    |
+        """
+        driver = self._sessions.current.driver if self._sessions.has_current() else self._current_browser()
+        parsed = parse_locator(locator) if locator is not None else None
+        elapsed, frames = wait_for_stable_frames(lambda: frame_signature(driver, parsed), max(int(stableFrames), 1),
+                                                 float(timeout), float(interval), changed_area)
+        _builtin().log('Page was visually stable after %.2f seconds, %d frames taken' % (elapsed, frames))
+        return elapsed
+
+    def check_eyes_window_at_viewports(self, name, sizes, force_full_page_screenshot=False, threads=4, stableTimeout=None,
+                                       includeEyesLog=False, httpDebugLog=False):
+        """
+        Checks the current page at each of several viewport sizes, without reloading it, and restores the viewport size.
+        Fails when the page does not match at one of the sizes, after all of them were checked.
+
+        Eyes keeps a baseline per viewport size, so each size is checked in an Eyes session of its own, with the
+        application name, test name, settings and backend of the current session, which is not changed. The sessions
+        of the sizes are reported in a copy of the batch of the current session, or in a batch of their own when the
+        current session has not started yet. The browser is resized and the screenshot taken for one size after the
+        other, while the sessions of the sizes already captured are started, matched and closed by a pool of worker
+        threads. The result of each size is logged.
+
+        The Async Checks, Screenshot Cache and Duplicate Policy options of Open Eyes Session do not apply: each
+        size is a whole Eyes session, which is run and closed before the keyword returns.
+
+        Arguments:
+                |  Name (string)                                | Name that will be given to the window in Eyes.                                                           |
+                |  Sizes (list)                                 | The viewport sizes, as WIDTHxHEIGHT, e.g. 1280x800, in a list or separated by commas.                    |
+                |  Force Full Page Screenshot (default=False)   | Takes a screenshot of the whole page at each size.                                                       |
+                |  Threads (default=4)                          | The number of viewport sessions run with Eyes at the same time.                                          |
+                |  Stable Timeout (default=None)                | After each resize, waits up to this many seconds for the page to be visually stable (see Wait Until Page Is Visually Stable). |
+                |  Include Eyes Log (default=False)             | The Eyes logs will not be included by default. To activate, pass 'True' in the variable.                 |
+                |  HTTP Debug Log (default=False)               | The HTTP Debug logs will not be included by default. To activate, pass 'True' in the variable.           |
+
+        Example:
+
+        | *Keywords*                        |  *Parameters*                                                                                         |
+        | Open Browser                      |  http://www.navinet.net/  |  gc                        |                            |                |
+        | Open Eyes Session                 |  RobotAppEyes_Test        |  NaviNet_RobotAppEyes_Test |  YourApplitoolsKey         |                |
+        | Check Eyes Window At Viewports    |  NaviNet Home             |  1280x800,1024x768,768x1024,375x667                     |  stableTimeout=5 |
+        | Close Eyes Session                |                           |                            |                            |                |
+        """
+        from applitools import _viewport_size
+        if includeEyesLog is True:
+            self._include_eyes_log()
+        if httpDebugLog is True:
+            httplib.HTTPConnection.debuglevel = 1
+
+        session = self._sessions.current
+        driver = session.driver
+        wait = None
+        if stableTimeout is not None:
+            wait = lambda: wait_for_stable_frames(lambda: frame_signature(driver), 3, float(stableTimeout), 0.1,
+                                                  changed_area)
+        with self._check(session, 'Check Eyes Window At Viewports', name):
+            original_size = _viewport_size.get_viewport_size(driver)
+            batch = viewport_batch(session.eyes)
+            queue = CheckQueue(int(threads))
+            checks = []
+            try:
+                for size in parse_sizes(sizes):
+                    viewport = ViewportCheck(session.eyes, driver, size, name, batch, session.payload)
+                    session.timing.instrument(viewport.eyes)
+                    nbytes = viewport.capture(force_full_page_screenshot, wait)
+                    checks.append(queue.submit(size_name(size), session.bind(viewport.run), lambda result: result,
+                                               nbytes))
+            finally:
+                try:
+                    _viewport_size.set_viewport_size(driver, original_size)
+                finally:
+                    with phase(WAIT):
+                        queue.shutdown()
+
+        self._log_payload(session.payload)
+        results = [check.result for check in checks]
+        report = ['| *Viewport* | *Result* | *Details* |']
+        for result in results:
+            report.append('| %s | %s | %s |' % (size_name(result.size), result.status, result.error or result.url))
+        _builtin().log('\n'.join(report))
+        errors = ["%s: %s" % (size_name(result.size), result.error) for result in results if result.error]
+        if errors:
+            raise EyesError('%d viewport(s) could not be checked: %s' % (len(errors), '; '.join(errors)))
+        mismatches = [size_name(result.size) for result in results if result.status == UNRESOLVED]
+        if mismatches:
+            raise EyesError("'%s' did not match at %d of %d viewports: %s" %
+                            (name, len(mismatches), len(results), ', '.join(mismatches)))
+        new = [size_name(result.size) for result in results if result.status == NEW]
+        if new:
+            _builtin().log("'%s' is new at %s, approve the new baselines in Eyes" % (name, ', '.join(new)))
 
     def compare_image(self, path, imagename=None, ignore_mismatch=False, includeEyesLog=False, httpDebugLog=False):
         """
         Select an image and send it to Eyes for comparison. A name can be used in place of the image's file name.
+        The image must be a PNG file. It is memory-mapped and sent to Eyes as it is, without being decoded.
 
         Arguments:
                 |  Path                             | Path of the image to send to eyes for visual comparison.                                                                   |
@@ -338,26 +791,96 @@ class RobotAppEyes:
         else:
             tag = imagename
 
-        eyes._prepare_to_check()
+        session = self._sessions.current
         if includeEyesLog is True:
-            logger.set_logger(StdoutLogger())
-            logger.open_()
+            self._include_eyes_log()
         if httpDebugLog is True:
             httplib.HTTPConnection.debuglevel = 1
 
-        with open(path, 'rb') as image_file:
-            screenshot64 = image_file.read().encode('base64')
-            screenshot = _image_utils.png_image_from_bytes(base64.b64decode(screenshot64))
-            screenshotBytes = EyesScreenshot.create_from_image(screenshot, eyes._driver)
-        title = eyes.get_title()
-        app_output = {'title': title, 'screenshot64': None}
-        user_inputs = []
-        prepare_match_data = eyes._match_window_task._create_match_data_bytes(
-            app_output, user_inputs, tag, ignore_mismatch, screenshotBytes)
-        eyes._match_window_task._agent_connector.match_window(
-            eyes._match_window_task._running_session, prepare_match_data)
+        with self._check(session, 'Compare Image', tag):
+            session.eyes._prepare_to_check()
+            screenshot = PngFile(path)
+            self._match(session, tag, screenshot, ignore_mismatch, screenshot.size)
+
+    def compare_images_in_directory(self, path, ignore_mismatch=False, threads=4, includeEyesLog=False,
+                                    httpDebugLog=False):
+        """
+        Sends every PNG image in a directory, or every file matching a glob pattern, to Eyes for comparison.
+        Each image is named after its file name. Returns the list of file names that did not match.
+
+        Each image is checked as by Compare Image: it is memory-mapped and copied into its match request
+        without being decoded, and goes through the screenshot cache and the duplicate screenshot filter
+        of the session. The images are uploaded by a pool of worker threads, while only a few of them are
+        held in memory at any time. The match status of each file and the throughput of the batch are
+        written to the log. An image held back by the cache or the filter is sent to Eyes before the next
+        image that is sent, and gets its status from that match; the images held back at the end of the
+        directory are listed as held back, until a later check of the session sends them.
+
+        Arguments:
+                |  Path                             | A directory of PNG images, or a glob pattern such as reports/*.png                             |
+                |  Ignore Mismatch (default=False)  | Passed to Eyes with every image, as in Compare Image.                                          |
+                |  Threads (default=4)              | The number of threads uploading images, unless the session was opened with Async Checks.       |
+                |  Include Eyes Log (default=False) | The Eyes logs will not be included by default. To activate, pass 'True' in the variable.       |
+                |  HTTP Debug Log (default=False)   | The HTTP Debug logs will not be included by default. To activate, pass 'True' in the variable. |
+
+        Example:
+
+        | *Keywords*                  |  *Parameters*                                                                                              |
+        | Open Browser                |  http://www.navinet.net/   |  gc                   |                            |                    |        |       |
+        | Open Eyes Session           |  http://www.navinet.net/   |  RobotAppEyes_Test    |  NaviNet_RobotAppEyes_Test |  YourApplitoolsKey |  1024  |  768  |
+        | ${mismatches}=              |  Compare Images In Directory |  reports/*.png      |                            |                    |        |       |
+        | Close Eyes Session          |                            |                       |                            |                    |        |       |
+        """
+        if includeEyesLog is True:
+            self._include_eyes_log()
+        if httpDebugLog is True:
+            httplib.HTTPConnection.debuglevel = 1
 
-    def close_eyes_session(self, includeEyesLog=False, httpDebugLog=False):
+        paths = find_images(path)
+        if not paths:
+            raise EyesError("No images found in '%s'" % path)
+        session = self._sessions.current
+        session.eyes._prepare_to_check()
+        queue = session.check_queue
+        if queue is None:
+            queue = CheckQueue(int(threads))
+        batch = ImageBatch(paths)
+
+        def submit(tag, image, nbytes):
+            held = []
+            with session.check('Compare Images In Directory', tag):
+                check = self._match(session, tag, image, ignore_mismatch, nbytes, queue, held=held)
+            if check is None and held:
+                # The step is sent before the next image that is sent, or at the end of the session.
+                step = held[0]
+                return lambda: step.check
+            return check
+        try:
+            results = batch.run(submit)
+        finally:
+            if queue is not session.check_queue:
+                queue.shutdown()
+            self._log_eyes_log()
+        self._log_payload(session.payload)
+
+        total_bytes = sum(result.nbytes for result in results)
+        elapsed = max(batch.elapsed, 0.001)
+        report = ['| *File* | *Status* | *Bytes* |']
+        for result in results:
+            status = result.status if result.error is None else '%s: %s' % (result.status, result.error)
+            report.append('| %s | %s | %d |' % (result.tag, status, result.nbytes))
+        _builtin().log('\n'.join(report))
+        _builtin().log("Compared %d images (%.1f MB) in %.1fs: %.1f images/s, %.2f MB/s" %
+                       (len(results), total_bytes / 1048576.0, elapsed, len(results) / elapsed,
+                        total_bytes / 1048576.0 / elapsed))
+        failed = [result for result in results if result.status == ImageResult.FAILED]
+        if failed:
+            raise EyesError("%d of %d images could not be compared: %s" %
+                            (len(failed), len(results), '; '.join("'%s': %s" % (result.tag, result.error)
+                                                                  for result in failed)))
+        return [result.tag for result in results if result.status == ImageResult.MISMATCHED]
+
+    def close_eyes_session(self, includeEyesLog=False, httpDebugLog=False, deferred=False):
         """
         Closes a session and returns the results of the session.
         If a test is running, aborts it. Otherwise, does nothing.
@@ -368,6 +891,12 @@ class RobotAppEyes:
         Arguments:
                 |  Include Eyes Log (default=False) | The Eyes logs will not be included by default. To activate, pass 'True' in the variable.        |
                 |  HTTP Debug Log (default=False)   | The HTTP Debug logs will not be included by default. To activate, pass 'True' in the variable.  |
+                |  Deferred (default=False)         | Closes the session in the background and returns at once, see Wait For Eyes Sessions To Close.  |
+
+        With deferred=True the session stops being the current session at once, and is closed by a background thread
+        while the next test runs: its asynchronous checks are waited for and Eyes is asked for its results, or the
+        session is aborted if that fails. Nothing is reported until Wait For Eyes Sessions To Close, which should be
+        called in the suite teardown. Sessions still being closed when the process exits are waited for.
 
         Example:
 
@@ -379,14 +908,172 @@ class RobotAppEyes:
 
         """
         if includeEyesLog is True:
-            logger.set_logger(StdoutLogger())
-            logger.open_()
+            self._include_eyes_log()
         if httpDebugLog is True:
             httplib.HTTPConnection.debuglevel = 1
 
-        eyes.close()
-        eyes.abort_if_not_closed()
+        session = self._sessions.current
+        if deferred is True:
+            self._sessions.remove(session)
+            if self._closer is None:
+                self._closer = CheckQueue(self._CLOSE_WORKERS, self._MAX_PENDING_CLOSES)
+                atexit.register(self._closer.shutdown)
+            check = self._closer.submit(session.eyes._test_name, lambda: self._close_in_background(session),
+                                        lambda results: results)
+            self._deferred_closes.append((session, check))
+            return
+        failed_checks = []
+        try:
+            if session.check_queue is not None:
+                failed_checks = self._wait_for_async_checks(session)
+            if session.screenshot_cache is None and session.duplicates is None:
+                session.eyes.close()
+            else:
+                self._close_with_cache(session)
+        finally:
+            self._sessions.remove(session)
+            session.eyes.abort_if_not_closed()
+            if isinstance(session.eyes._agent_connector, LocalAgentConnector):
+                self._log_local_results(session.eyes._agent_connector)
+            elif isinstance(session.eyes._agent_connector, SpoolAgentConnector):
+                _builtin().log("%d checks recorded to %s, upload them with robotappeyes-upload" %
+                               (session.eyes._agent_connector.steps, session.eyes._agent_connector.spool_dir))
+            elif isinstance(session.eyes._agent_connector, PooledAgentConnector):
+                self._log_http_stats(session.eyes._agent_connector.stats)
+            if session.payload is not None:
+                session.payload.close()
+                self._log_payload(session.payload, True)
+            if session.locators is not None:
+                self._log_locator_cache(session.locators)
+            if session.timing.enabled:
+                self._log_session_timing(session.timing)
+            self._release_eyes_log()
+        if failed_checks:
+            raise EyesError("%d asynchronous check(s) could not be matched: %s" %
+                            (len(failed_checks), '; '.join("'%s': %s" % (check.tag, check.error)
+                                                           for check in failed_checks)))
+
+
+    def wait_for_eyes_sessions_to_close(self):
+        """
+        Waits until every session passed to Close Eyes Session with deferred=True is closed, logs a table of the
+        results of their tests, and fails listing the tests that did not pass. Call it in the suite teardown.
+        The sessions are closed concurrently, so waiting for them takes about as long as the slowest one. The
+        statistics Close Eyes Session logs for a session, such as the screenshot cache counts, are logged here.
+
+        A test fails when Eyes found a mismatch or a missing step, when one of its asynchronous checks could not be
+        matched, or when its session could not be closed, in which case it was aborted. New tests do not fail.
+
+        The kept-alive connections of the HTTP Pool are closed once the sessions are, the sessions still open
+        connect again when they send their next request.
+
+        Example:
+
+        | *Settings*         |  *Value*                          |                        |                            |                    |
+        | Suite Teardown     |  Wait For Eyes Sessions To Close  |                        |                            |                    |
+        | *Keywords*         |  *Parameters*                     |                        |                            |                    |
+        | Open Eyes Session  |  RobotAppEyes_Test                |  NaviNet_RobotAppEyes_Test  |  YourApplitoolsKey  |                    |
+        | Check Eyes Window  |  NaviNet Home                     |                        |                            |                    |
+        | Close Eyes Session |  deferred=True                    |                        |                            |                    |
+        """
+        closer, self._closer = self._closer, None
+        deferred, self._deferred_closes = self._deferred_closes, []
+        if closer is None:
+            self._close_http_pools()
+            return
+        with phase(WAIT):
+            closer.shutdown()
+        self._close_http_pools()
+        report = ['| *Application* | *Test* | *Result* | *Steps* | *Matches* | *Mismatches* | *Missing* | *Details* |']
+        failed = []
+        for session, check in deferred:
+            results = check.result
+            if isinstance(check.error, TestFailedError):
+                status, results = 'unresolved', check.error.test_results
+            elif check.error is not None:
+                status = 'failed'
+            else:
+                status = 'new' if results.is_new else 'passed'
+            details = check.error if status == 'failed' else (results.url if results else '') or ''
+            counts = (results.steps, results.matches, results.mismatches, results.missing) if results else ('',) * 4
+            row = '| %s | %s | %s | %s | %s | %s | %s | %s |' % ((session.eyes._app_name, session.eyes._test_name, status)
+                                                            + counts + (details,))
+            report.append(row)
+            if status in ('unresolved', 'failed'):
+                failed.append(row)
+            if isinstance(session.eyes._agent_connector, LocalAgentConnector):
+                self._log_local_results(session.eyes._agent_connector)
+            if session.payload is not None:
+                self._log_payload(session.payload, True)
+            if session.locators is not None:
+                self._log_locator_cache(session.locators)
+            if session.screenshot_cache is not None:
+                self._log_screenshot_cache(session)
+            if session.duplicates is not None:
+                self._log_duplicates(session.duplicates)
+            if isinstance(session.eyes._agent_connector, PooledAgentConnector):
+                self._log_http_stats(session.eyes._agent_connector.stats)
+            if session.timing.enabled:
+                self._log_session_timing(session.timing)
+        self._release_eyes_log()
+        _builtin().log('%d Eyes sessions closed\n%s' % (len(deferred), '\n'.join(report)))
+        if failed:
+            raise EyesError('%d of %d Eyes sessions did not pass:\n%s' % (len(failed), len(deferred),
+                                                                          '\n'.join([report[0]] + failed)))
+
+    def invalidate_eyes_screenshot_cache(self, directory=None, appname=None, testname=None):
+        """
+        Removes the checks remembered by a screenshot cache, so they are sent to Eyes again.
+        All the checks are removed unless an application name or a test name is given.
+        Returns the number of checks removed.
+
+        Arguments:
+                |  Directory (default=None)         | The screenshot cache directory. Defaults to the cache of the current session.  |
+                |  Application Name (default=None)  | Only remove the checks of this application.                                    |
+                |  Test Name (default=None)         | Only remove the checks of this test.                                           |
+
+        Example:
+
+        | *Keywords*                        |  *Parameters*                                                                                           |
+        | Invalidate Eyes Screenshot Cache  |  ${TEMPDIR}/eyes-cache    |  RobotAppEyes_Test  |                            |                    |
+        """
+        if directory is not None:
+            cache = ScreenshotCache(directory)
+        elif self._sessions.has_current() and self._sessions.current.screenshot_cache is not None:
+            cache = self._sessions.current.screenshot_cache
+        else:
+            raise EyesError('No open Eyes session has a screenshot cache, pass the cache directory.')
+        metadata = {}
+        if appname is not None:
+            metadata['app'] = appname
+        if testname is not None:
+            metadata['test'] = testname
+        removed = cache.invalidate(**metadata)
+        _builtin().log("Removed %d checks from the screenshot cache %s" % (removed, cache.directory))
+        return removed
+
+    def mark_eyes_locators_dirty(self):
+        """
+        Forgets the element rectangles kept by the locator cache of the current session, so the next region keyword
+        finds its element again. Returns the hit rate of the cache so far, in percent.
 
+        The cache notices the changes to the page made by scripts, resizing and scrolling by itself, use this
+        keyword after a change that moves elements without the browser reporting it, such as a web font that
+        finished loading. Does nothing but return 0 when the session was opened without Locator Cache.
+
+        Example:
+
+        | *Keywords*                    |  *Parameters*                                                                                         |
+        | Open Eyes Session             |  RobotAppEyes_Test        |  NaviNet_RobotAppEyes_Test  |  YourApplitoolsKey  |  locatorCache=True  |
+        | Check Eyes Region By Selector |  ID                       |  navbar                     |  NaviNet Navbar     |                     |
+        | Mark Eyes Locators Dirty      |                           |                             |                     |                     |
+        | Check Eyes Region By Selector |  ID                       |  navbar                     |  NaviNet Navbar     |                     |
+        """
+        locators = self._sessions.current.locators
+        if locators is None:
+            return 0.0
+        locators.mark_dirty()
+        return locators.hit_rate
 
     def eyes_session_is_open(self):
         """
@@ -398,4 +1085,540 @@ class RobotAppEyes:
         | ${isOpen}=        |  Eyes Session Is Open     |                      |                            |                    |        |       |
         | Run Keyword If    |  ${isOpen}==True          | Close Eyes Session   |                            |                    |        |       |
         """
-        return eyes.is_open()
+        return self._sessions.has_current() and self._sessions.current.eyes.is_open()
+
+    def switch_eyes_session(self, index_or_alias):
+        """
+        Makes the session with the given index or alias the current Eyes session.
+        The index is returned by Open Eyes Session, the alias is the one passed to it.
+
+        Only the current session of the calling thread changes, a thread that never opened or switched to a
+        session uses the session opened or switched to last. Once the session of a thread is closed, the thread has
+        no current session until it opens or switches to another one.
+
+        Example:
+
+        | *Keywords*          |  *Parameters*                                                                                                                 |
+        | Open Browser        |  http://www.navinet.net/  |  gc                |  alias=Chrome               |                    |        |       |                |
+        | Open Eyes Session   |  RobotAppEyes_Test        |  Chrome_Test       |  YourApplitoolsKey          |  1024              |  768   |  alias=ChromeEyes  |
+        | Open Browser        |  http://www.navinet.net/  |  ff                |  alias=Firefox              |                    |        |       |                |
+        | Open Eyes Session   |  RobotAppEyes_Test        |  Firefox_Test      |  YourApplitoolsKey          |  1024              |  768   |  alias=FirefoxEyes |
+        | Switch Eyes Session |  ChromeEyes               |                    |                             |                    |        |       |                |
+        | Check Eyes Window   |  NaviNet Home             |                    |                             |                    |        |       |                |
+        """
+        self._sessions.switch(index_or_alias)
+
+    def _http_pool(self, max_connections, max_retries, timeout):
+        """
+        Returns the HttpPool of the library for these settings, creating it for the first session that uses them.
+        """
+        key = (max_connections, max_retries, timeout)
+        with self._http_pools_lock:
+            if key not in self._http_pools:
+                self._http_pools[key] = HttpPool(max_connections, max_retries, timeout)
+                atexit.register(self._http_pools[key].close)
+            return self._http_pools[key]
+
+    def _close_http_pools(self):
+        with self._http_pools_lock:
+            pools = list(self._http_pools.values())
+        for pool in pools:
+            pool.close()
+
+    def _include_eyes_log(self):
+        """
+        Sends the Eyes log to the Robot log, for the Include Eyes Log argument of the keywords, unless an Eyes log
+        is already configured.
+        """
+        if self._eyes_log is None:
+            self._install_eyes_log(EyesLog(ROBOT))
+
+    def _install_eyes_log(self, eyes_log):
+        """
+        Makes an EyesLog the logger of the Eyes SDK, in place of the EyesLog configured before unless they have the
+        same settings.
+        """
+        previous = self._eyes_log
+        if previous is not None and previous.settings == eyes_log.settings:
+            return
+        self._eyes_log = eyes_log
+        install_eyes_log(eyes_log)
+        atexit.register(eyes_log.shutdown)
+        if previous is not None:
+            previous.shutdown()
+            self._log_eyes_log(previous)
+
+    def _release_eyes_log(self):
+        """
+        Logs the records of the Eyes log meant for the Robot log and, once every session is closed, shuts the Eyes
+        log down, which gives the Eyes SDK back the logger it had.
+        """
+        eyes_log = self._eyes_log
+        if eyes_log is not None and self._closer is None and self._sessions.is_empty():
+            self._eyes_log = None
+            eyes_log.shutdown()
+        self._log_eyes_log(eyes_log)
+
+    @contextlib.contextmanager
+    def _check(self, session, keyword, tag):
+        """
+        The scope of a check keyword, see EyesSession.check, after which the records of the Eyes log meant for the
+        Robot log are logged.
+        """
+        try:
+            with session.check(keyword, tag):
+                yield
+        finally:
+            self._log_eyes_log()
+
+    def _current_browser(self):
+        """
+        Returns the web driver of the current Selenium2Library browser.
+        """
+        s2l = _builtin().get_library_instance('Selenium2Library')
+        return s2l._current_browser()
+
+    @staticmethod
+    def _locate(session, selector, value, driver=None):
+        """
+        Returns the element found by a selector name and value, or only its ElementRect when the session has a
+        locator cache. Selenium finds the element, with the given driver or the driver of the session, when there
+        is no cache or the cache's script found no element, so a missing element raises Selenium's error.
+        """
+        with phase(LOCATE):
+            if session.locators is not None:
+                rect = session.locators.rects(session.driver, [(selector, value)])[0]
+                if rect is not None:
+                    return ElementRect(*rect)
+            return (driver or session.driver).find_element(STRATEGIES[selector][0], value)
+
+    def _check_captured(self, session, tag, get_screenshot, ignore_mismatch=False):
+        """
+        Captures a screenshot on the calling thread and matches it.
+        get_screenshot is called with the session's match window task and returns an EyesScreenshot.
+        """
+        eyes = session.eyes
+        eyes._prepare_to_check()
+        screenshot = get_screenshot(eyes._match_window_task)
+        eyes._last_screenshot = screenshot
+        image = screenshot._screenshot
+        as_expected = self._match(session, tag, screenshot, ignore_mismatch, image.width * image.height * image.pixel_size,
+                                  recapture=lambda: get_screenshot(eyes._match_window_task))
+        if session.check_queue is None and as_expected is not None:
+            eyes._handle_match_result({'as_expected': as_expected, 'screenshot': eyes._last_screenshot}, tag)
+
+    def _check_segments(self, session, name, segment_height):
+        """
+        Checks the page in segments of segment_height pixels, stitching each segment only once the previous one
+        was matched or queued. The segments are not kept as the last screenshot of Eyes, so only one is held, and a
+        segment held back by the screenshot cache or the duplicate screenshot filter is sent at once, since a held
+        step keeps its screenshot until a later step is sent.
+        """
+        from applitools._webdriver import EyesScreenshot
+        eyes = session.eyes
+        eyes._prepare_to_check()
+        segments = fullpage.stitched_segments(eyes._driver, segment_height)
+        try:
+            while True:
+                with phase(DECODE):
+                    segment = next(segments, None)
+                if segment is None:
+                    break
+                number, count, image = segment
+                screenshot = EyesScreenshot.create_from_image(image, eyes._driver)
+                tag = '%s (%d/%d)' % (name, number, count)
+                held = []
+                as_expected = self._match(session, tag, screenshot, False, image.width * image.height * image.pixel_size,
+                                          held=held)
+                segment = image = screenshot = None
+                if held:
+                    self._send_held_steps(session, session.check_queue)
+                    as_expected = held[0].check if session.check_queue is None else None
+                if session.check_queue is None and as_expected is not None:
+                    eyes._handle_match_result({'as_expected': as_expected, 'screenshot': None}, tag)
+        finally:
+            segments.close()
+
+    def _match(self, session, tag, screenshot, ignore_mismatch, nbytes, queue=None, recapture=None, held=None):
+        """
+        Matches a screenshot, answering it from the screenshot cache or the duplicate screenshot filter when
+        possible and queueing it when the session is asynchronous or a queue is given. The screenshot can be an
+        EyesScreenshot or a PngFile. Returns the PendingCheck of a queued match, or whether a match that was not
+        queued matched, None when the check was held back. The HeldStep of a check held back is appended to the
+        `held` list, when given.
+
+        A match that is not queued is retried as the SDK retries it when `recapture` is given, see _retry_match.
+        """
+        eyes = session.eyes
+        screenshot_cache = session.screenshot_cache
+        duplicates = session.duplicates
+        if queue is None:
+            queue = session.check_queue
+        if screenshot_cache is not None or duplicates is not None:
+            with phase(HASH):
+                image_hash = image_digest(screenshot)
+        recent = None
+        if duplicates is not None:
+            duplicate_key = duplicates.key(image_hash, tag, eyes.match_level)
+            earlier = duplicates.repeat_of(duplicate_key)
+            if earlier is not None:
+                if isinstance(screenshot, PngFile):
+                    screenshot.close()
+                return self._match_repeat(session, queue, tag, earlier, ignore_mismatch, held)
+        cache_key = None
+        if screenshot_cache is not None:
+            cache_key = screenshot_cache.key(image_hash, eyes._app_name, eyes._test_name, tag,
+                                             eyes.get_viewport_size(), eyes.match_level)
+            if screenshot_cache.is_known_passing(cache_key):
+                _builtin().log("Screenshot cache hit: '%s' passed before, it is only sent to Eyes if a later check is"
+                               % tag)
+                self._hold_step(session, queue, HeldStep(tag, self._encoder(session, tag, screenshot, ignore_mismatch),
+                                                         nbytes, getattr(screenshot, 'close', None)), held)
+                return
+        if duplicates is not None:
+            recent = duplicates.remember(duplicate_key, tag)
+        self._send_held_steps(session, queue)
+        if queue is not None:
+            return self._queue_match(session, queue, tag, screenshot, ignore_mismatch, nbytes, cache_key, recent)
+        task = eyes._match_window_task
+        # As in the SDK, the first attempt of a check that is retried does not count as a mismatch.
+        retry = recapture is not None and not ignore_mismatch and not eyes._should_match_once_on_timeout \
+            and eyes.match_timeout > 0
+        data = self._encoder(session, tag, screenshot, ignore_mismatch or retry)()
+        self._log_payload(session.payload)
+        if recent is not None:
+            recent.data = data
+        start = time.time()
+        as_expected = self._send_match(task, data, screenshot_cache, cache_key, tag)
+        if not as_expected and retry:
+            as_expected = self._retry_match(session, tag, recapture, start)
+            if recent is not None:
+                # The step was matched with another screenshot than the one remembered.
+                duplicates.forget(recent)
+                recent = None
+        if recent is not None:
+            recent.as_expected = as_expected
+        return as_expected
+
+    def _encoder(self, session, tag, screenshot, ignore_mismatch):
+        """
+        Returns a function building the body of the match request of a screenshot, with the title and user inputs
+        of the session as they are now. A PngFile is closed once it was encoded.
+        """
+        eyes = session.eyes
+        app_output = {'title': eyes.get_title(), 'screenshot64': None}
+        user_inputs = eyes._user_inputs
+        eyes._user_inputs = []
+
+        def encode():
+            sent = screenshot
+            try:
+                with phase(ENCODE):
+                    if session.payload is not None:
+                        sent = session.payload.reduce(tag, sent)
+                    return create_match_data(app_output, user_inputs, tag, ignore_mismatch, sent)
+            finally:
+                if isinstance(sent, PngFile):
+                    sent.close()
+        return encode
+
+    def _retry_match(self, session, tag, recapture, start):
+        """
+        Retries a check whose first attempt, sent at `start`, did not match, as the SDK retries it: a new screenshot
+        is matched every half second, without counting as a mismatch, until the match timeout of Eyes has passed
+        since the first attempt, and a last one is matched as the result of the step. Returns whether it matched.
+        """
+        eyes = session.eyes
+        task = eyes._match_window_task
+        timeout = eyes.match_timeout / 1000.0
+        while True:
+            last = time.time() - start >= timeout
+            if not last:
+                time.sleep(task._MATCH_INTERVAL)
+            screenshot = recapture()
+            eyes._last_screenshot = screenshot
+            data = self._encoder(session, tag, screenshot, not last)()
+            self._log_payload(session.payload)
+            as_expected = task._agent_connector.match_window(task._running_session, data)
+            if as_expected or last:
+                return as_expected
+
+    def _hold_step(self, session, queue, step, held=None):
+        """
+        Holds a step back, sending the oldest held step when too many are held. The step is appended to the `held`
+        list, when given.
+        """
+        if held is not None:
+            held.append(step)
+        session.held_steps.append(step)
+        if len(session.held_steps) > self._MAX_HELD_STEPS:
+            self._send_step(session, queue, session.held_steps.pop(0))
+
+    def _send_held_steps(self, session, queue):
+        """
+        Sends the held steps of a session, before the step that follows them is sent.
+        """
+        steps, session.held_steps = session.held_steps, []
+        for step in steps:
+            self._send_step(session, queue, step)
+
+    def _send_step(self, session, queue, step):
+        """
+        Sends a held step, on the given queue or at once, and returns its PendingCheck or whether it matched.
+        A step sent at once that did not match is logged, Eyes reports it when the session is closed.
+        """
+        task = session.eyes._match_window_task
+
+        def send(data=None):
+            try:
+                return task._agent_connector.match_window(task._running_session, step.prepare())
+            finally:
+                step.release()
+        if queue is not None:
+            step.check = queue.submit(step.tag, lambda: None, session.bind(send), step.nbytes)
+            return step.check
+        step.check = send()
+        if not step.check and not task._running_session['is_new_session']:
+            _builtin().log("'%s' was held back and sent to Eyes before a later check, it did not match" % step.tag,
+                           'WARN')
+        return step.check
+
+    def _match_repeat(self, session, queue, tag, earlier, ignore_mismatch, held=None):
+        """
+        Handles a check whose screenshot repeats the recent check `earlier` as the duplicate screenshot policy of the
+        session says. The step of a repeat is sent with the screenshot already encoded for `earlier`: at once when
+        the policy is record, else it is held back until a later step is sent. Returns the PendingCheck of a repeat
+        queued on the given queue. A queued repeat is sent after the check it repeats was matched, since the checks
+        of a queue are sent in order.
+        """
+        eyes = session.eyes
+        policy = session.duplicates.policy
+        app_output = {'title': eyes.get_title(), 'screenshot64': None}
+        user_inputs = eyes._user_inputs
+        eyes._user_inputs = []
+
+        def prepare():
+            if earlier.data is None:
+                raise EyesError("'%s' repeats '%s', which could not be sent to Eyes" % (tag, earlier.tag))
+            return retag_match_data(earlier.data, app_output, user_inputs, tag, ignore_mismatch)
+        if policy == RECORD:
+            _builtin().log("'%s' is identical to '%s', its screenshot is sent to Eyes again" % (tag, earlier.tag))
+            self._send_held_steps(session, queue)
+            return self._send_step(session, queue, HeldStep(tag, prepare))
+        self._hold_step(session, queue, HeldStep(tag, prepare), held)
+        if policy == REUSE and queue is not None:
+            _builtin().log("'%s' is identical to '%s', it is only sent to Eyes if a later check is and gets its "
+                           "result" % (tag, earlier.tag))
+
+            def reuse(data):
+                if earlier.as_expected is None:
+                    raise EyesError("'%s' repeats '%s', which could not be matched" % (tag, earlier.tag))
+                return earlier.as_expected
+            return queue.submit(tag, lambda: None, reuse, 0)
+        if policy == REUSE and earlier.as_expected is False:
+            _builtin().log("'%s' is identical to '%s', which did not match, it is only sent to Eyes if a later check "
+                           "is" % (tag, earlier.tag), 'WARN')
+        else:
+            _builtin().log("'%s' is identical to '%s', it is only sent to Eyes if a later check is"
+                           % (tag, earlier.tag))
+
+    def _queue_match(self, session, queue, tag, screenshot, ignore_mismatch, nbytes, cache_key=None, recent=None):
+        """
+        Queues the match of a screenshot on the given check queue and returns its PendingCheck.
+        The screenshot can be any object with a get_bytes method returning PNG bytes. The RecentCheck of the
+        duplicate screenshot filter, when given, gets the body of the request and the result of the match.
+        """
+        task = session.eyes._match_window_task
+        cache = session.screenshot_cache
+        encode = self._encoder(session, tag, screenshot, ignore_mismatch)
+
+        def prepare():
+            data = encode()
+            if recent is not None:
+                recent.data = data
+            return data
+
+        def send(data):
+            as_expected = self._send_match(task, data, cache, cache_key, tag)
+            if recent is not None:
+                recent.as_expected = as_expected
+            return as_expected
+
+        return queue.submit(tag, session.bind(prepare), session.bind(send), nbytes)
+
+    @staticmethod
+    def _send_match(task, data, cache, cache_key, tag):
+        """
+        Sends a match request and remembers the check in the screenshot cache when it passed. Recorded checks
+        have not been matched yet and are not remembered.
+        """
+        as_expected = task._agent_connector.match_window(task._running_session, data)
+        if as_expected and cache_key is not None and not task._running_session['is_new_session'] \
+                and not task._running_session.get('recorded'):
+            cache.record_pass(cache_key, app=task._eyes._app_name, test=task._eyes._test_name, tag=tag)
+        return as_expected
+
+    def _close_with_cache(self, session, log=True):
+        """
+        Closes the session without counting the steps that were held back until its end, by the screenshot cache or
+        the duplicate screenshot filter, which Eyes reports as missing, as failures.
+        """
+        eyes = session.eyes
+        screenshot_cache = session.screenshot_cache
+        held, session.held_steps = session.held_steps, []
+        for step in held:
+            step.release()
+        session.not_sent = len(held)
+        if screenshot_cache is not None:
+            if log:
+                self._log_screenshot_cache(session)
+            screenshot_cache.evict()
+        if session.duplicates is not None:
+            if log:
+                self._log_duplicates(session.duplicates)
+        start_info = eyes._start_info
+        results = eyes.close(False)
+        if results.is_new or not (0 < results.mismatches or session.not_sent < results.missing):
+            return results
+        raise TestFailedError("'%s' of '%s'. See details at %s" % (start_info['scenarioIdOrName'],
+                                                                   start_info['appIdOrName'], results.url), results)
+
+    @staticmethod
+    def _log_payload(payload, total=False):
+        """
+        Logs the size sent for each screenshot reduced since the last call, and the total of the session when asked.
+        """
+        if payload is None:
+            return
+        for record in payload.drain():
+            if record.original_size is None:
+                # Eyes encodes a screenshot sent as it was, so its size is not known either.
+                size = '%d bytes: ' % record.sent_size if record.sent_size is not None else ''
+                _builtin().log("Payload of '%s': %s%s" % (record.tag, size, ', '.join(record.changes)))
+                continue
+            _builtin().log("Payload of '%s': %d bytes instead of %d, %d saved (%.1f%%): %s" %
+                           (record.tag, record.sent_size, record.original_size, record.saved,
+                            100.0 * record.saved / record.original_size if record.original_size else 0.0,
+                            ', '.join(record.changes)))
+        if total and payload.checks:
+            message = "Payload reduction: %d screenshots, %.2f MB sent" % (payload.checks, payload.sent_bytes / 1048576.0)
+            if payload.measured:
+                saved = payload.original_bytes - payload.measured_sent_bytes
+                message += ", %.2f MB instead of %.2f MB for the %d whose size before is known, %.1f%% saved" % \
+                           (payload.measured_sent_bytes / 1048576.0, payload.original_bytes / 1048576.0,
+                            payload.measured, 100.0 * saved / payload.original_bytes if payload.original_bytes else 0.0)
+            _builtin().log(message)
+
+    @staticmethod
+    def _log_http_stats(stats):
+        """
+        Logs the requests sent to Eyes by a session, by kind of request.
+        """
+        report = ['| *Request* | *Count* | *Retries* | *Failures* | *p50 ms* | *p95 ms* | *Max ms* | *MB sent* |']
+        for name, count, retries, failures, p50, p95, longest, nbytes in stats.summary():
+            report.append('| %s | %d | %d | %d | %.1f | %.1f | %.1f | %.2f |' %
+                          (name, count, retries, failures, p50 * 1000, p95 * 1000, longest * 1000, nbytes / 1048576.0))
+        _builtin().log('%d requests sent to Eyes\n%s' % (stats.requests, '\n'.join(report)))
+
+    def _log_eyes_log(self, eyes_log=None):
+        """
+        Logs the records of the Eyes log meant for the Robot log, and the number of records it dropped.
+        """
+        eyes_log = eyes_log or self._eyes_log
+        if eyes_log is None:
+            return
+        if eyes_log.target == ROBOT:
+            lines = eyes_log.drain()
+            if lines:
+                _builtin().log('Eyes log\n%s' % '\n'.join(lines))
+        dropped = eyes_log.take_dropped()
+        if dropped:
+            _builtin().log('%d Eyes log records were dropped, the buffer holds %d records' %
+                           (dropped, eyes_log.capacity), 'WARN')
+
+    @staticmethod
+    def _log_screenshot_cache(session):
+        _builtin().log("Screenshot cache: %d hits, %d misses, %d checks at the end of the session not sent to Eyes" %
+                       (session.screenshot_cache.hits, session.screenshot_cache.misses, session.not_sent))
+
+    @staticmethod
+    def _log_duplicates(duplicates):
+        _builtin().log("Duplicate screenshots: %d skipped, %d reused, %d recorded again" %
+                       (duplicates.skipped, duplicates.reused, duplicates.recorded))
+
+    @staticmethod
+    def _log_locator_cache(locators):
+        _builtin().log("Locator cache: %d hits, %d misses (%.1f%% hit rate) in %d scripts" %
+                       (locators.hits, locators.misses, locators.hit_rate, locators.scripts))
+
+    @staticmethod
+    def _log_check_timing(record):
+        _builtin().log('Timing: %s' % json.dumps(record.to_dict(), sort_keys=True))
+
+    @staticmethod
+    def _log_session_timing(recorder):
+        """
+        Logs the time spent in each phase by the checks of the session, and exports the timings.
+        """
+        count, total, phases = recorder.summary()
+        # Asynchronous checks spend time in their phases after the keywords return.
+        phases_total = sum(phases.values())
+        report = ['| *Phase* | *Seconds* | *Share* |']
+        for name, seconds in phases.items():
+            report.append('| %s | %.3f | %.1f%% |' % (name, seconds, 100.0 * seconds / phases_total if phases_total else 0.0))
+        _builtin().log('%d checks timed, %.3f seconds in the keywords, %.3f seconds in their phases\n%s' %
+                       (count, total, phases_total, '\n'.join(report)))
+        if recorder.export_path is not None:
+            recorder.export(recorder.export_path)
+
+    @staticmethod
+    def _log_local_results(connector):
+        """
+        Logs the steps matched against the local baseline that did not match.
+        """
+        mismatches = [result for result in connector.results if not result.as_expected]
+        if not mismatches:
+            return
+        report = ['| *Step* | *Tag* | *Mismatch* | *Diff* |']
+        for result in mismatches:
+            report.append('| %d | %s | %.2f%% | %s |' % (result.step + 1, result.tag, result.mismatch_percent,
+                                                        result.diff_path or result.actual_path))
+        _builtin().log('\n'.join(report), 'WARN')
+
+    def _close_in_background(self, session):
+        """
+        Closes a session on a closer thread and returns its results. Raises TestFailedError when the test did not pass,
+        or the error that made the close fail, after aborting the session. Nothing is logged from the closer threads,
+        the results, and the counts kept on the session, are logged by Wait For Eyes Sessions To Close.
+        """
+        try:
+            failed_checks = []
+            if session.check_queue is not None:
+                queue, session.check_queue = session.check_queue, None
+                failed_checks = [check for check in queue.shutdown() if check.error is not None]
+            if session.screenshot_cache is None and session.duplicates is None:
+                results = session.eyes.close()
+            else:
+                results = self._close_with_cache(session, log=False)
+        finally:
+            session.eyes.abort_if_not_closed()
+            if session.payload is not None:
+                session.payload.close()
+        if failed_checks:
+            raise EyesError("%d asynchronous check(s) could not be matched: %s" %
+                            (len(failed_checks), '; '.join("'%s': %s" % (check.tag, check.error)
+                                                           for check in failed_checks)))
+        return results
+
+    def _wait_for_async_checks(self, session):
+        """
+        Waits for every queued check of the session, logs the mismatches and returns the checks that failed.
+        """
+        queue, session.check_queue = session.check_queue, None
+        checks = queue.shutdown()
+        self._log_payload(session.payload)
+        mismatches = [check.tag for check in checks if check.error is None and not check.result]
+        if mismatches and not session.eyes._running_session['is_new_session']:
+            _builtin().log("%d of %d checks did not match: %s" %
+                           (len(mismatches), len(checks), ', '.join(mismatches)), 'WARN')
+        return [check for check in checks if check.error is not None]
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+import Queue
+
+
+class PendingCheck(object):
+    """
+    A visual check whose screenshot has been captured but not yet matched by Eyes.
+    """
+
+    def __init__(self, seq, tag, prepare, send, nbytes):
+        self.seq = seq
+        self.tag = tag
+        self.nbytes = nbytes
+        self.result = None
+        self.error = None
+        self._prepare = prepare
+        self._send = send
+        self._done = threading.Event()
+
+    def is_done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.is_done()
+
+
+class CheckQueue(object):
+    """
+    Runs the encode, upload and match work of visual checks on a bounded pool of worker threads.
+
+    Each check is split into a `prepare` step (encoding the match data) which runs concurrently,
+    and a `send` step (the match request) which runs in submission order, so the steps of an
+    Eyes session reach the server in the same order the test took them.
+
+    `submit` blocks while `max_pending` checks or `max_pending_bytes` of screenshot data are
+    already in flight, which keeps a fast test from queueing an unbounded number of screenshots.
+    """
+
+    def __init__(self, workers=4, max_pending=16, max_pending_bytes=256 * 1024 * 1024):
+        if workers < 1:
+            raise ValueError("At least one worker is required, got %d" % workers)
+        self._max_pending = max(1, max_pending)
+        self._max_pending_bytes = max_pending_bytes
+        self._jobs = Queue.Queue()
+        self._lock = threading.Condition()
+        self._pending = 0
+        self._pending_bytes = 0
+        self._next_seq = 0
+        self._next_send = 0
+        self._checks = []
+        self._threads = []
+        for _ in range(workers):
+            thread = threading.Thread(target=self._work, name='RobotAppEyes-check-worker')
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, tag, prepare, send, nbytes=0):
+        """
+        Queues a check and returns its PendingCheck. Blocks while the queue is full.
+        An oversized check is still accepted once nothing else is in flight.
+        """
+        with self._lock:
+            while self._pending and (self._pending >= self._max_pending or
+                                     self._pending_bytes + nbytes > self._max_pending_bytes):
+                self._lock.wait()
+            check = PendingCheck(self._next_seq, tag, prepare, send, nbytes)
+            self._next_seq += 1
+            self._pending += 1
+            self._pending_bytes += nbytes
+            self._checks.append(check)
+            # Queued under the lock, so the workers get the checks in the order of their sequence numbers: a worker
+            # holding a later check would wait for an earlier one that no worker has taken.
+            self._jobs.put(check)
+        return check
+
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def wait(self):
+        """
+        Blocks until every submitted check has finished and returns them in submission order.
+        """
+        with self._lock:
+            while self._pending:
+                self._lock.wait()
+            checks, self._checks = self._checks, []
+        return checks
+
+    def shutdown(self):
+        """
+        Waits for the submitted checks and stops the worker threads.
+        """
+        checks = self.wait()
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        return checks
+
+    def _work(self):
+        while True:
+            check = self._jobs.get()
+            if check is None:
+                return
+            payload = None
+            try:
+                payload = check._prepare()
+            except Exception as e:
+                check.error = e
+            with self._lock:
+                while self._next_send != check.seq:
+                    self._lock.wait()
+            try:
+                if check.error is None:
+                    check.result = check._send(payload)
+            except Exception as e:
+                check.error = e
+            finally:
+                # Drop the references to the screenshot data before releasing the slot.
+                payload = None
+                check._prepare = check._send = None
+                with self._lock:
+                    self._next_send += 1
+                    self._pending -= 1
+                    self._pending_bytes -= check.nbytes
+                    self._lock.notify_all()
+                check._done.set()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import collections
+from applitools.errors import EyesError
+
+# What is done with a check whose screenshot repeats a recent one: it is held back and not reported,
+# it is held back and reported with the result of the recent one, or its step is sent at once. A held
+# back step is only sent when a later step is, with the encoded screenshot of the recent one.
+SKIP = 'skip'
+REUSE = 'reuse'
+RECORD = 'record'
+POLICIES = (SKIP, REUSE, RECORD)
+# Whether a screenshot only repeats a recent one of the same tag, or any recent one of the session.
+TAG = 'tag'
+SESSION = 'session'
+SCOPES = (TAG, SESSION)
+
+
+class RecentCheck(object):
+    """
+    A check sent to Eyes, remembered by a DuplicateFilter. `as_expected` is set once Eyes matched it,
+    and `data`, the body of its match request, once it was encoded.
+    """
+
+    def __init__(self, key, tag):
+        self.key = key
+        self.tag = tag
+        self.as_expected = None
+        self.data = None
+
+
+class DuplicateFilter(object):
+    """
+    The last `size` checks sent to Eyes in a session, keyed by the hash of their screenshot, so a check
+    whose screenshot exactly repeats one of them is handled by the policy instead of being uploaded again.
+    The checks are kept in a ring, the oldest is forgotten when a new one is remembered, and a repeated check
+    becomes the most recent again.
+
+    The counts are kept by the thread of the test; `as_expected` and `data` are set by the thread sending
+    the check.
+    """
+
+    def __init__(self, policy=SKIP, scope=TAG, size=8):
+        policy, scope = policy.lower(), scope.lower()
+        if policy not in POLICIES:
+            raise EyesError("'%s' is not a duplicate screenshot policy, use one of: %s" % (policy, ', '.join(POLICIES)))
+        if scope not in SCOPES:
+            raise EyesError("'%s' is not a duplicate screenshot scope, use one of: %s" % (scope, ', '.join(SCOPES)))
+        self.policy = policy
+        self.scope = scope
+        self.skipped = 0
+        self.reused = 0
+        self.recorded = 0
+        self._recent = collections.deque(maxlen=max(1, size))
+
+    def key(self, image_hash, tag, match_level):
+        return (image_hash, tag if self.scope == TAG else None, match_level)
+
+    def repeat_of(self, key):
+        """
+        Returns the recent check the check with this key repeats, counting the repeat, or None.
+        """
+        for recent in reversed(self._recent):
+            if recent.key == key:
+                break
+        else:
+            return None
+        self._recent.remove(recent)
+        self._recent.append(recent)
+        if self.policy == SKIP:
+            self.skipped += 1
+        elif self.policy == REUSE:
+            self.reused += 1
+        else:
+            self.recorded += 1
+        return recent
+
+    def remember(self, key, tag):
+        """
+        Adds a check that is about to be sent and returns its RecentCheck.
+        """
+        recent = RecentCheck(key, tag)
+        self._recent.append(recent)
+        return recent
+
+    def forget(self, recent):
+        """
+        Removes a check whose screenshot can not stand for its result, such as a check that was retried.
+        """
+        if recent in self._recent:
+            self._recent.remove(recent)
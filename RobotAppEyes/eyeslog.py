@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import sys
+import json
+import time
+import zlib
+import logging
+import threading
+import itertools
+import contextlib
+import collections
+from applitools import logger
+from applitools.errors import EyesError
+
+# Where an EyesLog writes its records, when it is not given a file.
+ROBOT = 'robot'
+STDOUT = 'stdout'
+LEVELS = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO}
+# The seconds the writer thread waits for records before writing them.
+FLUSH_INTERVAL = 0.5
+
+# The correlation ID of the check running on each thread.
+_local = threading.local()
+_check_ids = itertools.count(1)
+# The close function of the logger module of the SDK and the logger it had, while install replaced them.
+_sdk_close = None
+_sdk_logger = None
+
+
+def install(eyes_log):
+    """
+    Makes an EyesLog the logger of the Eyes SDK, closing the logger it had. The SDK closes its logger, and forgets
+    it until the next Eyes session is opened, whenever any session is closed or aborted, which would stop the log
+    of the sessions still open: an EyesLog is only flushed then, and stays the logger of the SDK until it is shut
+    down, see uninstall.
+    """
+    global _sdk_close, _sdk_logger
+    if _sdk_close is None:
+        _sdk_close, _sdk_logger = logger.close, logger._logger_to_use
+        logger.close = _close
+    _sdk_close()
+    logger.set_logger(eyes_log)
+    logger.open_()
+
+
+def uninstall(eyes_log):
+    """
+    Gives the Eyes SDK back its close function and the logger it had before install, when `eyes_log` is its logger.
+    """
+    global _sdk_close, _sdk_logger
+    if _sdk_close is None or logger._logger_to_use is not eyes_log:
+        return
+    sdk_close, logger.close, _sdk_close = _sdk_close, _sdk_close, None
+    sdk_close()
+    logger.set_logger(_sdk_logger)
+    _sdk_logger = None
+
+
+def _close():
+    if isinstance(logger._logger, EyesLog):
+        logger._logger.close()
+    else:
+        _sdk_close()
+
+
+def correlation_id():
+    """
+    Returns the correlation ID of the check running on the calling thread, or None.
+    """
+    return getattr(_local, 'check_id', None)
+
+
+@contextlib.contextmanager
+def check(keyword, tag):
+    """
+    Gives the check keyword run on the calling thread a correlation ID, which the Eyes log records of the check
+    carry. The first record of a check names its keyword and tag, so the ID of a check can be found by its tag.
+    The IDs are unique to the process: its PID and a count.
+    """
+    saved = getattr(_local, 'check_id', None)
+    _local.check_id = '%d-%d' % (os.getpid(), next(_check_ids))
+    try:
+        logger.info("%s '%s'" % (keyword, tag))
+        yield _local.check_id
+    finally:
+        _local.check_id = saved
+
+
+def bind(function):
+    """
+    Returns a function that runs `function` under the correlation ID of the check running on the calling thread,
+    for work that is handed to another thread.
+    """
+    check_id = getattr(_local, 'check_id', None)
+    if check_id is None:
+        return function
+
+    def bound(*args, **kwargs):
+        saved = getattr(_local, 'check_id', None)
+        _local.check_id = check_id
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.check_id = saved
+    return bound
+
+
+class EyesLog(object):
+    """
+    A logger for the Eyes SDK, in place of its StdoutLogger and FileLogger, that keeps the records in a ring of
+    `capacity` records instead of writing them on the thread logging them. The oldest records are dropped when the
+    ring is full, and counted. A record is a tuple; it is only formatted when it is written.
+
+    The records of a file or of stdout are written by a background thread, every FLUSH_INTERVAL seconds or as soon
+    as the ring is half full. A file whose name ends with .jsonl gets a JSON object per record, any other file and
+    stdout a line per record. Robot Framework only takes log messages from the thread of the test, so the records
+    meant for the Robot log are kept until the keywords take them with `drain`.
+
+    Records below `level` are dropped as they are logged. `sampling` is the share of checks whose records are kept,
+    from 0 to 1: whether a check is kept is decided from its correlation ID, so all the records of a check are kept
+    or none are. The records logged outside a check are always kept.
+    """
+
+    def __init__(self, target=STDOUT, level='DEBUG', sampling=1.0, capacity=10000):
+        if level.upper() not in LEVELS:
+            raise EyesError("'%s' is not an Eyes log level, use one of: %s" % (level, ', '.join(sorted(LEVELS))))
+        sampling = float(sampling)
+        if not 0 <= sampling <= 1:
+            raise EyesError('The Eyes log sampling must be between 0 and 1, not %s' % sampling)
+        self.target = target.lower() if target.lower() in (ROBOT, STDOUT) else target
+        self.level = LEVELS[level.upper()]
+        self.sampling = sampling
+        self.capacity = max(1, capacity)
+        self.written = 0
+        self.dropped = 0
+        self._records = collections.deque(maxlen=self.capacity)
+        self._dropped_lock = threading.Lock()
+        # Held while records are taken from the ring and written, so they are written in order.
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._output = None
+
+    @property
+    def settings(self):
+        return self.target, self.level, self.sampling, self.capacity
+
+    # The logger interface of the Eyes SDK, which opens and closes its logger with each Eyes session.
+
+    def open(self):
+        if self.target == ROBOT or self._thread is not None:
+            return
+        if self.target == STDOUT:
+            # Robot Framework captures sys.stdout while a keyword runs.
+            self._output = sys.__stdout__
+        else:
+            self._output = open(self.target, 'a')
+        self._stopping = False
+        self._thread = threading.Thread(target=self._write_continuously, name='RobotAppEyes-eyes-log')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        """
+        Writes the records logged so far. The writer thread keeps running for the next Eyes session, see shutdown.
+        """
+        if self._thread is not None:
+            self.flush()
+
+    def info(self, msg):
+        self._add(logging.INFO, msg)
+
+    def debug(self, msg):
+        self._add(logging.DEBUG, msg)
+
+    def _add(self, level, msg):
+        if level < self.level:
+            return
+        check_id = getattr(_local, 'check_id', None)
+        if check_id is not None and self.sampling < 1 \
+                and (zlib.crc32(check_id) & 0xffffffff) >= self.sampling * 0x100000000:
+            return
+        records = self._records
+        if len(records) == self.capacity:
+            with self._dropped_lock:
+                self.dropped += 1
+        records.append((time.time(), level, threading.current_thread().name, check_id, msg))
+        if self._thread is not None and len(records) * 2 >= self.capacity:
+            self._wake.set()
+
+    def take_dropped(self):
+        """
+        Returns the number of records dropped since the last call.
+        """
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def drain(self):
+        """
+        Returns the formatted lines of the records logged since the last call, for the Robot log.
+        """
+        with self._write_lock:
+            records = self._take()
+            self.written += len(records)
+        return [self.format_line(record) for record in records]
+
+    def flush(self):
+        """
+        Writes the records logged so far on the calling thread.
+        """
+        with self._write_lock:
+            self._write(self._take())
+
+    def shutdown(self):
+        """
+        Writes the records left and stops the writer thread. The Eyes SDK gets back the logger it had before, when
+        this is its logger.
+        """
+        uninstall(self)
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        thread.join()
+        self.flush()
+        if self._output is not sys.__stdout__:
+            self._output.close()
+        self._output = None
+
+    def _write_continuously(self):
+        while not self._stopping:
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+    def _take(self):
+        records = []
+        pop = self._records.popleft
+        while True:
+            try:
+                records.append(pop())
+            except IndexError:
+                break
+        return records
+
+    def _write(self, records):
+        if not records or self._output is None:
+            return
+        if self.target.endswith('.jsonl'):
+            lines = [self.format_json(record) for record in records]
+        else:
+            lines = [self.format_line(record) for record in records]
+        text = '\n'.join(lines) + '\n'
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        self._output.write(text)
+        self._output.flush()
+        self.written += len(records)
+
+    @staticmethod
+    def format_line(record):
+        created, level, thread, check_id, msg = record
+        return '%s.%03d [%s] [%s] [%s] %s' % (time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)),
+                                              int(created * 1000) % 1000, logging.getLevelName(level), thread,
+                                              check_id or '-', msg)
+
+    @staticmethod
+    def format_json(record):
+        created, level, thread, check_id, msg = record
+        if isinstance(msg, str):
+            msg = msg.decode('utf-8', 'replace')
+        return json.dumps({'time': round(created, 3), 'level': logging.getLevelName(level), 'thread': thread,
+                           'check': check_id, 'message': msg}, sort_keys=True)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import copy
+import time
+import zlib
+import base64
+import struct
+from applitools.errors import EyesError
+from imagesource import PNG_SIGNATURE, png_chunk
+
+# As in the SDK: the height cut from each part, so scroll bars and fixed footers are not stitched
+# into the page, and the smallest part height.
+_MAX_SCROLL_BAR_SIZE = 50
+_MIN_PART_HEIGHT = 10
+# The seconds the page is given to settle after each scroll, as in the SDK.
+_SCROLL_WAIT = 0.1
+# The size of the pieces of the canvas compressed at a time.
+_COMPRESS_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class _CanvasRows(object):
+    """
+    The rows of a CanvasImage, read as PngImage.pixel_bytes. Each row is copied when it is read.
+    """
+
+    def __init__(self, canvas):
+        self._canvas = canvas
+
+    def __len__(self):
+        return self._canvas.height
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[y] for y in xrange(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('row index out of range')
+        return self._canvas.row(index)
+
+    def __iter__(self):
+        for y in xrange(len(self)):
+            yield self._canvas.row(y)
+
+
+class CanvasImage(object):
+    """
+    An image in place of the PngImage of the SDK, whose pixels are held in one bytearray laid out as
+    the rows of a PNG, each row after its filter byte. The stitched parts of a page are copied
+    straight into it, and it is compressed as it is, so the image is never held twice.
+    """
+
+    def __init__(self, width, height, pixel_size, meta_info):
+        self.width = width
+        self.height = height
+        self.pixel_size = pixel_size
+        self.meta_info = copy.copy(meta_info)
+        self.meta_info['size'] = (width, height)
+        self._stride = 1 + width * pixel_size
+        # Zeroed, so each row starts with the None filter.
+        self._buffer = bytearray(height * self._stride)
+
+    @property
+    def pixel_bytes(self):
+        # Not kept as an attribute, the reference cycle would keep the canvas alive until the next collection.
+        return _CanvasRows(self)
+
+    def row(self, y):
+        start = y * self._stride + 1
+        return self._buffer[start:start + self._stride - 1]
+
+    def paste_rows(self, left, top, rows):
+        """
+        Copies the rows of an image into the canvas with their top left pixel at (left, top), one row
+        at a time, clipping what falls outside. Returns the bottom of the rows that were copied.
+        """
+        if left >= self.width:
+            return top
+        length = (self.width - left) * self.pixel_size
+        y = top
+        for row in rows:
+            if y >= self.height:
+                break
+            if y >= 0:
+                start = y * self._stride + 1 + left * self.pixel_size
+                part = row[:length]
+                self._buffer[start:start + len(part)] = part
+            y += 1
+        return y
+
+    def truncate(self, height):
+        """
+        Drops the rows from `height` down, in place.
+        """
+        if height < self.height:
+            del self._buffer[height * self._stride:]
+            self.height = height
+            self.meta_info['size'] = (self.width, height)
+
+    def get_subimage(self, region):
+        """
+        :return PngImage:
+        """
+        from applitools.utils._image_utils import PngImage
+        if region.is_empty():
+            raise EyesError('region is empty!')
+        x_start = region.left * self.pixel_size
+        x_end = x_start + region.width * self.pixel_size
+        rows = [self.row(y)[x_start:x_end] for y in xrange(region.top, region.top + region.height)]
+        meta_info = copy.copy(self.meta_info)
+        meta_info['size'] = (region.width, region.height)
+        return PngImage(region.width, region.height, rows, meta_info)
+
+    def write(self, output):
+        output.write(self.get_bytes())
+
+    def get_base64(self):
+        return base64.b64encode(self.get_bytes())
+
+    def get_bytes(self):
+        """
+        :return: The image PNG bytes, compressed from the canvas without copying it.
+        """
+        colour_type = (0 if self.meta_info['greyscale'] else 2) | (4 if self.meta_info['alpha'] else 0)
+        chunks = [png_chunk('IHDR', struct.pack('>LLBBBBB', self.width, self.height, 8, colour_type, 0, 0, 0))]
+        gamma = self.meta_info.get('gamma')
+        if gamma is not None:
+            chunks.append(png_chunk('gAMA', struct.pack('>L', int(round(gamma * 100000)))))
+        # An IDAT chunk per piece, so the compressed image is only joined once.
+        compressor = zlib.compressobj()
+        for offset in xrange(0, len(self._buffer), _COMPRESS_CHUNK_SIZE):
+            compressed = compressor.compress(buffer(self._buffer, offset, _COMPRESS_CHUNK_SIZE))
+            if compressed:
+                chunks.append(png_chunk('IDAT', compressed))
+        chunks.append(png_chunk('IDAT', compressor.flush()))
+        chunks.append(png_chunk('IEND', ''))
+        return PNG_SIGNATURE + ''.join(chunks)
+
+
+def _decode(screenshot64):
+    """
+    Returns the width, height, rows iterator and meta info of a base64 PNG screenshot. The rows are
+    decoded as they are read.
+    """
+    import png
+    width, height, rows, meta_info = png.Reader(bytes=base64.b64decode(screenshot64)).asDirect()
+    if meta_info['bitdepth'] != 8:
+        raise EyesError('Screenshots of %d bits per channel can not be stitched' % meta_info['bitdepth'])
+    return width, height, rows, meta_info
+
+
+def _pixel_size(meta_info):
+    return (1 if meta_info['greyscale'] else 3) + (1 if meta_info['alpha'] else 0)
+
+
+def page_segments(page_height, segment_height=None):
+    """
+    Returns the (top, height) of the segments a page is checked in, all of `segment_height` pixels
+    but the last one, or the whole page when no segment height is given.
+    """
+    if not segment_height or segment_height >= page_height:
+        return [(0, page_height)]
+    return [(top, min(segment_height, page_height - top)) for top in xrange(0, page_height, segment_height)]
+
+
+def stitched_segments(driver, segment_height=None):
+    """
+    Scrolls an EyesWebDriver over the page and yields the page as CanvasImages of at most
+    `segment_height` pixels, one after the other, as (number, count, image), scrolling over the
+    parts of each segment only once the previous segment was yielded. Each part's screenshot is decoded a row at a time
+    straight into the canvas and dropped, so about one canvas is held at a time.
+
+    The page is stitched as the SDK stitches it: from parts the size of the screenshot less the
+    scroll bar size, each pasted at the scroll position the browser reached. A page that fits in
+    the first screenshot is yielded as the SDK's PngImage. The frame and scroll position are
+    restored when the generator finishes or is closed.
+    """
+    from applitools.geometry import Point, Region
+    from applitools.utils import _image_utils
+    original_frame = driver.get_frame_chain()
+    original_scroll_position = driver.get_current_scroll_position()
+    driver.switch_to.default_content()
+    try:
+        driver.scroll_to(Point(0, 0))
+        position = driver.get_current_scroll_position()
+        if position.x != 0 or position.y != 0:
+            raise EyesError('Couldn\'t scroll to the top/left part of the screen!')
+        page_size = driver.get_entire_page_size()
+        first64 = driver.get_screenshot_as_base64()
+        width, height, rows, meta_info = _decode(first64)
+        if width >= page_size['width'] and height >= page_size['height']:
+            yield 1, 1, _image_utils.PngImage(width, height, list(rows), meta_info)
+            return
+        rows = None
+        pixel_size = _pixel_size(meta_info)
+        part_size = {'width': width, 'height': max(height - _MAX_SCROLL_BAR_SIZE, _MIN_PART_HEIGHT)}
+        page_width, page_height = max(width, page_size['width']), max(height, page_size['height'])
+        parts = Region(0, 0, page_size['width'], page_size['height']).get_sub_regions(part_size)
+        segments = page_segments(page_height, segment_height)
+        for number, (top, canvas_height) in enumerate(segments, 1):
+            bottom = top + canvas_height
+            canvas = CanvasImage(page_width, canvas_height, pixel_size, meta_info)
+            covered = top
+            for part in parts:
+                # A part covers the screenshot's height from where the browser scrolled to, which is
+                # at most the part's top.
+                if part.top >= bottom or part.top + height <= top:
+                    continue
+                if part.left == 0 and part.top == 0:
+                    part64, x, y = first64, 0, 0
+                else:
+                    driver.scroll_to(Point(part.left, part.top))
+                    time.sleep(_SCROLL_WAIT)
+                    position = driver.get_current_scroll_position()
+                    x, y = position.x, position.y
+                    part64 = driver.get_screenshot_as_base64()
+                part_width, part_height, part_rows, part_meta_info = _decode(part64)
+                part64 = None
+                if _pixel_size(part_meta_info) != pixel_size:
+                    raise EyesError('The screenshots of the page parts do not have the same pixel format')
+                covered = max(covered, canvas.paste_rows(x, y - top, part_rows) + top)
+                part_rows = None
+            if bottom == page_height:
+                # The browser may not scroll as far down as the page height it reports.
+                canvas.truncate(covered - top)
+            yield number, len(segments), canvas
+            canvas = None
+    finally:
+        driver.switch_to.frames(original_frame)
+        driver.scroll_to(original_scroll_position)
+
+
+def full_page_screenshot(driver):
+    """
+    Returns the whole page as one CanvasImage, see stitched_segments.
+    """
+    segments = stitched_segments(driver)
+    try:
+        return next(segments)[2]
+    finally:
+        segments.close()
+
+
+def install(eyes):
+    """
+    Makes the EyesWebDriver of an open Eyes instance take its full page screenshots with
+    full_page_screenshot instead of the SDK's stitching.
+    """
+    driver = eyes._driver
+    driver.get_full_page_screenshot = lambda: full_page_screenshot(driver)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import glob
+import time
+from applitools.errors import EyesError
+from imagesource import PngFile
+
+
+def find_images(path):
+    """
+    Returns the sorted list of PNG files in a directory, or the files matching a glob pattern.
+    """
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path)
+                      if name.lower().endswith('.png'))
+    return sorted(glob.glob(path))
+
+
+class ImageResult(object):
+    """
+    The outcome of comparing one file of a batch.
+    """
+    MATCHED = 'Matched'
+    MISMATCHED = 'Mismatched'
+    FAILED = 'Failed'
+    # Held back by the screenshot cache or the duplicate screenshot filter, see Open Eyes Session, and not sent yet:
+    # the step is sent to Eyes before the next check of the session that is sent, or reported missing at close.
+    HELD_BACK = 'Held back'
+
+    def __init__(self, path, tag):
+        self.path = path
+        self.tag = tag
+        self.nbytes = 0
+        self.status = None
+        self.error = None
+        self._check = None
+
+
+class ImageBatch(object):
+    """
+    Streams image files to a match stage running on a CheckQueue. Each file is memory-mapped as a
+    PngFile and copied straight into its match request, without being decoded, and the CheckQueue
+    bounds the screenshots waiting to be matched, so memory does not grow with the number of files.
+    Results are returned in the order of the files.
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.elapsed = 0.0
+
+    def run(self, submit):
+        """
+        Compares every file. submit(tag, image, nbytes) matches a PngFile and returns its
+        PendingCheck, or, when the check was held back, a function returning the PendingCheck of
+        its step once a later check sent it, None until then.
+        """
+        start = time.time()
+        results = []
+        for path in self.paths:
+            result = ImageResult(path, os.path.basename(path))
+            try:
+                image = PngFile(path)
+            except (EyesError, EnvironmentError) as e:
+                result.status = ImageResult.FAILED
+                result.error = e
+            else:
+                result.nbytes = image.size
+                result._check = submit(result.tag, image, result.nbytes)
+            results.append(result)
+        for result in results:
+            if callable(result._check):
+                result._check = result._check()
+                if result._check is None:
+                    result.status = ImageResult.HELD_BACK
+            if result._check is None:
+                continue
+            result._check.wait()
+            if result._check.error is not None:
+                result.status = ImageResult.FAILED
+                result.error = result._check.error
+            elif result._check.result:
+                result.status = ImageResult.MATCHED
+            else:
+                result.status = ImageResult.MISMATCHED
+            result._check = None
+        self.elapsed = time.time() - start
+        return results
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import io
+import mmap
+import zlib
+import struct
+from applitools.errors import EyesError
+from applitools.utils import _image_utils, general_utils
+
+PNG_SIGNATURE = '\x89PNG\r\n\x1a\n'
+# Number of samples per pixel for each PNG colour type.
+_PNG_PLANES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+class PngFile(object):
+    """
+    A PNG file mapped into memory. The width and height are read from the PNG header and the
+    pixels are only decoded when get_image is called, so an image that is sent to Eyes unchanged
+    is never decoded, and its bytes are read once, straight into the match request.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as image_file:
+            try:
+                self._data = mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, EnvironmentError):
+                # Empty files (and some special files) can not be mapped.
+                raise EyesError("'%s' is not a PNG image" % path)
+        if self._data[:8] != PNG_SIGNATURE or self._data[12:16] != 'IHDR':
+            self.close()
+            raise EyesError("'%s' is not a PNG image" % path)
+        self.width, self.height, bit_depth, colour_type = struct.unpack('>LLBB', self._data[16:26])
+        self.pixel_size = _PNG_PLANES.get(colour_type, 4) * max(bit_depth // 8, 1)
+        self._image = None
+
+    @property
+    def size(self):
+        return len(self._data)
+
+    def read_into(self, buf, offset=0):
+        """
+        Reads the PNG bytes into a bytearray, starting at offset. The file is read straight into
+        the bytearray, assigning the memory map to a slice of it would copy it first.
+        """
+        view = memoryview(buf)[offset:offset + self.size]
+        with io.open(self.path, 'rb', buffering=0) as image_file:
+            while len(view):
+                count = image_file.readinto(view)
+                if not count:
+                    raise EyesError("'%s' changed while it was being read" % self.path)
+                view = view[count:]
+
+    def get_bytes(self):
+        return self._data[:]
+
+    def update_digest(self, digest):
+        """
+        Feeds the PNG bytes to a hashlib object without copying them.
+        """
+        digest.update(self._data)
+
+    def get_image(self):
+        """
+        Returns:
+            (PngImage) The decoded image. Decoded on the first call.
+        """
+        if self._image is None:
+            self._data.seek(0)
+            self._image = _image_utils.png_image_from_file(self._data)
+        return self._image
+
+    def close(self):
+        self._image = None
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+
+def png_chunk(chunk_type, data):
+    """
+    Returns a PNG chunk: its length, type, data and CRC.
+    """
+    crc = zlib.crc32(data, zlib.crc32(chunk_type)) & 0xffffffff
+    return struct.pack('>L', len(data)) + chunk_type + data + struct.pack('>L', crc)
+
+
+def create_match_data(app_output, user_inputs, tag, ignore_mismatch, screenshot):
+    """
+    Builds the body of an Eyes match request, in the same format as the MatchWindowTask of the SDK.
+    A PngFile is copied once, straight into the body, any other screenshot is asked for its bytes.
+    """
+    header = _match_header(app_output, user_inputs, tag, ignore_mismatch)
+    if not isinstance(screenshot, PngFile):
+        return header + screenshot.get_bytes()
+    body = bytearray(len(header) + screenshot.size)
+    body[:len(header)] = header
+    screenshot.read_into(body, len(header))
+    return body
+
+
+def retag_match_data(data, app_output, user_inputs, tag, ignore_mismatch):
+    """
+    Builds the body of a match request sending the screenshot of an earlier body again, without encoding it again.
+    """
+    start = 4 + struct.unpack('>L', bytes(data[:4]))[0]
+    header = _match_header(app_output, user_inputs, tag, ignore_mismatch)
+    body = bytearray(len(header) + len(data) - start)
+    body[:len(header)] = header
+    body[len(header):] = buffer(data, start)
+    return body
+
+
+def _match_header(app_output, user_inputs, tag, ignore_mismatch):
+    match_data = dict(appOutput=app_output, userInputs=user_inputs, tag=tag, ignoreMismatch=ignore_mismatch)
+    match_data_json_bytes = general_utils.to_json(match_data).encode('utf-8')
+    return struct.pack(">L", len(match_data_json_bytes)) + match_data_json_bytes
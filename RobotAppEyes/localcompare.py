@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import re
+import json
+import errno
+import struct
+import shutil
+import itertools
+import threading
+import png
+from applitools.errors import EyesError
+from applitools.test_results import TestResults
+
+# NumPy is imported by the first LocalAgentConnector, it is optional and slow to import.
+numpy = None
+
+EXACT = 'exact'
+TOLERANCE = 'tolerance'
+ANTI_ALIAS = 'antialias'
+MODES = (EXACT, TOLERANCE, ANTI_ALIAS)
+
+# The contrast of a 3x3 neighbourhood above which a pixel is considered to lie on an edge.
+_EDGE_CONTRAST = 64
+_UNSAFE_NAME = re.compile(r'[^\w.-]+')
+
+
+def _safe_name(name):
+    return _UNSAFE_NAME.sub('_', u'%s' % (name,)).strip('_') or '_'
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def _split_match_data(data):
+    """
+    Splits the body of a match request into its match data and PNG bytes.
+    """
+    size = struct.unpack('>L', bytes(data[:4]))[0]
+    match_data = json.loads(bytes(data[4:4 + size]).decode('utf-8'))
+    return match_data, bytes(data[4 + size:])
+
+
+def _import_numpy():
+    global numpy
+    if numpy is not None:
+        return
+    try:
+        import numpy as module
+    except ImportError:
+        raise EyesError('The local comparison needs NumPy, install it with: pip install numpy')
+    numpy = module
+
+
+class ComparisonResult(object):
+    """
+    The outcome of comparing one step with its baseline. The mask holds one bit per pixel, set
+    where the pixels differ, packed row by row with numpy.packbits; it is None when the images
+    match or their sizes differ.
+    """
+
+    def __init__(self, step, tag, width, height):
+        self.step = step
+        self.tag = tag
+        self.width = width
+        self.height = height
+        self.mismatched_pixels = 0
+        self.mismatch_percent = 0.0
+        self.mask = None
+        self.is_new = False
+        self.diff_path = None
+        self.actual_path = None
+
+    @property
+    def as_expected(self):
+        return self.mismatched_pixels == 0
+
+    def mask_rows(self):
+        """
+        Yields the rows of the mask as arrays of 0 and 1.
+        """
+        for packed in self.mask:
+            yield numpy.unpackbits(packed)[:self.width]
+
+
+class LocalAgentConnector(object):
+    """
+    A replacement for the AgentConnector of the Eyes SDK that matches screenshots against a local
+    baseline directory instead of the Eyes server, so the same keywords run without a network.
+
+    The baseline of a test is the directory <app>/<test>/<environment> holding one PNG per step,
+    where the environment is the baseline name or the viewport size. Steps are paired with the
+    baseline by their order, as Eyes does: a screenshot matched with ignoreMismatch that does not
+    match is replaced by the next attempt of the same tag, else it is the step. A test without a
+    baseline is new, its screenshots are saved as the baseline when the session is closed. The
+    screenshots and diff masks of the steps that do not match are written to the 'results'
+    directory next to the baseline.
+
+    The images are compared `tile_rows` rows at a time, so the working memory does not grow with
+    the height of full page screenshots:
+    - exact: any difference in any channel is a mismatch.
+    - tolerance: channels may differ by up to `tolerance`.
+    - antialias: as tolerance, and pixels on an edge whose value lies within the range of their
+      neighbours in the other image are ignored, which is how anti-aliasing differs between runs.
+    """
+
+    def __init__(self, baseline_dir, mode=EXACT, tolerance=0, tile_rows=256):
+        _import_numpy()
+        if mode not in MODES:
+            raise EyesError("Unknown comparison mode '%s', use one of: %s" % (mode, ', '.join(MODES)))
+        self.baseline_dir = baseline_dir
+        self.mode = mode
+        self.tolerance = int(tolerance) if mode != EXACT else 0
+        self.tile_rows = tile_rows
+        self.api_key = None
+        self.server_url = baseline_dir
+        self.results = []
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def start_session(self, session_start_info):
+        environment = session_start_info.get('envName')
+        if not environment:
+            display = session_start_info['environment'].get('displaySize') or {}
+            environment = '%sx%s' % (display.get('width'), display.get('height'))
+        path = os.path.join(self.baseline_dir, _safe_name(session_start_info['appIdOrName']),
+                            _safe_name(session_start_info['scenarioIdOrName']), _safe_name(environment))
+        baseline = sorted(name for name in os.listdir(path) if name.endswith('.png')) \
+            if os.path.isdir(path) else []
+        results_path = os.path.join(path, 'results')
+        shutil.rmtree(results_path, True)
+        with self._lock:
+            self._sessions[path] = {'baseline': baseline, 'steps': [], 'results_path': results_path, 'pending': None}
+        return dict(session_id=path, session_url=path, is_new_session=not baseline)
+
+    def match_window(self, running_session, data):
+        path = running_session['session_id']
+        session = self._sessions[path]
+        match_data, png_bytes = _split_match_data(data)
+        pending = session['pending']
+        session['pending'] = None
+        if pending is not None and pending[0].tag != match_data['tag']:
+            # The attempt was not retried, it is the step.
+            self._record(session, *pending)
+        step = len(session['steps'])
+        result = self._compare(path, session['baseline'], step, match_data['tag'], png_bytes)
+        if not result.as_expected and match_data['ignoreMismatch']:
+            # As in Eyes, an attempt of the same tag that follows replaces it.
+            session['pending'] = (result, png_bytes)
+            return False
+        self._record(session, result, png_bytes)
+        return result.as_expected
+
+    def stop_session(self, running_session, is_aborted, save):
+        path = running_session['session_id']
+        with self._lock:
+            session = self._sessions.pop(path)
+        if session['pending'] is not None:
+            self._record(session, *session['pending'])
+        steps = session['steps']
+        mismatches = len([result for result in steps if not result.as_expected])
+        missing = max(len(session['baseline']) - len(steps), 0)
+        if save and not is_aborted:
+            self._save_baseline(path, session)
+        return TestResults(len(steps), len(steps) - mismatches, mismatches, missing)
+
+    def _record(self, session, result, png_bytes):
+        """
+        Makes a compared screenshot the next step of a session, writing it and its diff mask to the results when it
+        did not match or is new.
+        """
+        step = result.step
+        if not result.as_expected or result.is_new:
+            result.actual_path = self._write_result(session['results_path'], step, 'actual', png_bytes)
+            if result.mask is not None:
+                result.diff_path = self._write_mask(session['results_path'], step, result)
+        session['steps'].append(result)
+        with self._lock:
+            self.results.append(result)
+
+    @staticmethod
+    def _step_name(step):
+        return 'step-%04d.png' % (step + 1)
+
+    def _compare(self, path, baseline, step, tag, png_bytes):
+        if step >= len(baseline):
+            width, height = png.Reader(bytes=png_bytes).read()[:2]
+            result = ComparisonResult(step, tag, width, height)
+            result.is_new = True
+            if baseline:
+                # A step added to an existing baseline has nothing to match, as in Eyes.
+                result.mismatched_pixels = width * height
+                result.mismatch_percent = 100.0
+            return result
+        with open(os.path.join(path, baseline[step]), 'rb') as baseline_file:
+            expected_bytes = baseline_file.read()
+        actual = png.Reader(bytes=png_bytes).asRGBA8()
+        result = ComparisonResult(step, tag, actual[0], actual[1])
+        if expected_bytes == png_bytes:
+            return result
+        expected = png.Reader(bytes=expected_bytes).asRGBA8()
+        if expected[:2] != actual[:2]:
+            result.mismatched_pixels = result.width * result.height
+            result.mismatch_percent = 100.0
+            return result
+        mask = []
+        for actual_tile, expected_tile in itertools.izip(self._tiles(actual), self._tiles(expected)):
+            tile_mask = self._compare_tile(actual_tile, expected_tile)
+            result.mismatched_pixels += int(numpy.count_nonzero(tile_mask))
+            mask.append(numpy.packbits(tile_mask, axis=1))
+        if result.mismatched_pixels:
+            result.mask = numpy.concatenate(mask)
+            result.mismatch_percent = 100.0 * result.mismatched_pixels / (result.width * result.height)
+        return result
+
+    def _tiles(self, image):
+        """
+        Yields the image `tile_rows` rows at a time, each tile with the row above and below it, as
+        (rows + 2, width, 4) uint8 arrays. The edge rows are repeated at the top and bottom.
+        The same buffer is reused for every tile.
+        """
+        width, rows = image[0], iter(image[2])
+        tile = numpy.empty((self.tile_rows + 2, width, 4), numpy.uint8)
+        flat = tile.reshape(self.tile_rows + 2, width * 4)
+        flat[1] = numpy.frombuffer(next(rows), numpy.uint8)
+        tile[0] = tile[1]
+        count = 1
+        while True:
+            # Reads the rest of the tile and the first row of the next one.
+            for row in itertools.islice(rows, self.tile_rows + 1 - count):
+                count += 1
+                flat[count] = numpy.frombuffer(row, numpy.uint8)
+            if count <= self.tile_rows:
+                tile[count + 1] = tile[count]
+                yield tile[:count + 2]
+                return
+            yield tile
+            tile[0] = tile[self.tile_rows]
+            tile[1] = tile[self.tile_rows + 1]
+            count = 1
+
+    def _compare_tile(self, actual, expected):
+        """
+        Returns the boolean mask of the differing pixels of a tile, without the neighbour rows.
+        """
+        inner_actual, inner_expected = actual[1:-1], expected[1:-1]
+        if self.mode == EXACT:
+            return (inner_actual != inner_expected).any(axis=2)
+        difference = numpy.abs(inner_actual.astype(numpy.int16) - inner_expected)
+        mask = difference.max(axis=2) > self.tolerance
+        if self.mode == ANTI_ALIAS and mask.any():
+            mask &= ~(self._is_anti_aliased(inner_actual, expected) | self._is_anti_aliased(inner_expected, actual))
+        return mask
+
+    def _is_anti_aliased(self, pixels, other):
+        """
+        Returns the mask of the pixels that lie on an edge of the other image and whose value is
+        within the range of their eight neighbours in that image.
+        """
+        low = self._neighbours(other, numpy.minimum).astype(numpy.int16) - self.tolerance
+        high = self._neighbours(other, numpy.maximum).astype(numpy.int16) + self.tolerance
+        on_edge = (high - low).max(axis=2) > _EDGE_CONTRAST + 2 * self.tolerance
+        within = ((pixels >= low) & (pixels <= high)).all(axis=2)
+        return on_edge & within
+
+    @staticmethod
+    def _neighbours(tile, function):
+        """
+        Reduces the eight neighbours of every pixel of a tile, without its neighbour rows, with
+        numpy.minimum or numpy.maximum.
+        """
+        columns = function(function(tile[:-2], tile[1:-1]), tile[2:])
+        result = function(tile[:-2], tile[2:])
+        function(result[:, 1:], columns[:, :-1], out=result[:, 1:])
+        function(result[:, :-1], columns[:, 1:], out=result[:, :-1])
+        return result
+
+    def _write_result(self, results_path, step, kind, png_bytes):
+        _makedirs(results_path)
+        path = os.path.join(results_path, self._step_name(step).replace('.png', '-%s.png' % kind))
+        with open(path, 'wb') as result_file:
+            result_file.write(png_bytes)
+        return path
+
+    def _write_mask(self, results_path, step, result):
+        path = os.path.join(results_path, self._step_name(step).replace('.png', '-diff.png'))
+        with open(path, 'wb') as mask_file:
+            png.Writer(result.width, result.height, greyscale=True, bitdepth=1).write(mask_file, result.mask_rows())
+        return path
+
+    def _save_baseline(self, path, session):
+        _makedirs(path)
+        for result in session['steps']:
+            if result.actual_path is not None:
+                shutil.copyfile(result.actual_path, os.path.join(path, self._step_name(result.step)))
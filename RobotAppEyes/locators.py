@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import collections
+from applitools.errors import EyesError
+
+# The selectors supported by the keywords, with the Selenium strategy and the JavaScript finding
+# the first matching element in the document, given the selector value `v`. The strategies are
+# the values of selenium.webdriver.common.by.By, which is not imported so that importing the
+# library does not load Selenium.
+STRATEGIES = collections.OrderedDict([
+    ('CSS SELECTOR', ('css selector', 'document.querySelector(v)')),
+    ('XPATH', ('xpath', 'document.evaluate(v, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null)'
+                        '.singleNodeValue')),
+    ('ID', ('id', 'document.getElementById(v)')),
+    ('LINK TEXT', ('link text', 'links(function (text) { return text === v; })')),
+    ('PARTIAL LINK TEXT', ('partial link text', 'links(function (text) { return text.indexOf(v) !== -1; })')),
+    ('NAME', ('name', 'document.getElementsByName(v)[0]')),
+    ('TAG NAME', ('tag name', 'document.getElementsByTagName(v)[0]')),
+    ('CLASS NAME', ('class name', 'document.getElementsByClassName(v)[0]')),
+])
+
+# The Selenium2Library prefixes, which can be used in place of the selector names.
+ALIASES = {'CSS': 'CSS SELECTOR', 'LINK': 'LINK TEXT', 'PARTIAL LINK': 'PARTIAL LINK TEXT',
+           'TAG': 'TAG NAME', 'CLASS': 'CLASS NAME'}
+
+# Defines finders[selector](value), returning the first element matching a selector.
+_FINDERS = """
+var links = function (matches) {
+    var anchors = document.getElementsByTagName('a');
+    for (var i = 0; i < anchors.length; i++) {
+        if (matches((anchors[i].textContent || '').replace(/^\\s+|\\s+$/g, ''))) { return anchors[i]; }
+    }
+    return null;
+};
+var finders = {%s};
+""" % ', '.join("'%s': function (v) { return %s; }" % (name, script) for name, (_, script) in STRATEGIES.items())
+
+# Returns the rectangle of the element found by each [selector, value] pair of arguments[0] in
+# document coordinates, as [left, top, width, height], or null when no element is found.
+REGIONS_SCRIPT = _FINDERS + """
+var scrollX = window.pageXOffset || document.documentElement.scrollLeft || 0;
+var scrollY = window.pageYOffset || document.documentElement.scrollTop || 0;
+var rects = [];
+for (var i = 0; i < arguments[0].length; i++) {
+    var element = finders[arguments[0][i][0]](arguments[0][i][1]);
+    if (!element) { rects.push(null); continue; }
+    var rect = element.getBoundingClientRect();
+    rects.push([Math.round(rect.left + scrollX), Math.round(rect.top + scrollY),
+                Math.round(rect.width), Math.round(rect.height)]);
+}
+return rects;
+"""
+
+# Keeps window.__robotAppEyesDom.version, the id of the document followed by the number of changes made to it that
+# can move an element: DOM mutations, resizes, scrolls (which move fixed elements), loaded images and finished
+# transitions and animations. The version is null in browsers without MutationObserver.
+_DOM_VERSION = """
+var dom = window.__robotAppEyesDom;
+if (!dom) {
+    dom = window.__robotAppEyesDom = {id: String(Math.random()).slice(2), changes: 0, observer: null};
+    var changed = function () { dom.changes++; };
+    if (window.MutationObserver) {
+        dom.observer = new MutationObserver(changed);
+        dom.observer.observe(document, {childList: true, attributes: true, characterData: true, subtree: true});
+    }
+    window.addEventListener('resize', changed, true);
+    window.addEventListener('scroll', changed, true);
+    document.addEventListener('load', changed, true);
+    document.addEventListener('transitionend', changed, true);
+    document.addEventListener('animationend', changed, true);
+}
+if (dom.observer && dom.observer.takeRecords().length) { dom.changes++; }
+var version = dom.observer ? dom.id + ':' + dom.changes : null;
+"""
+
+# Returns the version of the document and the rectangles, as REGIONS_SCRIPT, of the [selector, value] pairs of
+# arguments[1] when the version is still arguments[0], or else of the pairs of arguments[2].
+CACHED_REGIONS_SCRIPT = _DOM_VERSION + """
+var locators = version !== null && version === arguments[0] ? arguments[1] : arguments[2];
+var regions = function () {%s};
+return [version, regions(locators)];
+""" % REGIONS_SCRIPT
+
+# Returns the rectangle of the element found by the selector arguments[0] and value arguments[1]
+# relative to the viewport, followed by the scroll position and height of the viewport, as
+# [left, top, width, height, scrollX, scrollY, viewportHeight], or null when no element is found.
+VIEWPORT_REGION_SCRIPT = _FINDERS + """
+var element = finders[arguments[0]](arguments[1]);
+if (!element) { return null; }
+var rect = element.getBoundingClientRect();
+return [Math.round(rect.left), Math.round(rect.top), Math.round(rect.width), Math.round(rect.height),
+        window.pageXOffset || document.documentElement.scrollLeft || 0,
+        window.pageYOffset || document.documentElement.scrollTop || 0,
+        window.innerHeight || document.documentElement.clientHeight];
+"""
+
+
+def parse_locator(locator):
+    """
+    Splits a locator such as 'css=.navbar', 'XPATH://div' or '//div' into its selector name and
+    value. A locator starting with // or ( is an xpath.
+    """
+    for separator in ('=', ':'):
+        prefix, found, value = locator.partition(separator)
+        selector = prefix.strip().upper()
+        selector = ALIASES.get(selector, selector)
+        if found and selector in STRATEGIES:
+            return selector, value.strip()
+    if locator.startswith('//') or locator.startswith('('):
+        return 'XPATH', locator
+    raise EyesError("'%s' is not a valid locator, use one of: %s, followed by = and the value" %
+                    (locator, ', '.join(STRATEGIES)))
+
+
+def selector_name(selector, supported=STRATEGIES):
+    """
+    Returns the name of a selector such as 'CLASS NAME' or 'css' as it is in STRATEGIES. Raises Selenium's
+    InvalidElementStateException, listing the supported selectors, when it is not one of `supported`.
+    """
+    name = selector.strip().upper()
+    name = ALIASES.get(name, name)
+    if name not in supported:
+        from selenium.common.exceptions import InvalidElementStateException
+        raise InvalidElementStateException('Please select a valid selector: %s' % ', '.join(supported))
+    return name
+
+
+class LocatorCache(object):
+    """
+    The rectangles of the elements found by locators, resolved by a single script run in the browser for any
+    number of locators and kept until the document changes.
+
+    Each run of the script also checks the version of the document, counted in the browser by a MutationObserver
+    and by the events that move elements without changing the DOM. When the version is unchanged only the
+    locators that are not cached are resolved, otherwise every locator is resolved again. `mark_dirty` forgets
+    the rectangles for the changes the browser does not report, such as a web font that finished loading.
+
+    The version can only be read in the browser, so every call to `rects` runs the script, even when all its
+    locators are cached: the cache saves the requests finding the elements and getting their rectangles, not the
+    round trip to the browser.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.scripts = 0
+        self._version = None
+        self._rects = {}
+
+    @property
+    def hit_rate(self):
+        """
+        The share of the locators answered from the cache, in percent.
+        """
+        lookups = self.hits + self.misses
+        return 100.0 * self.hits / lookups if lookups else 0.0
+
+    def mark_dirty(self):
+        self._version = None
+        self._rects.clear()
+
+    def rects(self, driver, locators):
+        """
+        Returns the rectangle of the element found by each (selector, value) locator in document coordinates,
+        as [left, top, width, height], or None when no element is found.
+        """
+        locators = [tuple(locator) for locator in locators]
+        unique = list(collections.OrderedDict.fromkeys(locators))
+        missing = [locator for locator in unique if locator not in self._rects]
+        version, rects = driver.execute_script(CACHED_REGIONS_SCRIPT, self._version, [list(locator) for locator in missing],
+                                               [list(locator) for locator in unique])
+        self.scripts += 1
+        if version is None or version != self._version:
+            self._rects = dict(zip(unique, rects))
+            missing = set(unique)
+        else:
+            self._rects.update(zip(missing, rects))
+            missing = set(missing)
+        self._version = version
+        for locator in locators:
+            if locator in missing:
+                self.misses += 1
+                # A locator given twice is resolved once.
+                missing.discard(locator)
+            else:
+                self.hits += 1
+        return [self._rects[locator] for locator in locators]
+
+
+class ElementRect(object):
+    """
+    The rectangle of an element in document coordinates, with the location and size of a web element.
+    """
+
+    def __init__(self, left, top, width, height):
+        self.location = {'x': left, 'y': top}
+        self.size = {'width': width, 'height': height}
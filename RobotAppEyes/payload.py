@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import zlib
+import struct
+import binascii
+import threading
+from applitools.utils import _image_utils
+from imagesource import PNG_SIGNATURE, PngFile, png_chunk
+
+# NumPy is imported by the first image that is reduced, it is optional and slow to import. False when it is missing.
+numpy = None
+# PNG colour types.
+_GREYSCALE, _RGB, _PALETTE, _GREYSCALE_ALPHA, _RGBA = 0, 2, 3, 4, 6
+# The most colours a palette holds.
+MAX_PALETTE_COLOURS = 256
+# The size of the pieces of the image data that are compressed on separate threads.
+DEFLATE_CHUNK_SIZE = 256 * 1024
+# Without NumPy, the pixels of larger images are not looked at: they are sent as Eyes encodes them.
+PURE_PYTHON_MAX_PIXELS = 1024 * 1024
+
+
+def _import_numpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            module = False
+        numpy = module
+    return numpy
+
+
+class ReducedScreenshot(object):
+    """
+    The PNG bytes of a screenshot as they are sent to Eyes, in place of the screenshot.
+    """
+
+    def __init__(self, png_bytes):
+        self._png_bytes = png_bytes
+
+    def get_bytes(self):
+        return self._png_bytes
+
+
+class PayloadRecord(object):
+    """
+    The size of one screenshot before and after it was reduced, and what was done to it. The size before is None
+    when the screenshot was not encoded before, see PayloadReducer.
+    """
+
+    def __init__(self, tag, original_size, sent_size, changes):
+        self.tag = tag
+        self.original_size = original_size
+        self.sent_size = sent_size
+        self.changes = changes
+
+    @property
+    def saved(self):
+        return self.original_size - self.sent_size if self.original_size is not None else None
+
+
+class PayloadReducer(object):
+    """
+    Makes the screenshots of an Eyes session smaller before they are uploaded, without changing
+    their pixels unless cropping is asked for:
+    - crop: removes the rows and columns around the content that have the colour of the top left
+      pixel, so Eyes only compares the content.
+    - an alpha channel that is opaque everywhere is dropped.
+    - palette: an image of at most 256 colours is written as a palette image, one byte per pixel.
+    - the rows are filtered as PNG encoders do (the SDK does not filter them) and compressed at
+      `compression`, in pieces compressed on `workers` threads for large images.
+    The screenshot is sent as it was when the result is not smaller. A screenshot Eyes holds as
+    decoded pixels, such as an EyesScreenshot, is not encoded only to measure it: it is always sent
+    reduced, and its size before is not known. The pixels are looked at with NumPy when it is
+    installed; without it, images of more than PURE_PYTHON_MAX_PIXELS pixels are sent as they were.
+
+    The reducer is called by the worker threads of the check queues, so it only records the size
+    of each screenshot; the keywords log the records returned by `drain` on the thread of the test.
+    """
+
+    def __init__(self, crop=False, palette=True, compression=9, workers=4):
+        self.crop = crop
+        self.palette = palette
+        self.compression = compression
+        self.workers = max(1, workers)
+        self.checks = 0
+        self.sent_bytes = 0
+        # The screenshots whose size before is known, and their sizes before and after.
+        self.measured = 0
+        self.original_bytes = 0
+        self.measured_sent_bytes = 0
+        self._records = []
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def reduce(self, tag, screenshot):
+        """
+        Returns the screenshot to send in place of an EyesScreenshot, a PngFile or any object with a
+        get_bytes method returning PNG bytes. A PngFile is closed once it has been reduced.
+        """
+        if isinstance(screenshot, PngFile):
+            original_size, image = screenshot.size, screenshot.get_image()
+        elif getattr(screenshot, '_screenshot', None) is not None:
+            original_size, image = None, screenshot._screenshot
+        else:
+            original = screenshot.get_bytes()
+            original_size = len(original)
+            image = _image_utils.png_image_from_bytes(original)
+        changes = []
+        png_bytes = None
+        unchanged = 'sent as it was'
+        if image.meta_info['bitdepth'] == 8 and image.width and image.height:
+            if image.width * image.height <= PURE_PYTHON_MAX_PIXELS or _import_numpy():
+                png_bytes = self._encode(image, changes)
+            else:
+                unchanged = 'sent as it was, NumPy is needed to reduce more than %d pixels' % PURE_PYTHON_MAX_PIXELS
+        if png_bytes is not None and (original_size is None or len(png_bytes) < original_size):
+            if isinstance(screenshot, PngFile):
+                screenshot.close()
+            screenshot = ReducedScreenshot(png_bytes)
+            sent_size = len(png_bytes)
+        else:
+            changes, sent_size = [unchanged], original_size
+        with self._lock:
+            self._records.append(PayloadRecord(tag, original_size, sent_size, changes))
+            self.checks += 1
+            self.sent_bytes += sent_size or 0
+            if original_size is not None:
+                self.measured += 1
+                self.original_bytes += original_size
+                self.measured_sent_bytes += sent_size
+        return screenshot
+
+    def drain(self):
+        """
+        Returns the records of the screenshots reduced since the last call.
+        """
+        with self._lock:
+            records, self._records = self._records, []
+        return records
+
+    def close(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.close()
+            pool.join()
+
+    def _encode(self, image, changes):
+        width, height = image.width, image.height
+        pixel_size = image.pixel_size
+        alpha = image.meta_info['alpha']
+        rows = [bytes(bytearray(row)) for row in image.pixel_bytes]
+        if self.crop:
+            left, top, right, bottom = content_box(rows, width, pixel_size)
+            if (left, top, right, bottom) != (0, 0, width, height):
+                rows = [row[left * pixel_size:right * pixel_size] for row in rows[top:bottom]]
+                width, height = right - left, bottom - top
+                changes.append('cropped to %dx%d at %d,%d' % (width, height, left, top))
+        if alpha and all(row[pixel_size - 1::pixel_size] == '\xff' * width for row in rows):
+            opaque = []
+            for row in rows:
+                row = bytearray(row)
+                del row[pixel_size - 1::pixel_size]
+                opaque.append(bytes(row))
+            rows, pixel_size, alpha = opaque, pixel_size - 1, False
+            changes.append('opaque alpha dropped')
+        greyscale = pixel_size < 3
+        palette = None
+        if self.palette and not greyscale:
+            palette = palette_rows(rows, pixel_size)
+        if palette is not None:
+            colours, rows = palette
+            colour_type = _PALETTE
+            data = ''.join('\x00' + row for row in rows)
+            changes.append('palette of %d colours' % len(colours))
+        else:
+            colour_type = (_GREYSCALE_ALPHA if alpha else _GREYSCALE) if greyscale else (_RGBA if alpha else _RGB)
+            data = filter_rows(rows, pixel_size)
+        chunks = [png_chunk('IHDR', struct.pack('>LLBBBBB', width, height, 8, colour_type, 0, 0, 0))]
+        gamma = image.meta_info.get('gamma')
+        if gamma is not None:
+            chunks.append(png_chunk('gAMA', struct.pack('>L', int(round(gamma * 100000)))))
+        if palette is not None:
+            chunks.append(png_chunk('PLTE', ''.join(colour[:3] for colour in colours)))
+            if pixel_size == 4:
+                chunks.append(png_chunk('tRNS', ''.join(colour[3] for colour in colours)))
+        chunks.append(png_chunk('IDAT', self._deflate(data)))
+        chunks.append(png_chunk('IEND', ''))
+        changes.append('compression %d' % self.compression)
+        return PNG_SIGNATURE + ''.join(chunks)
+
+    def _deflate(self, data):
+        """
+        Compresses the image data into a zlib stream. Large data is split into pieces compressed on
+        separate threads, zlib releases the GIL while it compresses. Each piece but the last ends on
+        a byte boundary without being final, so the pieces join into one deflate stream.
+        """
+        if len(data) <= DEFLATE_CHUNK_SIZE or self.workers == 1:
+            compressor = zlib.compressobj(self.compression)
+            return compressor.compress(data) + compressor.flush()
+        pieces = [(buffer(data, offset, DEFLATE_CHUNK_SIZE), offset + DEFLATE_CHUNK_SIZE >= len(data))
+                  for offset in xrange(0, len(data), DEFLATE_CHUNK_SIZE)]
+        level = self.compression
+
+        def deflate(piece):
+            chunk, last = piece
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            return compressor.compress(chunk) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+        with self._lock:
+            if self._pool is None:
+                from multiprocessing.pool import ThreadPool
+                self._pool = ThreadPool(self.workers)
+            pool = self._pool
+        compressed = pool.map(deflate, pieces)
+        compression_flags = 0 if level < 2 else 1 if level < 6 else 2 if level == 6 else 3
+        header = 0x7800 | compression_flags << 6
+        header += 31 - header % 31
+        return struct.pack('>H', header) + ''.join(compressed) + struct.pack('>L', zlib.adler32(data) & 0xffffffff)
+
+
+def content_box(rows, width, pixel_size):
+    """
+    Returns the left, top, right and bottom of the content of an image: the pixels whose colour is
+    not the colour of its top left pixel. The whole image is returned when it has a single colour.
+    """
+    background = rows[0][:pixel_size] * width
+    top = next((y for y, row in enumerate(rows) if row != background), None)
+    if top is None:
+        return 0, 0, width, len(rows)
+    bottom = next(y for y in xrange(len(rows) - 1, top - 1, -1) if rows[y] != background) + 1
+    left, right = width, 0
+    for row in rows[top:bottom]:
+        # The background prefix and suffix of a row are found by bisecting on slice comparisons.
+        if left and row[:left * pixel_size] != background[:left * pixel_size]:
+            low, high = 0, left
+            while low < high:
+                middle = (low + high + 1) // 2
+                if row[:middle * pixel_size] == background[:middle * pixel_size]:
+                    low = middle
+                else:
+                    high = middle - 1
+            left = low
+        if right < width and row[right * pixel_size:] != background[right * pixel_size:]:
+            low, high = right, width
+            while low < high:
+                middle = (low + high) // 2
+                if row[middle * pixel_size:] == background[middle * pixel_size:]:
+                    high = middle
+                else:
+                    low = middle + 1
+            right = low
+    return left, top, right, bottom
+
+
+def palette_rows(rows, pixel_size, max_colours=MAX_PALETTE_COLOURS):
+    """
+    Returns the colours of an image, as strings of their channels, and its rows as palette indexes,
+    or None when it has more than `max_colours` colours.
+    """
+    if _import_numpy():
+        return _numpy_palette_rows(rows, pixel_size, max_colours)
+    return _python_palette_rows(rows, pixel_size, max_colours)
+
+
+def filter_rows(rows, pixel_size):
+    """
+    Returns the PNG image data of the rows, each row filtered with the None, Sub or Up filter that
+    leaves the most zero bytes, which deflate compresses best.
+    """
+    if not rows:
+        return ''
+    if _import_numpy():
+        return _numpy_filter_rows(rows, pixel_size)
+    return _python_filter_rows(rows, pixel_size)
+
+
+def _numpy_palette_rows(rows, pixel_size, max_colours):
+    pixels = numpy.frombuffer(''.join(rows), numpy.uint8).reshape(-1, pixel_size)
+    # Each colour packed into an integer, whose order is the order of the strings of its channels.
+    packed = numpy.zeros(len(pixels), numpy.uint32)
+    for channel in range(pixel_size):
+        packed = (packed << 8) | pixels[:, channel]
+    # An image of many colours usually shows them in a sample of its pixels, sorted much faster than all of them.
+    if len(numpy.unique(packed[::97])) > max_colours:
+        return None
+    colours = numpy.unique(packed)
+    if len(colours) > max_colours:
+        return None
+    indexes = numpy.searchsorted(colours, packed)
+    shifts = [8 * (pixel_size - 1 - channel) for channel in range(pixel_size)]
+    colours = [''.join(chr((int(colour) >> shift) & 0xff) for shift in shifts) for colour in colours]
+    indexes = indexes.astype(numpy.uint8).reshape(len(rows), -1)
+    return colours, [row.tobytes() for row in indexes]
+
+
+def _numpy_filter_rows(rows, pixel_size):
+    none = numpy.frombuffer(''.join(rows), numpy.uint8).reshape(len(rows), -1)
+    # The bytes wrap around as the PNG filters need.
+    sub = none.copy()
+    sub[:, pixel_size:] -= none[:, :-pixel_size]
+    up = none.copy()
+    up[1:] -= none[:-1]
+    zeros = numpy.array([(filtered == 0).sum(axis=1) for filtered in (none, sub, up)])
+    # argmax takes the first of the filters leaving as many zeros, as max does in _python_filter_rows.
+    choice = zeros.argmax(axis=0)
+    data = numpy.empty((len(rows), none.shape[1] + 1), numpy.uint8)
+    data[:, 0] = choice
+    chosen = choice[:, numpy.newaxis]
+    data[:, 1:] = numpy.where(chosen == 0, none, numpy.where(chosen == 1, sub, up))
+    return data.tobytes()
+
+
+def _python_palette_rows(rows, pixel_size, max_colours):
+    """
+    The palette of palette_rows without NumPy. Identical rows, of which screenshots have many, are
+    only looked at once.
+    """
+    unique = dict.fromkeys(rows)
+    colours = set()
+    for row in unique:
+        colours.update(zip(*[row[channel::pixel_size] for channel in range(pixel_size)]))
+        if len(colours) > max_colours:
+            return None
+    colours = sorted(colours)
+    index = dict((colour, position) for position, colour in enumerate(colours))
+    for row in unique:
+        unique[row] = str(bytearray(map(index.__getitem__, zip(*[row[channel::pixel_size]
+                                                                  for channel in range(pixel_size)]))))
+    return [''.join(colour) for colour in colours], [unique[row] for row in rows]
+
+
+def _python_filter_rows(rows, pixel_size):
+    """
+    The filtering of filter_rows without NumPy. The filters subtract whole rows at once, as big
+    integers whose bytes are subtracted without carrying from one byte to the next.
+    """
+    length = len(rows[0])
+    high = int('80' * length, 16)
+    low = int('7f' * length, 16)
+    mask = (1 << (8 * length)) - 1
+    hex_format = '%%0%dx' % (2 * length)
+
+    def subtract(a, b):
+        return (((a | high) - (b & low)) ^ ((a ^ ~b) & high)) & mask
+
+    data = []
+    previous = 0
+    for row in rows:
+        value = int(binascii.hexlify(row), 16)
+        candidates = (('\x00', row),
+                      ('\x01', binascii.unhexlify(hex_format % subtract(value, value >> (8 * pixel_size)))),
+                      ('\x02', binascii.unhexlify(hex_format % subtract(value, previous))))
+        data.extend(max(candidates, key=lambda candidate: candidate[1].count('\x00')))
+        previous = value
+    return ''.join(data)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import json
+import time
+import errno
+import hashlib
+import threading
+from imagesource import PngFile
+
+_ENTRY_SUFFIX = '.json'
+
+
+def image_digest(screenshot):
+    """
+    Returns a hash of the pixels of an EyesScreenshot or PngImage. A PngFile is hashed by its
+    content, since its pixels are not decoded.
+    """
+    digest = hashlib.sha1()
+    if isinstance(screenshot, PngFile):
+        screenshot.update_digest(digest)
+        return digest.hexdigest()
+    image = getattr(screenshot, '_screenshot', screenshot)
+    digest.update('%dx%dx%d' % (image.width, image.height, image.pixel_size))
+    for row in image.pixel_bytes:
+        digest.update(row)
+    return digest.hexdigest()
+
+
+class ScreenshotCache(object):
+    """
+    A directory of the checks that were last matched by Eyes. Each entry is keyed by the hash of
+    the screenshot together with the application, test, tag, viewport and match level of the
+    check, so a check whose key is found can be answered without sending it to Eyes.
+
+    Entries older than `max_age_days` are dropped, and once there are more than `max_entries`
+    the least recently used ones are evicted. Lookups refresh the modification time of an entry.
+    """
+
+    def __init__(self, directory, max_entries=10000, max_age_days=7):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    @staticmethod
+    def key(image_hash, app_name, test_name, tag, viewport_size, match_level):
+        viewport = '%sx%s' % (viewport_size['width'], viewport_size['height']) if viewport_size else ''
+        fields = [image_hash, app_name, test_name, tag, viewport, match_level]
+        return hashlib.sha1(u'\0'.join(u'%s' % (field,) for field in fields).encode('utf-8')).hexdigest()
+
+    def is_known_passing(self, key):
+        """
+        Returns True if the check with this key passed the last time it was sent to Eyes.
+        """
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            hit = age <= self.max_age
+            if hit:
+                os.utime(path, None)
+            else:
+                os.remove(path)
+        except OSError:
+            hit = False
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return hit
+
+    def record_pass(self, key, **metadata):
+        """
+        Stores the key of a check that Eyes reported as matching.
+        """
+        path = self._path(key)
+        temp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.current_thread().ident)
+        with open(temp_path, 'w') as entry:
+            json.dump(metadata, entry)
+        try:
+            os.rename(temp_path, path)
+        except OSError:
+            # Windows does not replace an existing file, the entry is already there.
+            os.remove(temp_path)
+
+    def invalidate(self, **metadata):
+        """
+        Removes every entry, or only the entries whose metadata has the given values.
+        Returns the number of entries removed.
+        """
+        removed = 0
+        for path, _ in self._entries():
+            if metadata and not self._matches(path, metadata):
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def evict(self):
+        """
+        Removes the expired entries and the least recently used entries above max_entries.
+        Returns the number of entries removed.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1], reverse=True)
+        oldest = time.time() - self.max_age
+        evicted = [path for index, (path, mtime) in enumerate(entries)
+                   if mtime < oldest or index >= self.max_entries]
+        for path in evicted:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _ENTRY_SUFFIX)
+
+    def _entries(self):
+        for name in os.listdir(self.directory):
+            if not name.endswith(_ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                yield path, os.path.getmtime(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _matches(path, metadata):
+        try:
+            with open(path) as entry:
+                stored = json.load(entry)
+        except (IOError, ValueError):
+            return False
+        return all(stored.get(name) == value for name, value in metadata.items())
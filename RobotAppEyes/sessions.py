@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+import contextlib
+import eyeslog
+from applitools.errors import EyesError
+from timing import NULL_RECORDER
+
+
+class HeldStep(object):
+    """
+    A step of a session answered without Eyes, from the screenshot cache or the duplicate screenshot filter. Eyes pairs the steps of a session with the
+    steps of its baseline by their position, so a step can not be left out in the middle of a session: the held steps
+    are sent after all before the next step that is sent, and only the steps held at the end of the session are not
+    sent, which Eyes reports as missing.
+
+    `prepare` returns the body of the match request of the step, `release` drops its screenshot. Once the step was
+    sent, `check` is its PendingCheck, or whether it matched when it was sent at once.
+    """
+
+    def __init__(self, tag, prepare, nbytes=0, release=None):
+        self.tag = tag
+        self.prepare = prepare
+        self.nbytes = nbytes
+        self.check = None
+        self._release = release
+
+    def release(self):
+        if self._release is not None:
+            release, self._release = self._release, None
+            release()
+
+
+class EyesSession(object):
+    """
+    The state of one Eyes session: the Eyes instance, the web driver it checks and the options the
+    session was opened with.
+    """
+
+    def __init__(self, eyes, driver, check_queue=None, screenshot_cache=None, timing=NULL_RECORDER, payload=None,
+                 locators=None, duplicates=None):
+        self.eyes = eyes
+        self.driver = driver
+        self.check_queue = check_queue
+        self.screenshot_cache = screenshot_cache
+        self.timing = timing
+        self.payload = payload
+        self.locators = locators
+        self.duplicates = duplicates
+        self.held_steps = []
+        # The held steps that were not sent, once the session is closed.
+        self.not_sent = 0
+        self.index = None
+        self.alias = None
+
+    def captures_checks(self):
+        """
+        Returns True if the check keywords capture the screenshot themselves instead of leaving it to Eyes,
+        which is needed for the asynchronous checks, the screenshot cache, the payload reduction and the duplicate
+        screenshot filter.
+        """
+        return self.check_queue is not None or self.screenshot_cache is not None or self.payload is not None \
+            or self.duplicates is not None
+
+    @contextlib.contextmanager
+    def check(self, keyword, tag):
+        """
+        The scope of a check keyword run on the calling thread: it is timed, and its Eyes log records get the
+        correlation ID of the check.
+        """
+        with self.timing.check(keyword, tag):
+            with eyeslog.check(keyword, tag):
+                yield
+
+    def bind(self, function):
+        """
+        Returns a function that runs `function` as part of the check running on the calling thread, for work that is
+        handed to another thread.
+        """
+        return eyeslog.bind(self.timing.bind(function))
+
+
+class SessionRegistry(object):
+    """
+    The open Eyes sessions, addressed by index or alias in the same way Selenium2Library addresses
+    browsers.
+
+    Each thread has its own current session, so several threads can each drive a session of their
+    own. A thread that has not opened or switched to a session uses the session that was opened or
+    switched to last by any thread. A thread whose own session was closed has no current session
+    until it opens or switches to another one.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sessions = []
+        self._aliases = {}
+        self._default = None
+        self._local = threading.local()
+
+    def register(self, session, alias=None):
+        """
+        Adds a session, makes it the current session of the calling thread and returns its index.
+        Indexes start at 1 and are not reused.
+        """
+        with self._lock:
+            self._sessions.append(session)
+            session.index = len(self._sessions)
+            session.alias = alias
+            if alias is not None:
+                self._aliases[self._normalize(alias)] = session.index
+            self._set_current(session)
+            return session.index
+
+    def switch(self, index_or_alias):
+        """
+        Makes the given session the current session of the calling thread and returns it.
+        """
+        with self._lock:
+            session = self.get(index_or_alias)
+            self._set_current(session)
+            return session
+
+    def get(self, index_or_alias):
+        with self._lock:
+            index = self._aliases.get(self._normalize(index_or_alias))
+            if index is None:
+                try:
+                    index = int(index_or_alias)
+                except ValueError:
+                    raise EyesError("No Eyes session with alias '%s' found." % index_or_alias)
+            if not 0 < index <= len(self._sessions) or self._sessions[index - 1] is None:
+                raise EyesError("No Eyes session with index %s found." % index_or_alias)
+            return self._sessions[index - 1]
+
+    @property
+    def current(self):
+        """
+        The current session of the calling thread.
+        """
+        if hasattr(self._local, 'session'):
+            session = self._local.session
+            if self._sessions[session.index - 1] is not session:
+                # Closed, by this thread or another one.
+                session = None
+        else:
+            session = self._default
+        if session is None:
+            raise EyesError('No Eyes session is open.')
+        return session
+
+    def has_current(self):
+        try:
+            self.current
+        except EyesError:
+            return False
+        return True
+
+    def is_empty(self):
+        """
+        Whether every session was closed.
+        """
+        with self._lock:
+            return all(session is None for session in self._sessions)
+
+    def remove(self, session):
+        """
+        Forgets a closed session. Its index and alias can not be switched to anymore.
+        """
+        with self._lock:
+            self._sessions[session.index - 1] = None
+            for alias, index in list(self._aliases.items()):
+                if index == session.index:
+                    del self._aliases[alias]
+            if self._default is session:
+                self._default = None
+
+    def _set_current(self, session):
+        self._local.session = session
+        self._default = session
+
+    @staticmethod
+    def _normalize(alias):
+        return str(alias).lower().replace(' ', '')
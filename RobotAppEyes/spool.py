@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Uploads the Eyes sessions recorded by Open Eyes Session with a Record Directory to the Eyes server,
+several sessions at a time, and writes the result of each session next to it.
+
+Sessions that were uploaded are skipped when the directory is uploaded again, the sessions whose
+upload failed are sent again, so an outage only needs the upload to be re-run, not the tests.
+
+    robotappeyes-upload SPOOL_DIRECTORY [--api-key KEY] [--server-url URL] [--workers 8] [--all]
+                                        [--report report.json]
+
+or
+
+    python -m RobotAppEyes.spool SPOOL_DIRECTORY ...
+
+The API key defaults to the APPLITOOLS_API_KEY environment variable. Exits with 1 when a session
+could not be uploaded or did not match.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import errno
+import struct
+import argparse
+import threading
+from applitools.test_results import TestResults
+from imagesource import retag_match_data
+
+SESSION_FILE = 'session.json'
+STEPS_FILE = 'steps.jsonl'
+CLOSED_FILE = 'closed.json'
+RESULT_FILE = 'result.json'
+
+PASSED = 'passed'
+NEW = 'new'
+UNRESOLVED = 'unresolved'
+FAILED = 'failed'
+ABORTED = 'aborted'
+
+_UNSAFE_NAME = re.compile(r'[^\w.-]+')
+
+
+def _safe_name(name):
+    return _UNSAFE_NAME.sub('_', u'%s' % (name,)).strip('_') or '_'
+
+
+def _write_json(path, content):
+    """
+    Writes a JSON file through a temporary file, so a reader never sees it half written.
+    """
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp_path, 'w') as json_file:
+        json.dump(content, json_file, indent=2, sort_keys=True, default=lambda o: o.__getstate__())
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(temp_path, path)
+
+
+def _as_step(data):
+    """
+    Returns the body of a match request and its match data, with ignoreMismatch cleared. The SDK sends the first
+    attempt of a check with ignoreMismatch, which Eyes does not count as a step, and a recorded check has no other
+    attempt.
+    """
+    # The body of a match request starts with the size of its JSON match data.
+    size = struct.unpack('>L', bytes(data[:4]))[0]
+    match_data = json.loads(bytes(data[4:4 + size]).decode('utf-8'))
+    if match_data.get('ignoreMismatch'):
+        data = retag_match_data(data, match_data['appOutput'], match_data['userInputs'], match_data['tag'], False)
+    return data, match_data
+
+
+def _read_json(path):
+    try:
+        with open(path) as json_file:
+            return json.load(json_file)
+    except IOError as e:
+        if e.errno == errno.ENOENT:
+            return None
+        raise
+
+
+class SpoolAgentConnector(object):
+    """
+    A replacement for the AgentConnector of the Eyes SDK that records sessions to a spool directory
+    instead of sending them to the Eyes server, for the uploader of this module to send later.
+
+    Each session is a directory holding its start info (application, test, batch, branch, viewport
+    and match level) in session.json, the match request of each step as it would have been sent in
+    step-NNNN.bin, the tag and size of each step in steps.jsonl, and closed.json once the session
+    is closed. Every step is reported as matching, the Eyes server decides when it is uploaded.
+    """
+
+    def __init__(self, spool_dir):
+        self.spool_dir = spool_dir
+        self.api_key = None
+        self.server_url = None
+        self.save_new_tests = True
+        self.save_failed_tests = False
+        self.steps = 0
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def start_session(self, session_start_info):
+        import uuid
+        name = '%s-%s-%s-%s' % (time.strftime('%Y%m%d-%H%M%S'), _safe_name(session_start_info['appIdOrName']),
+                                _safe_name(session_start_info['scenarioIdOrName']), uuid.uuid4().hex[:8])
+        path = os.path.join(self.spool_dir, name)
+        os.makedirs(path)
+        _write_json(os.path.join(path, SESSION_FILE),
+                    {'startInfo': session_start_info, 'serverUrl': self.server_url,
+                     'saveNewTests': self.save_new_tests, 'saveFailedTests': self.save_failed_tests,
+                     'recordedAt': time.strftime('%Y-%m-%dT%H:%M:%S')})
+        with self._lock:
+            self._sessions[path] = 0
+        # Eyes is told the test exists, so it does not wait for the match timeout before the first step.
+        return dict(session_id=path, session_url=path, is_new_session=False, recorded=True)
+
+    def match_window(self, running_session, data):
+        path = running_session['session_id']
+        # The steps of a session are matched in order, by the keyword or by the ordered check queue.
+        step = self._sessions[path] + 1
+        self._sessions[path] = step
+        step_name = 'step-%04d.bin' % step
+        data, match_data = _as_step(data)
+        with open(os.path.join(path, step_name), 'wb') as step_file:
+            step_file.write(data)
+        with open(os.path.join(path, STEPS_FILE), 'a') as steps_file:
+            steps_file.write(json.dumps({'step': step, 'file': step_name, 'tag': match_data['tag'],
+                                         'bytes': len(data)}) + '\n')
+        with self._lock:
+            self.steps += 1
+        return True
+
+    def stop_session(self, running_session, is_aborted, save):
+        path = running_session['session_id']
+        with self._lock:
+            steps = self._sessions.pop(path)
+        _write_json(os.path.join(path, CLOSED_FILE), {'aborted': is_aborted, 'steps': steps,
+                                                      'closedAt': time.strftime('%Y-%m-%dT%H:%M:%S')})
+        return TestResults(steps, steps, 0, 0)
+
+
+def find_sessions(spool_dir, include_uploaded=False):
+    """
+    Returns the closed sessions of a spool directory that are waiting to be uploaded: those without
+    a result and those whose upload failed, or every closed session when `include_uploaded` is set.
+    """
+    sessions = []
+    for name in sorted(os.listdir(spool_dir)):
+        path = os.path.join(spool_dir, name)
+        if not os.path.isfile(os.path.join(path, CLOSED_FILE)):
+            continue
+        result = _read_json(os.path.join(path, RESULT_FILE))
+        if include_uploaded or result is None or result['status'] == FAILED:
+            sessions.append(path)
+    return sessions
+
+
+def upload_session(path, api_key, server_url=None):
+    """
+    Replays a recorded session against the Eyes server, writes its result to result.json in the
+    session directory and returns it. The result has a status of passed, new, unresolved (a step
+    did not match or is missing), failed (the upload failed) or aborted (the test was aborted and
+    its session is not uploaded).
+    """
+    from applitools._agent_connector import AgentConnector
+    recorded = _read_json(os.path.join(path, SESSION_FILE))
+    closed = _read_json(os.path.join(path, CLOSED_FILE))
+    start_info = recorded['startInfo']
+    result = {'session': os.path.basename(path), 'app': start_info['appIdOrName'],
+              'test': start_info['scenarioIdOrName'], 'steps': closed['steps'],
+              'uploadedAt': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    if closed['aborted']:
+        result['status'] = ABORTED
+        _write_json(os.path.join(path, RESULT_FILE), result)
+        return result
+    connector = AgentConnector(server_url or recorded['serverUrl'])
+    connector.api_key = api_key
+    running_session = None
+    start = time.time()
+    try:
+        running_session = connector.start_session(start_info)
+        steps = []
+        if os.path.isfile(os.path.join(path, STEPS_FILE)):
+            with open(os.path.join(path, STEPS_FILE)) as steps_file:
+                steps = [json.loads(line) for line in steps_file if line.strip()]
+        as_expected = []
+        for step in steps:
+            with open(os.path.join(path, step['file']), 'rb') as step_file:
+                as_expected.append(connector.match_window(running_session, _as_step(step_file.read())[0]))
+        is_new = running_session['is_new_session']
+        save = recorded['saveNewTests'] if is_new else recorded['saveFailedTests']
+        session, running_session = running_session, None
+        results = connector.stop_session(session, False, save)
+        results.is_new, results.url = is_new, session['session_url']
+    except Exception as e:
+        result.update(status=FAILED, error='%s: %s' % (type(e).__name__, e))
+        if running_session is not None:
+            try:
+                connector.stop_session(running_session, True, False)
+            except Exception:
+                pass
+    else:
+        result.update(results.to_dict())
+        result['mismatched'] = [step['tag'] for step, matched in zip(steps, as_expected) if not matched]
+        result['status'] = NEW if is_new else PASSED if results.is_passed else UNRESOLVED
+    result['seconds'] = round(time.time() - start, 3)
+    _write_json(os.path.join(path, RESULT_FILE), result)
+    return result
+
+
+def upload(spool_dir, api_key, server_url=None, workers=8, include_uploaded=False, on_result=None):
+    """
+    Uploads the sessions of a spool directory on `workers` threads, each session on one thread as
+    its steps must be sent in order, and returns their results. `on_result` is called with each
+    result as soon as its session is uploaded.
+    """
+    from multiprocessing.pool import ThreadPool
+    sessions = find_sessions(spool_dir, include_uploaded)
+    if not sessions:
+        return []
+    pool = ThreadPool(max(1, min(int(workers), len(sessions))))
+    results = []
+    try:
+        for result in pool.imap_unordered(lambda path: upload_session(path, api_key, server_url), sessions):
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    finally:
+        pool.close()
+        pool.join()
+    return sorted(results, key=lambda result: result['session'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', help='The spool directory passed to Open Eyes Session as Record Directory.')
+    parser.add_argument('--api-key', default=os.environ.get('APPLITOOLS_API_KEY'),
+                        help='The Applitools API key, defaults to the APPLITOOLS_API_KEY environment variable.')
+    parser.add_argument('--server-url', help='The Eyes server, defaults to the one the session was recorded for.')
+    parser.add_argument('--workers', type=int, default=8, help='The number of sessions uploaded at once.')
+    parser.add_argument('--all', action='store_true', help='Uploads the sessions that were uploaded before again.')
+    parser.add_argument('--report', help='Writes the results of the upload as JSON to this file.')
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error('an API key is needed, pass --api-key or set APPLITOOLS_API_KEY')
+
+    def report(result):
+        print("%-10s %s / %s (%d steps) %s" % (result['status'], result['app'], result['test'], result['steps'],
+                                              result.get('error') or result.get('url') or ''))
+
+    start = time.time()
+    results = upload(args.directory, args.api_key, args.server_url, args.workers, args.all, report)
+    statuses = (PASSED, NEW, UNRESOLVED, FAILED, ABORTED)
+    counts = dict((status, len([result for result in results if result['status'] == status])) for status in statuses)
+    print("%d sessions uploaded in %.1f seconds: %s" %
+          (len(results), time.time() - start, ', '.join('%d %s' % (counts[status], status) for status in statuses)))
+    if args.report:
+        _write_json(args.report, {'directory': os.path.abspath(args.directory), 'counts': counts, 'sessions': results})
+    return 1 if counts[FAILED] or counts[UNRESOLVED] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import time
+import zlib
+import base64
+import struct
+from applitools.errors import EyesError
+from locators import VIEWPORT_REGION_SCRIPT
+
+# The side, in pixels, of the tiles a region is checksummed in.
+TILE_SIZE = 128
+
+
+def page_signature(screenshot64):
+    """
+    Returns the signature of a whole screenshot, given as the base64 PNG the web driver returns.
+    The browser encodes identical pixels to identical PNG bytes, so the encoded screenshot is
+    checksummed as it is, without decoding it.
+    """
+    if isinstance(screenshot64, unicode):
+        screenshot64 = screenshot64.encode('ascii')
+    return len(screenshot64), zlib.crc32(screenshot64)
+
+
+def png_size(png_bytes):
+    """
+    Returns the width and height of a PNG from its header.
+    """
+    return struct.unpack('>LL', png_bytes[16:24])
+
+
+def region_signature(png_bytes, left, top, width, height, tile_size=TILE_SIZE):
+    """
+    Returns the signature of a region of a PNG screenshot: its rectangle followed by the CRC32 of
+    each tile of the region, row by row of tiles. Only the rows down to the bottom of the region
+    are decoded.
+    """
+    import png
+    reader = png.Reader(bytes=png_bytes)
+    image_width, image_height, rows, info = reader.asDirect()
+    if info['bitdepth'] != 8:
+        image_width, image_height, rows, info = png.Reader(bytes=png_bytes).asRGBA8()
+    right, bottom = min(left + width, image_width), min(top + height, image_height)
+    left, top = max(left, 0), max(top, 0)
+    if right <= left or bottom <= top:
+        return (left, top, 0, 0)
+    pixel_size = info['planes']
+    columns = range(left * pixel_size, right * pixel_size, tile_size * pixel_size)
+    tile_bytes = tile_size * pixel_size
+    end = right * pixel_size
+    signature = [left, top, right - left, bottom - top]
+    tiles = None
+    for y, row in enumerate(rows):
+        if y >= bottom:
+            break
+        if y < top:
+            continue
+        if (y - top) % tile_size == 0:
+            if tiles is not None:
+                signature.extend(tiles)
+            tiles = [0] * len(columns)
+        for index, x in enumerate(columns):
+            tiles[index] = zlib.crc32(buffer(row, x, min(tile_bytes, end - x)), tiles[index])
+    signature.extend(tiles)
+    return tuple(signature)
+
+
+def changed_area(previous, current, tile_size=TILE_SIZE):
+    """
+    Returns the rectangle, as 'left,top widthxheight', covering the tiles that differ between two
+    region signatures of the same rectangle, or None when they can not be compared.
+    """
+    if previous is None or current is None or previous[:4] != current[:4] or len(current) <= 4:
+        return None
+    left, top, width, height = current[:4]
+    columns = (width + tile_size - 1) // tile_size
+    changed = [index for index, (old, new) in enumerate(zip(previous[4:], current[4:])) if old != new]
+    if not changed:
+        return None
+    xs = [index % columns for index in changed]
+    ys = [index // columns for index in changed]
+    x0, y0 = left + min(xs) * tile_size, top + min(ys) * tile_size
+    x1 = min(left + (max(xs) + 1) * tile_size, left + width)
+    y1 = min(top + (max(ys) + 1) * tile_size, top + height)
+    return '%d,%d %dx%d' % (x0, y0, x1 - x0, y1 - y0)
+
+
+def region_in_screenshot(png_bytes, rect):
+    """
+    Maps the rectangle returned by VIEWPORT_REGION_SCRIPT to the pixels of a screenshot. Most
+    browsers capture the viewport; a screenshot taller than the viewport is of the whole page.
+    """
+    left, top, width, height, scroll_x, scroll_y, viewport_height = rect
+    if png_size(png_bytes)[1] > viewport_height:
+        left, top = left + scroll_x, top + scroll_y
+    return left, top, width, height
+
+
+def frame_signature(driver, locator=None):
+    """
+    Takes a screenshot and returns the signature of the page, or of the region of the element
+    found by the (selector, value) `locator`. Returns None when the element is not found.
+    """
+    if locator is None:
+        return page_signature(driver.get_screenshot_as_base64())
+    rect = driver.execute_script(VIEWPORT_REGION_SCRIPT, *locator)
+    if rect is None:
+        return None
+    png_bytes = base64.b64decode(driver.get_screenshot_as_base64())
+    return region_signature(png_bytes, *region_in_screenshot(png_bytes, rect))
+
+
+def wait_for_stable_frames(take_signature, frames, timeout, interval, describe_change=None):
+    """
+    Calls `take_signature` every `interval` seconds until it returns the same signature `frames`
+    times in a row, and returns the seconds waited and the number of frames taken. A signature of
+    None never matches. Raises EyesError after `timeout` seconds, describing the last change with
+    `describe_change(previous, current)` when given.
+    """
+    start = time.time()
+    deadline = start + timeout
+    previous = take_signature()
+    taken, run, longest, last_change = 1, 1, 1, None
+    while run < frames:
+        now = time.time()
+        if now >= deadline:
+            message = 'Page was not visually stable after %s seconds: %d frames taken, at most %d in a row matched' % \
+                      (timeout, taken, longest)
+            if previous is None:
+                message += ', the element was not found'
+            elif last_change:
+                message += ', the last change was in %s' % last_change
+            raise EyesError(message)
+        time.sleep(min(interval, deadline - now))
+        current = take_signature()
+        taken += 1
+        if current is not None and current == previous:
+            run += 1
+            longest = max(longest, run)
+        else:
+            run = 1
+            if describe_change is not None:
+                last_change = describe_change(previous, current) or last_change
+        previous = current
+    return time.time() - start, taken
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import json
+import time
+import threading
+import collections
+
+LOCATE = 'locate'
+SESSION = 'session'
+CAPTURE = 'capture'
+DECODE = 'decode'
+HASH = 'hash'
+ENCODE = 'encode'
+UPLOAD_AND_MATCH = 'upload and match'
+WAIT = 'wait'
+OTHER = 'other'
+PHASES = (LOCATE, SESSION, CAPTURE, DECODE, HASH, ENCODE, UPLOAD_AND_MATCH, WAIT, OTHER)
+
+# The check being timed on each thread, and its phases that are running.
+_local = threading.local()
+
+
+class _Phase(object):
+    """
+    Times a phase of the check being timed on the calling thread. The time of a phase excludes
+    the phases nested in it, so the phases of a check add up to its total.
+    """
+    __slots__ = ('name', 'record', 'start', 'elapsed')
+
+    def __init__(self, name):
+        self.name = name
+        self.record = None
+
+    def __enter__(self):
+        self.record = getattr(_local, 'record', None)
+        if self.record is None:
+            return self
+        now = time.time()
+        stack = _local.stack
+        if stack:
+            parent = stack[-1]
+            parent.elapsed += now - parent.start
+        self.start = now
+        self.elapsed = 0.0
+        stack.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.record is None:
+            return False
+        now = time.time()
+        self.elapsed += now - self.start
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].start = now
+        self.record.add(self.name, self.elapsed)
+        return False
+
+
+def phase(name):
+    """
+    Returns a context manager timing a phase of the check being timed on the calling thread.
+    Does nothing when no check is being timed.
+    """
+    return _Phase(name)
+
+
+def instrument(obj, attribute, name):
+    """
+    Replaces a method of an instance with one timed as the given phase. Methods that are already
+    timed are left as they are.
+    """
+    function = getattr(obj, attribute)
+    if getattr(function, 'timed_phase', None) is not None:
+        return
+
+    def timed(*args, **kwargs):
+        with _Phase(name):
+            return function(*args, **kwargs)
+    timed.timed_phase = name
+    setattr(obj, attribute, timed)
+
+
+class CheckTiming(object):
+    """
+    The time spent in each phase of one check keyword. The phases of an asynchronous check are
+    added by the worker threads after the keyword returned.
+    """
+
+    def __init__(self, keyword, tag):
+        self.keyword = keyword
+        self.tag = tag
+        self.phases = collections.OrderedDict()
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def to_dict(self):
+        with self._lock:
+            phases = dict((name, round(seconds, 6)) for name, seconds in self.phases.items())
+        return {'keyword': self.keyword, 'tag': self.tag, 'total': round(self.total, 6), 'phases': phases}
+
+
+class _CheckScope(object):
+
+    def __init__(self, recorder, record):
+        self.recorder = recorder
+        self.record = record
+        self.phase = _Phase(OTHER)
+
+    def __enter__(self):
+        self.saved = getattr(_local, 'record', None), getattr(_local, 'stack', None)
+        _local.record, _local.stack = self.record, []
+        self.start = time.time()
+        self.phase.__enter__()
+        return self.record
+
+    def __exit__(self, *exc_info):
+        self.phase.__exit__()
+        self.record.total += time.time() - self.start
+        _local.record, _local.stack = self.saved
+        self.recorder._finish(self.record)
+        return False
+
+
+class NullRecorder(object):
+    """
+    Stands in for a TimingRecorder when timing is off, at the cost of a method call per keyword.
+    """
+    enabled = False
+
+    def check(self, keyword, tag):
+        return _NULL_SCOPE
+
+    def bind(self, function):
+        return function
+
+    def instrument(self, eyes):
+        pass
+
+
+class _NullScope(object):
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+NULL_RECORDER = NullRecorder()
+
+
+class TimingRecorder(object):
+    """
+    Records the time spent in each phase of the check keywords of an Eyes session:
+    - locate: finding the element of a region check.
+    - session: starting the Eyes session, on the first check.
+    - capture: taking the screenshot in the browser.
+    - decode: decoding the screenshot, and stitching full page screenshots.
+    - hash: hashing the screenshot for the screenshot cache.
+    - encode: encoding the screenshot and building the match request.
+    - upload and match: sending the request and waiting for Eyes to match it.
+    - wait: waiting for matches run by worker threads, whose phases are recorded as well.
+    - other: the rest of the keyword.
+
+    `on_check` is called with the CheckTiming of each keyword when the keyword returns.
+    """
+    enabled = True
+
+    def __init__(self, app_name, test_name, on_check=None, export_path=None):
+        self.app_name = app_name
+        self.test_name = test_name
+        self.export_path = export_path
+        self.records = []
+        self._on_check = on_check
+        self._lock = threading.Lock()
+
+    def check(self, keyword, tag):
+        """
+        Returns a context manager timing a check keyword run on the calling thread.
+        """
+        return _CheckScope(self, CheckTiming(keyword, tag))
+
+    def bind(self, function):
+        """
+        Returns a function that runs `function` as part of the check being timed on the calling
+        thread, for work that is handed to another thread.
+        """
+        record = getattr(_local, 'record', None)
+        if record is None:
+            return function
+
+        def bound(*args, **kwargs):
+            saved = getattr(_local, 'record', None), getattr(_local, 'stack', None)
+            _local.record, _local.stack = record, []
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _local.record, _local.stack = saved
+        return bound
+
+    def instrument(self, eyes):
+        """
+        Times the screenshots of the web driver and the requests sent by Eyes. The match window
+        task of Eyes is instrumented once the Eyes session has started. Only the objects of the
+        Eyes session are instrumented: the screenshots are timed on the EyesWebDriver wrapping
+        the web driver, which the browser library and the other sessions share.
+        """
+        instrument(eyes._driver, 'get_screenshot_as_base64', CAPTURE)
+        instrument(eyes._driver, 'find_element', LOCATE)
+        instrument(eyes._agent_connector, 'match_window', UPLOAD_AND_MATCH)
+        prepare_to_check = eyes._prepare_to_check
+
+        def timed_prepare_to_check():
+            with _Phase(SESSION):
+                prepare_to_check()
+            task = eyes._match_window_task
+            instrument(task, '_get_screenshot', DECODE)
+            instrument(task, '_create_match_data_bytes', ENCODE)
+        eyes._prepare_to_check = timed_prepare_to_check
+
+    def summary(self):
+        """
+        Returns the number of checks, their total time and the total time of each phase.
+        """
+        with self._lock:
+            records = list(self.records)
+        phases = collections.OrderedDict((name, 0.0) for name in PHASES)
+        for record in records:
+            for name, seconds in record.to_dict()['phases'].items():
+                phases[name] = phases.get(name, 0.0) + seconds
+        return len(records), sum(record.total for record in records), phases
+
+    def export(self, path):
+        """
+        Appends the timing of every check to a JSON lines file, or writes the phase totals of the
+        session to a Prometheus textfile when the path ends with .prom.
+        """
+        if path.endswith('.prom'):
+            self._export_prometheus(path)
+            return
+        with self._lock:
+            records = list(self.records)
+        with open(path, 'a') as export_file:
+            for record in records:
+                line = record.to_dict()
+                line.update(app=self.app_name, test=self.test_name)
+                export_file.write(json.dumps(line, sort_keys=True) + '\n')
+
+    def _finish(self, record):
+        with self._lock:
+            self.records.append(record)
+        if self._on_check is not None:
+            self._on_check(record)
+
+    def _export_prometheus(self, path):
+        """
+        Replaces the samples of this application and test in the textfile, keeping the others,
+        so the sessions of a run can share one file.
+        """
+        labels = 'app="%s",test="%s"' % (_escape_label(self.app_name), _escape_label(self.test_name))
+        count, total, phases = self.summary()
+        samples = collections.OrderedDict((name, []) for name in _METRICS)
+        try:
+            with open(path) as textfile:
+                for line in textfile:
+                    line = line.decode('utf-8', 'replace')
+                    name = line.split('{', 1)[0]
+                    if name in samples and ('{%s,' % labels) not in line and ('{%s}' % labels) not in line:
+                        samples[name].append(line.rstrip('\n'))
+        except IOError:
+            pass
+        samples['robotappeyes_checks_total'].append('robotappeyes_checks_total{%s} %d' % (labels, count))
+        samples['robotappeyes_check_seconds_total'].append('robotappeyes_check_seconds_total{%s} %.6f' %
+                                                           (labels, total))
+        for name, seconds in phases.items():
+            samples['robotappeyes_phase_seconds_total'].append('robotappeyes_phase_seconds_total{%s,phase="%s"} %.6f' %
+                                                               (labels, name.replace(' ', '_'), seconds))
+        lines = []
+        for name, (help_text, metric_type) in _METRICS.items():
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s %s' % (name, metric_type))
+            lines.extend(samples[name])
+        temp_path = '%s.%d.tmp' % (path, os.getpid())
+        with open(temp_path, 'w') as textfile:
+            textfile.write(('\n'.join(lines) + '\n').encode('utf-8'))
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+
+
+_METRICS = collections.OrderedDict([
+    ('robotappeyes_checks_total', ('Check keywords run by the Eyes session.', 'counter')),
+    ('robotappeyes_check_seconds_total', ('Time spent in the check keywords of the Eyes session.', 'counter')),
+    ('robotappeyes_phase_seconds_total', ('Time spent in each phase of the check keywords.', 'counter')),
+])
+
+
+def _escape_label(value):
+    if isinstance(value, str):
+        value = value.decode('utf-8', 'replace')
+    return (u'%s' % (value,)).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import time
+import random
+import threading
+import collections
+
+# The responses of a gateway or of an overloaded server, after which an idempotent request is sent again.
+RETRY_STATUSES = (502, 503, 504)
+# The response after which any request is sent again: the server did not handle it.
+NOT_HANDLED_STATUSES = (503,)
+# The seconds waited before the first retry, doubled for each retry up to MAX_BACKOFF, of which a random share
+# is waited so that the retries of parallel requests are spread out.
+BACKOFF = 0.5
+MAX_BACKOFF = 10.0
+CONNECT_TIMEOUT = 10
+_DEFAULT_HEADERS = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+
+
+def backoff_delay(retry, backoff=BACKOFF, max_backoff=MAX_BACKOFF):
+    """
+    Returns the seconds to wait before the `retry`th retry of a request, from 1.
+    """
+    return random.uniform(0, min(max_backoff, backoff * 2 ** (retry - 1)))
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))]
+
+
+class RequestStats(object):
+    """
+    The time, retries and outcome of the requests sent by a PooledAgentConnector, by request name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seconds = collections.OrderedDict()
+        self._retries = collections.defaultdict(int)
+        self._failures = collections.defaultdict(int)
+        self._bytes = collections.defaultdict(int)
+
+    def add(self, name, seconds, retries, failed, nbytes):
+        with self._lock:
+            self._seconds.setdefault(name, []).append(seconds)
+            self._retries[name] += retries
+            self._failures[name] += 1 if failed else 0
+            self._bytes[name] += nbytes
+
+    @property
+    def requests(self):
+        with self._lock:
+            return sum(len(seconds) for seconds in self._seconds.values())
+
+    def summary(self):
+        """
+        Returns a (name, requests, retries, failures, p50, p95, max seconds, bytes sent) tuple for each request name.
+        """
+        with self._lock:
+            return [(name, len(seconds), self._retries[name], self._failures[name], _percentile(seconds, 50),
+                     _percentile(seconds, 95), max(seconds), self._bytes[name])
+                    for name, seconds in self._seconds.items()]
+
+
+class HttpPool(object):
+    """
+    A requests session whose connections to the Eyes server are kept alive and shared by the connectors of every
+    Eyes session, so a TLS handshake is only made for a new connection. At most `max_connections` requests are
+    sent at a time, the other threads wait for a connection to be free.
+
+    A request that could not connect or was answered with one of NOT_HANDLED_STATUSES is sent again up to
+    `max_retries` times, after a jittered exponential backoff, or after the seconds of the Retry-After header of
+    the response when it is longer. An idempotent request is also sent again when its connection failed or timed
+    out after it was sent, or when it was answered with one of RETRY_STATUSES: the server may have handled the
+    others, and a match or a session start sent twice would add a step or a session.
+    """
+
+    def __init__(self, max_connections=8, max_retries=3, timeout=300):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.max_connections = max(1, max_connections)
+        self.max_retries = max(0, max_retries)
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_connections, pool_block=True, max_retries=0)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._transient_errors = (requests.ConnectionError, requests.Timeout)
+        self._connect_errors = (requests.ConnectTimeout, requests.packages.urllib3.exceptions.NewConnectionError)
+
+    def request(self, stats, name, method, url, data=None, idempotent=False, **kwargs):
+        """
+        Sends a request, retrying it as described above, records it in `stats` and returns the last response.
+        Raises the error of the last attempt when no response was received.
+        """
+        start = time.time()
+        retry = 0
+        while True:
+            error, response = None, None
+            with self._slots:
+                try:
+                    response = self._session.request(method, url, data=data, verify=False,
+                                                     timeout=(CONNECT_TIMEOUT, self.timeout), **kwargs)
+                except self._transient_errors as e:
+                    error = e
+            if not self._should_retry(error, response, idempotent) or retry >= self.max_retries:
+                break
+            retry += 1
+            delay = backoff_delay(retry)
+            if response is not None and response.headers.get('Retry-After', '').isdigit():
+                delay = max(delay, min(MAX_BACKOFF, int(response.headers['Retry-After'])))
+            time.sleep(delay)
+        stats.add(name, time.time() - start, retry, error is not None or response.status_code >= 400,
+                  len(data or '') * (retry + 1))
+        if error is not None:
+            raise error
+        return response
+
+    def _should_retry(self, error, response, idempotent):
+        if error is not None:
+            # A connection that could not be made is wrapped in a ConnectionError, with the error as its reason.
+            reason = getattr(error.args[0] if error.args else None, 'reason', None)
+            return idempotent or isinstance(error, self._connect_errors) or isinstance(reason, self._connect_errors)
+        return response.status_code in (RETRY_STATUSES if idempotent else NOT_HANDLED_STATUSES)
+
+    def close(self):
+        """
+        Closes the kept-alive connections. The pool connects again for the requests sent after.
+        """
+        self._session.close()
+
+
+class PooledAgentConnector(object):
+    """
+    A replacement for the AgentConnector of the Eyes SDK that sends the requests of an Eyes session through a
+    shared HttpPool and records them in its RequestStats.
+    """
+
+    def __init__(self, pool, server_url):
+        self.pool = pool
+        self.stats = RequestStats()
+        self.api_key = None
+        self._server_url = None
+        self._endpoint_uri = None
+        self.server_url = server_url
+
+    @property
+    def server_url(self):
+        return self._server_url
+
+    @server_url.setter
+    def server_url(self, server_url):
+        self._server_url = server_url
+        self._endpoint_uri = server_url.rstrip('/') + '/api/sessions/running'
+
+    def start_session(self, session_start_info):
+        from applitools.utils import general_utils
+        data = '{"startInfo": %s}' % general_utils.to_json(session_start_info)
+        response = self.pool.request(self.stats, 'start_session', 'POST', self._endpoint_uri, data,
+                                     params=dict(apiKey=self.api_key), headers=_DEFAULT_HEADERS)
+        response.raise_for_status()
+        parsed_response = response.json()
+        return dict(session_id=parsed_response['id'], session_url=parsed_response['url'],
+                    is_new_session=(response.status_code == 201))
+
+    def match_window(self, running_session, data):
+        headers = dict(_DEFAULT_HEADERS)
+        headers['Content-Type'] = 'application/octet-stream'
+        response = self.pool.request(self.stats, 'match_window', 'POST', self._session_uri(running_session), data,
+                                     params=dict(apiKey=self.api_key), headers=headers)
+        response.raise_for_status()
+        return response.json()['asExpected']
+
+    def stop_session(self, running_session, is_aborted, save):
+        from applitools.test_results import TestResults
+        params = {'aborted': is_aborted, 'updateBaseline': save, 'apiKey': self.api_key}
+        headers = dict(_DEFAULT_HEADERS)
+        headers['Eyes-Expect'] = '202-accepted'
+        # As in the SDK, the server answers 202 until the results are ready.
+        delay = 2
+        while True:
+            headers['Eyes-Date'] = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime())
+            response = self.pool.request(self.stats, 'stop_session', 'DELETE', self._session_uri(running_session),
+                                         idempotent=True, params=params, headers=headers)
+            if response.status_code != 202:
+                break
+            time.sleep(delay)
+            delay = min(10, delay * 1.5)
+        response.raise_for_status()
+        pr = response.json()
+        return TestResults(pr['steps'], pr['matches'], pr['mismatches'], pr['missing'],
+                           pr['exactMatches'], pr['strictMatches'], pr['contentMatches'],
+                           pr['layoutMatches'], pr['noneMatches'])
+
+    def _session_uri(self, running_session):
+        return '%s/%s' % (self._endpoint_uri, running_session['session_id'])
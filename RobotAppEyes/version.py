@@ -14,4 +14,4 @@
 #  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
-VERSION = '1.2'
+VERSION = '1.3'
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import re
+import fullpage
+from applitools.errors import EyesError
+from imagesource import create_match_data
+from timing import phase, SESSION
+
+PASSED = 'passed'
+NEW = 'new'
+UNRESOLVED = 'unresolved'
+FAILED = 'failed'
+
+# The settings of an Eyes session that the session of each viewport takes over.
+_SETTINGS = ('match_level', 'host_os', 'host_app', 'baseline_name', 'save_new_tests', 'save_failed_tests',
+             'branch_name', 'parent_branch_name', 'hide_scrollbars', 'agent_id')
+_SIZE = re.compile(r'^\s*(\d+)\s*[xX*]\s*(\d+)\s*$')
+
+
+def parse_sizes(sizes):
+    """
+    Returns the viewport sizes given as a list of WIDTHxHEIGHT strings, or as one string of them
+    separated by commas, as {'width', 'height'} dictionaries.
+    """
+    if isinstance(sizes, basestring):
+        sizes = sizes.split(',')
+    parsed = []
+    for size in sizes:
+        match = _SIZE.match(size)
+        if match is None:
+            raise EyesError("'%s' is not a viewport size, use WIDTHxHEIGHT, e.g. 1024x768" % size)
+        parsed.append({'width': int(match.group(1)), 'height': int(match.group(2))})
+    if not parsed:
+        raise EyesError('No viewport size was given')
+    return parsed
+
+
+def size_name(size):
+    return '%dx%d' % (size['width'], size['height'])
+
+
+def viewport_batch(eyes):
+    """
+    Returns the batch the sessions of the viewports are reported in: a copy of the batch of the given session, or
+    a new batch when the session has none yet. The session itself is not changed.
+    """
+    from applitools.eyes import BatchInfo
+    if eyes.batch is None:
+        return BatchInfo()
+    # BatchInfo refuses to be copied by the copy module.
+    batch = BatchInfo(eyes.batch.name, eyes.batch.started_at)
+    batch.id_ = eyes.batch.id_
+    return batch
+
+
+class ViewportResult(object):
+    """
+    The outcome of checking one viewport size, in its own Eyes session.
+    """
+
+    def __init__(self, size, tag):
+        self.size = size
+        self.tag = tag
+        self.status = None
+        self.url = None
+        self.error = None
+
+
+class ViewportCheck(object):
+    """
+    Checks the window at one viewport size in an Eyes session of its own, configured as the given
+    session, sharing its agent connector, and reported in `batch`, see viewport_batch. Eyes keeps a
+    baseline per viewport size.
+
+    `capture` resizes the browser and takes the screenshot, on the thread driving the browser.
+    `run` starts the Eyes session, matches the screenshot and closes the session; it only talks
+    to the server, so it runs on a worker thread while the browser renders the next size.
+    """
+
+    def __init__(self, eyes, driver, size, tag, batch, payload=None):
+        from applitools.eyes import Eyes
+        self.result = ViewportResult(size, tag)
+        self.eyes = Eyes()
+        self.eyes._agent_connector = eyes._agent_connector
+        for name in _SETTINGS:
+            setattr(self.eyes, name, getattr(eyes, name))
+        self.eyes.batch = batch
+        self.eyes.open(driver, eyes._app_name, eyes._test_name, size)
+        fullpage.install(self.eyes)
+        self.payload = payload
+        self._screenshot = None
+        self._app_output = None
+
+    def capture(self, force_full_page_screenshot=False, wait=None):
+        """
+        Sets the viewport size, calls `wait` when given, and takes the screenshot. Returns the
+        size of the screenshot in bytes.
+        """
+        from applitools._match_window_task import MatchWindowTask
+        eyes = self.eyes
+        eyes._assign_viewport_size()
+        if wait is not None:
+            wait()
+        eyes._create_start_info()
+        eyes._match_window_task = MatchWindowTask(eyes, eyes._agent_connector, None, eyes._driver,
+                                                  eyes.match_timeout)
+        self._screenshot = eyes._match_window_task._get_screenshot(force_full_page_screenshot)
+        self._app_output = {'title': eyes.get_title(), 'screenshot64': None}
+        image = self._screenshot._screenshot
+        return image.width * image.height * image.pixel_size
+
+    def run(self):
+        """
+        Starts the Eyes session, matches the screenshot once and closes the session. Returns the
+        ViewportResult, whose error is set when the session could not be run.
+        """
+        eyes, result = self.eyes, self.result
+        try:
+            with phase(SESSION):
+                eyes._running_session = eyes._agent_connector.start_session(eyes._start_info)
+            screenshot = self._screenshot
+            if self.payload is not None:
+                screenshot = self.payload.reduce('%s (%s)' % (result.tag, size_name(result.size)), screenshot)
+            data = create_match_data(self._app_output, [], result.tag, False, screenshot)
+            self._screenshot = None
+            eyes._agent_connector.match_window(eyes._running_session, data)
+            results = eyes.close(False)
+            result.url = results.url
+            result.status = NEW if results.is_new else PASSED if results.is_passed else UNRESOLVED
+        except Exception as e:
+            result.status, result.error = FAILED, e
+            try:
+                eyes.abort_if_not_closed()
+            except Exception:
+                pass
+        return result
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+A local stand-in for the Eyes server, implementing the session start, match and stop requests
+of the Eyes SDK with a configurable latency and bandwidth. Every match is reported as matching,
+and every test as having a baseline unless new_sessions is set.
+
+With baselines set, the server keeps a baseline for each application and test as Eyes does: the
+first session of a test is new and becomes its baseline, and the steps of the later sessions are
+paired with the steps of the baseline by their position and match when their screenshot bytes
+are identical. An attempt sent with ignoreMismatch that does not match is a retry, it does not
+take a step, and the baseline steps no step was paired with are reported as missing.
+
+Faults can be injected to test retries: a share of the requests, or the next requests, are
+answered with an error status such as 503, or their connection is dropped without an answer.
+The number of connections accepted is counted, to test that connections are kept alive.
+
+Use it from a benchmark:
+
+    server = FakeEyesServer(latency=0.05, bandwidth=10 * 1024 * 1024)
+    server.start()
+    ... Open Eyes Session with serverUrl=server.url ...
+    server.stop()
+
+or run it on its own and point Open Eyes Session at it:
+
+    python fakeeyes.py [--port 8123] [--latency 0.05] [--bandwidth-mbps 80] [--fault-rate 0.1]
+                       [--fault-status 503]
+"""
+
+import json
+import time
+import hashlib
+import random
+import struct
+import argparse
+import threading
+import itertools
+import urlparse
+import SocketServer
+import BaseHTTPServer
+
+_SESSIONS_PATH = '/api/sessions/running'
+# The fault status that drops the connection instead of answering.
+DROP = 0
+
+
+class FakeEyesSession(object):
+
+    def __init__(self, session_id, start_info, baseline=None):
+        self.session_id = session_id
+        self.start_info = start_info
+        self.baseline = baseline
+        self.tags = []
+        # The screenshot digest and match result of each step.
+        self.steps = []
+
+    @property
+    def is_new(self):
+        return self.baseline is None
+
+    def results(self):
+        matches = len([step for step in self.steps if step[1]])
+        missing = max(0, len(self.baseline) - len(self.steps)) if self.baseline is not None else 0
+        return {'steps': len(self.steps), 'matches': matches, 'mismatches': len(self.steps) - matches,
+                'missing': missing, 'exactMatches': 0, 'strictMatches': matches, 'contentMatches': 0,
+                'layoutMatches': 0, 'noneMatches': 0}
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # Keep-alive, as the Eyes server.
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self._read_body()
+        if self._inject_fault():
+            return
+        path = urlparse.urlparse(self.path).path.rstrip('/')
+        if path == _SESSIONS_PATH:
+            session = self.server.eyes.start_session(json.loads(body)['startInfo'])
+            self._reply(201 if session.is_new else 200, {'id': session.session_id, 'url': 'http://localhost/sessions/' + session.session_id})
+        elif path.startswith(_SESSIONS_PATH + '/'):
+            size = struct.unpack('>L', body[:4])[0]
+            match_data = json.loads(body[4:4 + size])
+            as_expected = self.server.eyes.match(path[len(_SESSIONS_PATH) + 1:], match_data['tag'],
+                                                 body[4 + size:], match_data.get('ignoreMismatch', False))
+            self._reply(200, {'asExpected': as_expected})
+        else:
+            self._reply(404, {})
+
+    def do_DELETE(self):
+        self._read_body()
+        if self._inject_fault():
+            return
+        path = urlparse.urlparse(self.path).path.rstrip('/')
+        self._reply(200, self.server.eyes.stop_session(path[len(_SESSIONS_PATH) + 1:]).results())
+
+    def _inject_fault(self):
+        """
+        Answers the request with the next injected fault, if any, and returns True when it did.
+        """
+        status = self.server.eyes.next_fault()
+        if status is None:
+            return False
+        if status == DROP:
+            self.close_connection = True
+        else:
+            self._reply(status, {})
+        return True
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        received = 0
+        chunks = []
+        while received < length:
+            chunk = self.rfile.read(min(length - received, 1024 * 1024))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            received += len(chunk)
+        self.server.eyes.delay(received)
+        return ''.join(chunks)
+
+    def _reply(self, status, content):
+        body = json.dumps(content)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def process_request(self, request, client_address):
+        self.eyes.count_connection()
+        SocketServer.ThreadingMixIn.process_request(self, request, client_address)
+
+
+class FakeEyesServer(object):
+    """
+    Serves the Eyes requests on a local port. Each request is delayed by `latency` seconds plus
+    the time its body takes to arrive at `bandwidth` bytes per second (unlimited when None).
+
+    Eyes waits for the whole match timeout before matching the first step of a new test, so tests
+    are reported as existing ones by default.
+    """
+
+    def __init__(self, port=0, latency=0.0, bandwidth=None, new_sessions=False, fault_rate=0.0, fault_status=503,
+                 baselines=False):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.new_sessions = new_sessions
+        # The screenshot digests of the steps of each test, by application and test name, when kept.
+        self.baselines = {} if baselines else None
+        self.fault_rate = fault_rate
+        self.fault_status = fault_status
+        self.sessions = {}
+        self.stopped = []
+        self.requests = 0
+        self.bytes_received = 0
+        self.connections = 0
+        self.faults = 0
+        self._next_faults = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', port), _Handler)
+        self._server.eyes = self
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def delay(self, nbytes):
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += nbytes
+        seconds = self.latency
+        if self.bandwidth:
+            seconds += float(nbytes) / self.bandwidth
+        if seconds:
+            time.sleep(seconds)
+
+    def fail_next(self, count, status=503):
+        """
+        Answers the next `count` requests with `status`, or drops their connection when it is DROP.
+        """
+        with self._lock:
+            self._next_faults.extend([status] * count)
+
+    def next_fault(self):
+        """
+        Returns the status of the fault to inject into the request being answered, or None.
+        """
+        with self._lock:
+            if self._next_faults:
+                status = self._next_faults.pop(0)
+            elif self.fault_rate and random.random() < self.fault_rate:
+                status = self.fault_status
+            else:
+                return None
+            self.faults += 1
+            return status
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def start_session(self, start_info):
+        with self._lock:
+            if self.baselines is not None:
+                baseline = self.baselines.get(self._test_key(start_info))
+            else:
+                baseline = None if self.new_sessions else []
+            session = FakeEyesSession(str(next(self._ids)), start_info, baseline)
+            self.sessions[session.session_id] = session
+        return session
+
+    def match(self, session_id, tag, screenshot='', ignore_mismatch=False):
+        """
+        Matches a step and returns whether it matched.
+        """
+        with self._lock:
+            session = self.sessions[session_id]
+            digest = hashlib.sha1(screenshot).hexdigest()
+            if self.baselines is None or session.is_new:
+                as_expected = True
+            else:
+                position = len(session.steps)
+                as_expected = position < len(session.baseline) and session.baseline[position] == digest
+            if as_expected or not ignore_mismatch:
+                session.tags.append(tag)
+                session.steps.append((digest, as_expected))
+            return as_expected
+
+    def stop_session(self, session_id):
+        with self._lock:
+            session = self.sessions.pop(session_id)
+            self.stopped.append(session)
+            if self.baselines is not None and session.is_new:
+                self.baselines[self._test_key(session.start_info)] = [digest for digest, _ in session.steps]
+            return session
+
+    @staticmethod
+    def _test_key(start_info):
+        return start_info.get('appIdOrName'), start_info.get('scenarioIdOrName')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8123)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request.')
+    parser.add_argument('--bandwidth-mbps', type=float, help='Upload bandwidth in megabits per second.')
+    parser.add_argument('--fault-rate', type=float, default=0.0, help='The share of requests answered with a fault.')
+    parser.add_argument('--fault-status', type=int, default=503, help='The status of the faults, 0 drops the connection.')
+    args = parser.parse_args()
+    bandwidth = args.bandwidth_mbps * 1000000 / 8 if args.bandwidth_mbps else None
+    server = FakeEyesServer(args.port, args.latency, bandwidth, fault_rate=args.fault_rate,
+                            fault_status=args.fault_status)
+    print("Fake Eyes server listening on %s" % server.url)
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Measures the memory and CPU cost of building the match request of Compare Image.
+
+The 'decode' variant is the ingestion path used up to version 1.2: the file is read, base64 encoded,
+decoded again, decoded into pixels and re-encoded. The 'mmap' variant is the current path: the file
+is memory-mapped and copied once into the request body.
+
+Each call runs in a fresh process, and the peak RSS growth of that process is reported as the bytes
+allocated by the call.
+
+    python ingest_benchmark.py [--width 1280] [--height 8000] [--repeat 3] [--image path.png]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+VARIANTS = ('decode', 'mmap')
+
+
+def _peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on Mac OS X.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _create_image(path, width, height):
+    import png
+    rnd = random.Random(0)
+    # Blocks of noise, so the file is about as large as a real full-page capture.
+    noise = bytearray(rnd.getrandbits(8) for _ in range(width * 3 * 16))
+
+    def rows():
+        for y in range(height):
+            start = (y % 16) * width * 3
+            yield noise[start:start + width * 3]
+
+    with open(path, 'wb') as image_file:
+        png.Writer(width=width, height=height, greyscale=False).write(image_file, rows())
+
+
+def _build_request(variant, path):
+    app_output = {'title': '', 'screenshot64': None}
+    if variant == 'decode':
+        import base64
+        from applitools.utils import _image_utils
+        from applitools._match_window_task import MatchWindowTask
+        with open(path, 'rb') as image_file:
+            screenshot64 = image_file.read().encode('base64')
+            screenshot = _image_utils.png_image_from_bytes(base64.b64decode(screenshot64))
+        # EyesScreenshot.get_bytes re-encodes the decoded image.
+        return MatchWindowTask._create_match_data_bytes(app_output, [], 'tag', False, screenshot)
+    from RobotAppEyes.imagesource import PngFile, create_match_data
+    screenshot = PngFile(path)
+    try:
+        return create_match_data(app_output, [], 'tag', False, screenshot)
+    finally:
+        screenshot.close()
+
+
+def _run_child(variant, path):
+    # Import everything first so the measurement only covers the call itself.
+    import applitools.eyes
+    import RobotAppEyes.imagesource
+    before = _peak_rss_bytes()
+    start, cpu_start = time.time(), time.clock()
+    body = _build_request(variant, path)
+    result = {'variant': variant, 'seconds': time.time() - start, 'cpu_seconds': time.clock() - cpu_start,
+              'body_bytes': len(body), 'allocated_bytes': _peak_rss_bytes() - before}
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=8000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--image', help='An existing PNG file to use instead of a generated one.')
+    parser.add_argument('--child', choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _run_child(args.child, args.image)
+        return
+
+    path = args.image
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.png')
+        os.close(handle)
+        _create_image(path, args.width, args.height)
+    try:
+        print("Image: %s (%.1f MB)" % (path, os.path.getsize(path) / 1048576.0))
+        for variant in VARIANTS:
+            runs = [json.loads(subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                                        '--child', variant, '--image', path]))
+                    for _ in range(args.repeat)]
+            allocated = sorted(run['allocated_bytes'] for run in runs)[len(runs) // 2]
+            cpu = sorted(run['cpu_seconds'] for run in runs)[len(runs) // 2]
+            print("%-7s allocated per call: %8.1f MB   cpu per call: %6.2fs" % (variant, allocated / 1048576.0, cpu))
+    finally:
+        if args.image is None:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Times the RobotAppEyes keywords against the fake Eyes server of fakeeyes.py and a fake browser.
+
+Every combination of image size, concurrency and latency is a scenario. A scenario runs
+`concurrency` threads, each opening its own Eyes session and calling every check keyword,
+Compare Image and Close Eyes Session `--iterations` times. Each scenario runs in a fresh process
+so its peak memory can be measured.
+
+The p50 and p99 latency of every keyword, the throughput of the scenario and its peak RSS are
+printed and written as JSON. Passing the JSON of an earlier run with --baseline reports the
+keywords whose p50 latency grew by more than --threshold.
+
+The time and number of modules it takes to import the library are measured first, in fresh
+processes. Importing the library must not load Selenium, the Eyes SDK, NumPy or Robot Framework,
+which are imported by the keywords that need them; the benchmark fails when it does, and with
+--baseline when the import time grew by more than --threshold or more modules are imported.
+
+    python keyword_benchmark.py [--sizes 800x600,1280x4000] [--concurrency 1,4] [--latency 0,0.05]
+                                [--bandwidth-mbps 100] [--iterations 5] [--async-checks] [--http-pool]
+                                [--fault-rate 0.05] [--output results.json]
+                                [--baseline previous.json] [--threshold 1.25]
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+KEYWORDS = ('Open Eyes Session', 'Check Eyes Window', 'Check Eyes Region', 'Check Eyes Region By Element',
+            'Check Eyes Region By Selector', 'Check Eyes Regions', 'Compare Image', 'Close Eyes Session')
+REGION_LOCATORS = ['css=.navbar', 'id=main', 'xpath=//footer', 'link=Home', 'class=widget']
+# The packages importing the library must not load.
+LAZY_PACKAGES = ('selenium', 'appium', 'requests', 'numpy', 'robot', 'applitools.eyes')
+IMPORT_RUNS = 5
+
+
+def _peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on Mac OS X.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))]
+
+
+def _create_png(width, height, seed=0):
+    import png
+    import io
+    rnd = random.Random(seed)
+    # Blocks of noise, so the image compresses about as well as a real screenshot.
+    noise = bytearray(rnd.getrandbits(8) for _ in range(width * 3 * 16))
+    rows = (noise[(y % 16) * width * 3:(y % 16 + 1) * width * 3] for y in range(height))
+    out = io.BytesIO()
+    png.Writer(width=width, height=height, greyscale=False).write(out, rows)
+    return out.getvalue()
+
+
+class FakeElement(object):
+
+    def __init__(self, x=10, y=10, width=200, height=100):
+        self.location = {'x': x, 'y': y}
+        self.size = {'width': width, 'height': height}
+
+    def find_element(self, by=None, value=None):
+        return FakeElement()
+
+    def find_elements(self, by=None, value=None):
+        return [FakeElement()]
+
+
+class FakeSwitchTo(object):
+
+    def default_content(self):
+        pass
+
+    def frame(self, frame_reference):
+        pass
+
+    def parent_frame(self):
+        pass
+
+
+class FakeWebDriver(object):
+    """
+    Answers the calls Eyes makes on a Selenium web driver, with a screenshot of a fixed size.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.capabilities = {'takesScreenshot': True}
+        self.desired_capabilities = {}
+        self.title = 'RobotAppEyes benchmark'
+        self.switch_to = FakeSwitchTo()
+        self._screenshot64 = base64.b64encode(_create_png(width, height))
+
+    def execute_script(self, script, *args):
+        if 'getBoundingClientRect' in script:
+            return [[10 + 20 * index, 10 + 10 * index, 200, 100] for index in range(len(args[0]))]
+        if 'innerHeight' in script:
+            return [self.width, self.height]
+        if 'scrollWidth' in script:
+            return self.width
+        if 'scrollHeight' in script or 'clientHeight' in script:
+            return self.height
+        if 'userAgent' in script:
+            return 'RobotAppEyes benchmark'
+        if 'scrollX' in script or 'scrollY' in script:
+            return 0
+        return None
+
+    def get_screenshot_as_base64(self):
+        return self._screenshot64
+
+    def get_window_size(self):
+        return {'width': self.width, 'height': self.height}
+
+    def set_window_size(self, width, height):
+        pass
+
+    def find_element(self, by=None, value=None):
+        return FakeElement()
+
+    def find_element_by_xpath(self, xpath):
+        return FakeElement()
+
+    def find_element_by_css_selector(self, css_selector):
+        return FakeElement()
+
+
+def _benchmark_library(driver):
+    from RobotAppEyes.RobotAppEyes import RobotAppEyes
+
+    class BenchmarkAppEyes(RobotAppEyes):
+        """
+        Checks the fake browser instead of the Selenium2Library browser.
+        """
+
+        def _current_browser(self):
+            return driver
+
+    return BenchmarkAppEyes()
+
+
+def _run_session(library, server_url, image_path, iterations, async_checks, timings, http_pool=False):
+    def timed(keyword, function, *args, **kwargs):
+        start = time.time()
+        function(*args, **kwargs)
+        timings.setdefault(keyword, []).append(time.time() - start)
+
+    for _ in range(iterations):
+        timed('Open Eyes Session', library.open_eyes_session, 'RobotAppEyes Benchmark', 'Benchmark', 'benchmark-key',
+              serverUrl=server_url, asyncChecks=async_checks, httpPool=http_pool)
+        timed('Check Eyes Window', library.check_eyes_window, 'Window')
+        timed('Check Eyes Region', library.check_eyes_region, '//body', 200, 100, 'Region')
+        timed('Check Eyes Region By Element', library.check_eyes_region_by_element, 'XPATH', '//body', 'Element')
+        timed('Check Eyes Region By Selector', library.check_eyes_region_by_selector, 'CSS SELECTOR', 'body',
+              'Selector')
+        timed('Check Eyes Regions', library.check_eyes_regions, REGION_LOCATORS)
+        timed('Compare Image', library.compare_image, image_path, 'Image')
+        timed('Close Eyes Session', library.close_eyes_session)
+
+
+def _measure_import():
+    before = set(name for name, module in sys.modules.items() if module is not None)
+    start = time.time()
+    import RobotAppEyes
+    elapsed = time.time() - start
+    modules = set(name for name, module in sys.modules.items() if module is not None) - before
+    loaded = [package for package in LAZY_PACKAGES
+              if any(name == package or name.startswith(package + '.') for name in modules)]
+    return {'seconds': elapsed, 'modules': len(modules), 'lazy_packages_loaded': loaded}
+
+
+def _benchmark_import():
+    """
+    Imports the library in IMPORT_RUNS fresh processes and returns the median import.
+    """
+    runs = []
+    for _ in range(IMPORT_RUNS):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--import-child'])
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return sorted(runs, key=lambda run: run['seconds'])[len(runs) // 2]
+
+
+def _run_scenario(scenario):
+    from fakeeyes import FakeEyesServer
+    # Import everything first so the peak memory only covers the keywords.
+    import RobotAppEyes.RobotAppEyes
+    width, height = scenario['width'], scenario['height']
+    server = FakeEyesServer(latency=scenario['latency'], bandwidth=scenario['bandwidth'],
+                            fault_rate=scenario.get('fault_rate', 0.0)).start()
+    handle, image_path = tempfile.mkstemp(suffix='.png')
+    with os.fdopen(handle, 'wb') as image_file:
+        image_file.write(_create_png(width, height, seed=1))
+    library = _benchmark_library(FakeWebDriver(width, height))
+    timings = [{} for _ in range(scenario['concurrency'])]
+    errors = []
+
+    def worker(worker_timings):
+        try:
+            _run_session(library, server.url, image_path, scenario['iterations'], scenario['async_checks'],
+                         worker_timings, scenario.get('http_pool', False))
+        except Exception as e:
+            errors.append('%s: %s' % (type(e).__name__, e))
+
+    before = _peak_rss_bytes()
+    start = time.time()
+    threads = [threading.Thread(target=worker, args=(worker_timings,)) for worker_timings in timings]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    server.stop()
+    os.remove(image_path)
+
+    keywords = {}
+    for keyword in KEYWORDS:
+        samples = [sample for worker_timings in timings for sample in worker_timings.get(keyword, [])]
+        if samples:
+            keywords[keyword] = {'calls': len(samples), 'p50': _percentile(samples, 50),
+                                 'p99': _percentile(samples, 99), 'mean': sum(samples) / len(samples)}
+    calls = sum(keyword['calls'] for keyword in keywords.values())
+    result = dict(scenario)
+    result.update({'seconds': elapsed, 'keywords': keywords, 'errors': errors,
+                   'calls_per_second': calls / elapsed, 'upload_mb_per_second': server.bytes_received / 1048576.0 / elapsed,
+                   'peak_rss_bytes': _peak_rss_bytes(), 'rss_growth_bytes': _peak_rss_bytes() - before,
+                   'connections': server.connections, 'faults': server.faults})
+    return result
+
+
+def _name(scenario):
+    name = '%(width)dx%(height)d c%(concurrency)d latency %(latency)gs' % scenario
+    if scenario.get('async_checks'):
+        name += ' async'
+    if scenario.get('http_pool'):
+        name += ' pooled'
+    if scenario.get('fault_rate'):
+        name += ' faults %g' % scenario['fault_rate']
+    return name
+
+
+def _report(result):
+    print("\n%s: %.1f keywords/s, %.1f MB/s uploaded, peak RSS %.1f MB, %d connections, %d faults" %
+          (_name(result), result['calls_per_second'], result['upload_mb_per_second'],
+           result['peak_rss_bytes'] / 1048576.0, result.get('connections', 0), result.get('faults', 0)))
+    for keyword in KEYWORDS:
+        timing = result['keywords'].get(keyword)
+        if timing:
+            print("  %-30s p50 %8.1f ms   p99 %8.1f ms" % (keyword, timing['p50'] * 1000, timing['p99'] * 1000))
+    for error in result['errors']:
+        print("  error: %s" % error)
+
+
+def _import_regressions(result, baseline, threshold):
+    old = baseline.get('import')
+    if old is None:
+        return
+    if result['seconds'] > old['seconds'] * threshold:
+        yield 'import: %.1f ms -> %.1f ms' % (old['seconds'] * 1000, result['seconds'] * 1000)
+    if result['modules'] > old['modules']:
+        yield 'import: %d modules -> %d modules' % (old['modules'], result['modules'])
+
+
+def _regressions(results, baseline, threshold):
+    previous = dict((_name(result), result) for result in baseline['scenarios'])
+    for result in results:
+        old = previous.get(_name(result))
+        if old is None:
+            continue
+        for keyword, timing in sorted(result['keywords'].items()):
+            old_timing = old['keywords'].get(keyword)
+            if old_timing and timing['p50'] > old_timing['p50'] * threshold:
+                yield '%s: %s p50 %.1f ms -> %.1f ms' % (_name(result), keyword, old_timing['p50'] * 1000,
+                                                         timing['p50'] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='800x600,1280x4000', help='Comma separated WIDTHxHEIGHT image sizes.')
+    parser.add_argument('--concurrency', default='1,4', help='Comma separated numbers of parallel sessions.')
+    parser.add_argument('--latency', default='0,0.05', help='Comma separated seconds added to every request.')
+    parser.add_argument('--bandwidth-mbps', type=float, help='Upload bandwidth in megabits per second.')
+    parser.add_argument('--iterations', type=int, default=5, help='Sessions run by each thread.')
+    parser.add_argument('--async-checks', action='store_true', help='Opens the sessions with Async Checks.')
+    parser.add_argument('--http-pool', action='store_true', help='Opens the sessions with HTTP Pool.')
+    parser.add_argument('--fault-rate', type=float, default=0.0,
+                        help='The share of requests the fake server answers with 503, with --http-pool.')
+    parser.add_argument('--output', help='Writes the results as JSON to this file.')
+    parser.add_argument('--baseline', help='The JSON results of an earlier run to compare with.')
+    parser.add_argument('--threshold', type=float, default=1.25, help='The p50 growth reported as a regression.')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--import-child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_scenario(json.loads(args.child))))
+        return
+    if args.import_child:
+        print(json.dumps(_measure_import()))
+        return
+
+    library_import = _benchmark_import()
+    print("Import: %.1f ms, %d modules" % (library_import['seconds'] * 1000, library_import['modules']))
+    if library_import['lazy_packages_loaded']:
+        print("  error: importing the library loads %s" % ', '.join(library_import['lazy_packages_loaded']))
+
+    bandwidth = args.bandwidth_mbps * 1000000 / 8 if args.bandwidth_mbps else None
+    results = []
+    for size in args.sizes.split(','):
+        width, height = [int(value) for value in size.lower().split('x')]
+        for concurrency in [int(value) for value in args.concurrency.split(',')]:
+            for latency in [float(value) for value in args.latency.split(',')]:
+                scenario = {'width': width, 'height': height, 'concurrency': concurrency, 'latency': latency,
+                            'bandwidth': bandwidth, 'iterations': args.iterations,
+                            'async_checks': args.async_checks, 'http_pool': args.http_pool,
+                            'fault_rate': args.fault_rate}
+                output = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                                  '--child', json.dumps(scenario)])
+                result = json.loads(output.strip().splitlines()[-1])
+                _report(result)
+                results.append(result)
+
+    from RobotAppEyes.version import VERSION
+    report = {'version': VERSION, 'python': platform.python_version(), 'platform': platform.platform(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'import': library_import, 'scenarios': results}
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = list(_import_regressions(library_import, baseline, args.threshold))
+        regressions.extend(_regressions(results, baseline, args.threshold))
+        print("\n%d regression(s) against %s" % (len(regressions), args.baseline))
+        for regression in regressions:
+            print("  " + regression)
+        if regressions:
+            sys.exit(1)
+    if library_import['lazy_packages_loaded']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
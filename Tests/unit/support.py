@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+What the unit tests share: the fake browser and Eyes server of the benchmarks, a library checking the
+fake browser, and a stand-in for Robot Framework's BuiltIn library that records what is logged.
+
+Run the unit tests from the root of the repository with:
+
+    python -m unittest discover -s Tests/unit
+"""
+
+import os
+import sys
+import base64
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, '..', '..'))
+sys.path.insert(0, os.path.join(_HERE, '..', 'benchmark'))
+
+import keyword_benchmark
+from fakeeyes import FakeEyesServer
+from keyword_benchmark import FakeWebDriver
+
+
+def png(width=64, height=48, seed=0):
+    """
+    Returns the bytes of a PNG image of noise, a different image for each seed.
+    """
+    return keyword_benchmark._create_png(width, height, seed)
+
+
+class ScreenshotDriver(FakeWebDriver):
+    """
+    A fake browser whose screenshot is the image of `seed`, which the tests change between checks.
+    """
+
+    def __init__(self, width=64, height=48):
+        FakeWebDriver.__init__(self, width, height)
+        self._images = {}
+        self.show(0)
+
+    def show(self, seed):
+        if seed not in self._images:
+            self._images[seed] = base64.b64encode(png(self.width, self.height, seed))
+        self._screenshot64 = self._images[seed]
+
+    def set_window_position(self, x, y):
+        pass
+
+
+class RecordingBuiltIn(object):
+    """
+    Records the messages logged by the library as (level, message).
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def log(self, message, level='INFO', *args, **kwargs):
+        self.messages.append((level, message))
+
+    def __call__(self):
+        return self
+
+
+def library(driver):
+    """
+    Returns a library checking the fake browser and a RecordingBuiltIn it logs to.
+    """
+    import RobotAppEyes
+    module = sys.modules['RobotAppEyes.RobotAppEyes']
+    builtin = RecordingBuiltIn()
+    module._builtin = builtin
+    return keyword_benchmark._benchmark_library(driver), builtin
+
+
+def start_server(**kwargs):
+    return FakeEyesServer(**kwargs).start()
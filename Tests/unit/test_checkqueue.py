@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import time
+import random
+import threading
+import unittest
+import support  # noqa: puts the library on the path
+from RobotAppEyes.checkqueue import CheckQueue
+
+
+class CheckQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = CheckQueue(workers=4, max_pending=4)
+
+    def tearDown(self):
+        self.queue.shutdown()
+
+    def test_checks_are_sent_in_the_order_they_were_submitted(self):
+        sent = []
+
+        def prepare():
+            # The checks are prepared concurrently and finish out of order.
+            time.sleep(random.random() / 100)
+
+        for number in range(20):
+            self.queue.submit('Check %d' % number, prepare, lambda data, number=number: sent.append(number))
+        self.queue.wait()
+        self.assertEqual(sent, range(20))
+
+    def test_the_prepared_data_is_sent(self):
+        check = self.queue.submit('Check', lambda: 'data', lambda data: data.upper())
+        self.assertTrue(check.wait(5))
+        self.assertEqual((check.result, check.error), ('DATA', None))
+
+    def test_an_error_is_kept_on_its_check_and_does_not_stop_the_others(self):
+        def fail(data):
+            raise ValueError('no match')
+        failed = self.queue.submit('Failed', lambda: None, fail)
+        passed = self.queue.submit('Passed', lambda: None, lambda data: True)
+        self.assertEqual(self.queue.wait(), [failed, passed])
+        self.assertIsInstance(failed.error, ValueError)
+        self.assertTrue(passed.result)
+
+    def test_submit_blocks_while_the_queue_is_full(self):
+        release = threading.Event()
+        for number in range(4):
+            self.queue.submit('Check %d' % number, lambda: None, lambda data: release.wait(5))
+        submitted = threading.Event()
+        thread = threading.Thread(target=lambda: (self.queue.submit('Last', lambda: None, lambda data: True),
+                                                  submitted.set()))
+        thread.start()
+        self.assertFalse(submitted.wait(0.2))
+        release.set()
+        self.assertTrue(submitted.wait(5))
+        thread.join()
+
+    def test_an_oversized_check_is_accepted_when_nothing_else_is_pending(self):
+        queue = CheckQueue(workers=1, max_pending_bytes=10)
+        try:
+            check = queue.submit('Large', lambda: None, lambda data: True, nbytes=100)
+            self.assertTrue(check.wait(5))
+        finally:
+            queue.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
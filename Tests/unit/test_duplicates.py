@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import unittest
+import support  # noqa: puts the library on the path
+from applitools.errors import EyesError
+from RobotAppEyes.duplicates import DuplicateFilter, RECORD, REUSE, SESSION, SKIP
+
+
+class DuplicateFilterTest(unittest.TestCase):
+
+    def test_a_repeat_of_the_same_tag_is_found(self):
+        duplicates = DuplicateFilter(SKIP)
+        recent = duplicates.remember(duplicates.key('hash', 'Home', 'STRICT'), 'Home')
+        self.assertIs(duplicates.repeat_of(duplicates.key('hash', 'Home', 'STRICT')), recent)
+        self.assertIsNone(duplicates.repeat_of(duplicates.key('hash', 'Other', 'STRICT')))
+        self.assertIsNone(duplicates.repeat_of(duplicates.key('hash', 'Home', 'LAYOUT')))
+        self.assertEqual(duplicates.skipped, 1)
+
+    def test_the_session_scope_finds_a_repeat_of_any_tag(self):
+        duplicates = DuplicateFilter(REUSE, SESSION)
+        recent = duplicates.remember(duplicates.key('hash', 'Home', 'STRICT'), 'Home')
+        self.assertIs(duplicates.repeat_of(duplicates.key('hash', 'Other', 'STRICT')), recent)
+        self.assertEqual((duplicates.skipped, duplicates.reused, duplicates.recorded), (0, 1, 0))
+
+    def test_only_the_most_recent_checks_are_remembered(self):
+        duplicates = DuplicateFilter(RECORD, SESSION, size=2)
+        for image_hash in ('first', 'second'):
+            duplicates.remember(duplicates.key(image_hash, None, 'STRICT'), image_hash)
+        # A repeat becomes the most recent check again, so the second is forgotten first.
+        self.assertIsNotNone(duplicates.repeat_of(duplicates.key('first', None, 'STRICT')))
+        duplicates.remember(duplicates.key('third', None, 'STRICT'), 'third')
+        self.assertIsNone(duplicates.repeat_of(duplicates.key('second', None, 'STRICT')))
+        self.assertIsNotNone(duplicates.repeat_of(duplicates.key('first', None, 'STRICT')))
+        self.assertEqual(duplicates.recorded, 2)
+
+    def test_a_forgotten_check_is_not_repeated(self):
+        duplicates = DuplicateFilter(SKIP)
+        key = duplicates.key('hash', 'Home', 'STRICT')
+        duplicates.forget(duplicates.remember(key, 'Home'))
+        self.assertIsNone(duplicates.repeat_of(key))
+
+    def test_an_unknown_policy_or_scope_is_refused(self):
+        self.assertRaises(EyesError, DuplicateFilter, 'drop')
+        self.assertRaises(EyesError, DuplicateFilter, SKIP, 'suite')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+from support import ScreenshotDriver, library, start_server
+from applitools import logger
+from RobotAppEyes import eyeslog
+from RobotAppEyes.eyeslog import EyesLog, ROBOT
+
+
+class EyesLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.log = EyesLog(ROBOT)
+        eyeslog.install(self.log)
+
+    def tearDown(self):
+        logger._logger_to_use.shutdown()
+
+    def messages(self):
+        return [line.split('] ', 4)[-1] for line in self.log.drain()]
+
+    def test_the_log_outlives_the_close_of_an_eyes_session(self):
+        logger.info('before')
+        # What Eyes.close and Eyes.abort_if_not_closed do.
+        logger.close()
+        logger.info('after')
+        self.assertEqual(self.messages(), ['before', 'after'])
+
+    def test_records_of_a_check_carry_its_correlation_id(self):
+        with eyeslog.check('Check Eyes Window', 'Home') as check_id:
+            logger.debug('inside')
+            eyeslog.bind(lambda: logger.debug('bound'))()
+        logger.debug('outside')
+        records = self.log.drain()
+        self.assertEqual([check_id in record for record in records], [True, True, True, False])
+        self.assertIn("Check Eyes Window 'Home'", records[0])
+
+    def test_records_below_the_level_are_dropped(self):
+        log = EyesLog(ROBOT, level='INFO')
+        eyeslog.install(log)
+        logger.debug('debug')
+        logger.info('info')
+        self.assertEqual(len(log.drain()), 1)
+
+    def test_the_oldest_records_are_dropped_when_the_buffer_is_full(self):
+        log = EyesLog(ROBOT, capacity=2)
+        eyeslog.install(log)
+        for number in range(5):
+            logger.info('record %d' % number)
+        self.assertEqual(log.take_dropped(), 3)
+        self.assertEqual([line.split('] ', 4)[-1] for line in log.drain()], ['record 3', 'record 4'])
+
+    def test_the_sdk_gets_its_logger_back_when_the_log_is_shut_down(self):
+        sdk_close = eyeslog._sdk_close
+        log = EyesLog(ROBOT)
+        eyeslog.install(log)
+        self.log.shutdown()
+        self.assertIs(logger._logger_to_use, log)
+        log.shutdown()
+        self.assertIs(logger.close, sdk_close)
+        self.assertIsNone(logger._logger_to_use)
+        eyeslog.install(self.log)
+
+
+class RobotLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = start_server()
+        self.library, self.builtin = library(ScreenshotDriver())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def eyes_log_messages(self):
+        messages = [message for level, message in self.builtin.messages if message.startswith('Eyes log\n')]
+        del self.builtin.messages[:]
+        return messages
+
+    def test_records_are_logged_after_each_keyword(self):
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url, includeEyesLog=True)
+        self.eyes_log_messages()
+        self.library.check_eyes_window('Home')
+        messages = self.eyes_log_messages()
+        self.assertEqual(len(messages), 1)
+        self.assertIn("Check Eyes Window 'Home'", messages[0])
+        self.library.close_eyes_session()
+        self.assertEqual(len(self.eyes_log_messages()), 1)
+
+    def test_the_log_is_shut_down_once_every_session_is_closed(self):
+        sdk_close = logger.close
+        self.library.open_eyes_session('app', 'first', 'key', serverUrl=self.server.url, includeEyesLog=True)
+        eyes_log = self.library._eyes_log
+        self.library.open_eyes_session('app', 'second', 'key', serverUrl=self.server.url)
+        self.library.close_eyes_session()
+        self.assertIs(logger._logger_to_use, eyes_log)
+        self.library.switch_eyes_session(1)
+        self.library.close_eyes_session()
+        self.assertIsNone(self.library._eyes_log)
+        self.assertIs(logger._logger_to_use, None)
+        self.assertIs(logger.close, sdk_close)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import base64
+import re
+import random
+import shutil
+import tempfile
+import unittest
+import png as pypng
+from support import ScreenshotDriver, library, start_server
+from applitools.geometry import Point, Region
+from RobotAppEyes import fullpage
+from RobotAppEyes.fullpage import CanvasImage, page_segments, stitched_segments
+
+
+class ScrollingPage(object):
+    """
+    Answers the calls the stitching makes on an EyesWebDriver, for a page of random pixels seen
+    through a smaller viewport.
+    """
+
+    def __init__(self, page_width, page_height, width, height):
+        noise = random.Random(page_width * page_height)
+        self.rows = [[noise.randint(0, 255) for _ in range(page_width * 3)] for _ in range(page_height)]
+        self.page_size = {'width': page_width, 'height': page_height}
+        self.width, self.height = width, height
+        self.x = self.y = 0
+        self.switch_to = self
+
+    def default_content(self):
+        pass
+
+    def frames(self, frame_chain):
+        pass
+
+    def get_frame_chain(self):
+        return []
+
+    def get_entire_page_size(self):
+        return self.page_size
+
+    def get_current_scroll_position(self):
+        return Point(self.x, self.y)
+
+    def scroll_to(self, point):
+        self.x = max(0, min(point.x, self.page_size['width'] - self.width))
+        self.y = max(0, min(point.y, self.page_size['height'] - self.height))
+
+    def get_screenshot_as_base64(self):
+        output = []
+
+        class Output(object):
+            write = output.append
+        rows = [row[self.x * 3:(self.x + self.width) * 3] for row in self.rows[self.y:self.y + self.height]]
+        pypng.Writer(self.width, self.height, greyscale=False).write(Output(), rows)
+        return base64.b64encode(''.join(output))
+
+
+class ScrollingBrowser(ScreenshotDriver):
+    """
+    A fake browser showing a ScrollingPage, scrolled by the scripts of Eyes.
+    """
+
+    def __init__(self, page_width, page_height, width, height):
+        ScreenshotDriver.__init__(self, width, height)
+        self.page = ScrollingPage(page_width, page_height, width, height)
+
+    def execute_script(self, script, *args):
+        scroll = re.match(r'window.scrollTo\((-?\d+), (-?\d+)\)', script)
+        if scroll:
+            self.page.scroll_to(Point(int(scroll.group(1)), int(scroll.group(2))))
+            return None
+        if script == 'return window.scrollX':
+            return self.page.x
+        if script == 'return window.scrollY':
+            return self.page.y
+        if 'scrollWidth' in script:
+            return self.page.page_size['width']
+        if 'scrollHeight' in script:
+            return self.page.page_size['height']
+        return ScreenshotDriver.execute_script(self, script, *args)
+
+    def get_screenshot_as_base64(self):
+        return self.page.get_screenshot_as_base64()
+
+
+def rows_of(image):
+    return [list(bytearray(row)) for row in image.pixel_bytes]
+
+
+class FullPageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scroll_wait, fullpage._SCROLL_WAIT = fullpage._SCROLL_WAIT, 0
+
+    def tearDown(self):
+        fullpage._SCROLL_WAIT = self.scroll_wait
+
+    def test_the_page_is_stitched_from_its_parts(self):
+        page = ScrollingPage(130, 300, 100, 80)
+        image = fullpage.full_page_screenshot(page)
+        self.assertEqual((image.width, image.height), (130, 300))
+        self.assertEqual(rows_of(image), page.rows)
+        self.assertEqual((page.x, page.y), (0, 0))
+
+    def test_the_page_is_stitched_in_segments(self):
+        page = ScrollingPage(100, 250, 100, 80)
+        segments = list(stitched_segments(page, 100))
+        self.assertEqual([(number, count, image.height) for number, count, image in segments],
+                         [(1, 3, 100), (2, 3, 100), (3, 3, 50)])
+        self.assertEqual(sum([rows_of(image) for _, _, image in segments], []), page.rows)
+
+    def test_a_page_that_fits_in_the_viewport_is_one_screenshot(self):
+        page = ScrollingPage(100, 80, 100, 80)
+        self.assertEqual(rows_of(fullpage.full_page_screenshot(page)), page.rows)
+
+    def test_a_canvas_is_encoded_and_cut_as_a_png_image(self):
+        meta_info = {'greyscale': False, 'alpha': False, 'bitdepth': 8, 'planes': 3}
+        canvas = CanvasImage(4, 3, 3, meta_info)
+        self.assertEqual(canvas.paste_rows(2, 1, ['\x01' * 12, '\x02' * 12, '\x03' * 12]), 3)
+        width, height, rows, info = pypng.Reader(bytes=canvas.get_bytes()).asDirect()
+        self.assertEqual([list(row) for row in rows], [[0] * 12, [0] * 6 + [1] * 6, [0] * 6 + [2] * 6])
+        self.assertEqual(rows_of(canvas.get_subimage(Region(2, 1, 1, 2))), [[1] * 3, [2] * 3])
+        canvas.truncate(2)
+        self.assertEqual((canvas.height, len(canvas.pixel_bytes)), (2, 2))
+
+    def test_page_segments(self):
+        self.assertEqual(page_segments(250), [(0, 250)])
+        self.assertEqual(page_segments(250, 100), [(0, 100), (100, 100), (200, 50)])
+        self.assertEqual(page_segments(250, 300), [(0, 250)])
+
+
+class SegmentHeightTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scroll_wait, fullpage._SCROLL_WAIT = fullpage._SCROLL_WAIT, 0
+        self.server = start_server(baselines=True)
+        self.library, self.builtin = library(ScrollingBrowser(100, 250, 100, 80))
+        self.cache = tempfile.mkdtemp()
+
+    def tearDown(self):
+        fullpage._SCROLL_WAIT = self.scroll_wait
+        self.server.stop()
+        shutil.rmtree(self.cache)
+
+    def check(self, **options):
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url, **options)
+        session = self.library._sessions.current
+        self.library.check_eyes_window('Page', True, segmentHeight=100)
+        held = len(session.held_steps)
+        self.library.close_eyes_session()
+        return held
+
+    def test_segments_answered_by_the_cache_are_not_held_back(self):
+        self.check()
+        self.check(screenshotCache=self.cache)
+        self.assertEqual(self.check(screenshotCache=self.cache), 0)
+        results = self.server.stopped[-1].results()
+        self.assertEqual((results['steps'], results['matches'], results['missing']), (3, 3, 0))
+        self.assertEqual(self.server.stopped[-1].tags, ['Page (1/3)', 'Page (2/3)', 'Page (3/3)'])
+
+
+if __name__ == '__main__':
+    unittest.main()
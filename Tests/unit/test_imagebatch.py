@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+from support import ScreenshotDriver, library, png, start_server
+from applitools.errors import EyesError, TestFailedError
+
+
+class CompareImagesInDirectoryTest(unittest.TestCase):
+    """
+    The images of a directory are checked as Compare Image checks them, screenshot cache included.
+    """
+
+    def setUp(self):
+        self.server = start_server(baselines=True)
+        self.library, self.builtin = library(ScreenshotDriver())
+        self.images = tempfile.mkdtemp()
+        self.cache = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.images)
+        shutil.rmtree(self.cache)
+
+    def write_images(self, seeds):
+        for number, seed in enumerate(seeds):
+            with open(os.path.join(self.images, 'image-%d.png' % number), 'wb') as image_file:
+                image_file.write(png(seed=seed))
+
+    def compare(self, **options):
+        """
+        Compares the images in a session and returns the mismatches. The session is closed, failing or not.
+        """
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url, **options)
+        self.library._sessions.current.eyes.match_timeout = 100
+        try:
+            mismatches = self.library.compare_images_in_directory(self.images)
+        except EyesError:
+            self.library.close_eyes_session()
+            raise
+        try:
+            self.library.close_eyes_session()
+        except TestFailedError:
+            pass
+        return mismatches
+
+    def report(self):
+        return '\n'.join(message for level, message in self.builtin.messages)
+
+    def test_mismatches_are_returned(self):
+        self.write_images([1, 2, 3])
+        self.compare()
+        self.write_images([1, 4, 3])
+        self.assertEqual(self.compare(), ['image-1.png'])
+        results = self.server.stopped[-1].results()
+        self.assertEqual((results['steps'], results['mismatches']), (3, 1))
+
+    def test_cache_hits_are_held_back_and_keep_the_steps_aligned(self):
+        self.write_images([1, 2, 3])
+        self.compare()
+        self.compare(screenshotCache=self.cache)
+        self.write_images([1, 2, 4])
+        requests = self.server.requests
+        self.assertEqual(self.compare(screenshotCache=self.cache), ['image-2.png'])
+        self.assertIn('| image-0.png | Matched |', self.report())
+        results = self.server.stopped[-1].results()
+        self.assertEqual((results['steps'], results['matches'], results['missing']), (3, 2, 0))
+        # The held back images are sent with the last one, retagged.
+        self.assertEqual(self.server.requests - requests, 5)
+
+    def test_a_held_back_image_gets_the_result_of_its_step(self):
+        self.write_images([1, 2, 3])
+        self.compare()
+        self.compare(screenshotCache=self.cache)
+        self.server.baselines[('app', 'test')][0] = 'changed'
+        self.write_images([1, 2, 4])
+        self.assertEqual(self.compare(screenshotCache=self.cache), ['image-0.png', 'image-2.png'])
+
+    def test_the_images_held_back_at_the_end_are_listed(self):
+        self.write_images([1, 2])
+        self.compare()
+        self.compare(screenshotCache=self.cache)
+        self.assertEqual(self.compare(screenshotCache=self.cache), [])
+        self.assertIn('| image-0.png | Held back |', self.report())
+        self.assertIn('| image-1.png | Held back |', self.report())
+
+    def test_a_file_that_is_not_a_png_image_fails(self):
+        self.write_images([1])
+        with open(os.path.join(self.images, 'image-9.png'), 'wb') as image_file:
+            image_file.write('not a PNG')
+        self.assertRaisesRegexp(EyesError, '1 of 2 images could not be compared', self.compare)
+        self.assertEqual(self.server.stopped[-1].results()['steps'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
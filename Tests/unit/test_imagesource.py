@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import os
+import json
+import struct
+import shutil
+import tempfile
+import unittest
+from support import png
+from applitools.errors import EyesError
+from RobotAppEyes.imagesource import PngFile, create_match_data, retag_match_data
+
+APP_OUTPUT = {'title': 'Home', 'screenshot64': None}
+
+
+def split(data):
+    size = struct.unpack('>L', bytes(data[:4]))[0]
+    return json.loads(bytes(data[4:4 + size])), bytes(data[4 + size:])
+
+
+class Screenshot(object):
+
+    def __init__(self, png_bytes):
+        self.png_bytes = png_bytes
+
+    def get_bytes(self):
+        return self.png_bytes
+
+
+class ImageSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, content):
+        path = os.path.join(self.directory, 'image.png')
+        with open(path, 'wb') as image_file:
+            image_file.write(content)
+        return path
+
+    def test_a_png_file_is_read_from_its_header(self):
+        png_bytes = png(width=30, height=20)
+        image = PngFile(self.write(png_bytes))
+        try:
+            self.assertEqual((image.width, image.height, image.size), (30, 20, len(png_bytes)))
+            self.assertEqual(image.get_bytes(), png_bytes)
+            self.assertEqual(image.get_image().width, 30)
+        finally:
+            image.close()
+
+    def test_a_file_that_is_not_a_png_image_is_refused(self):
+        self.assertRaises(EyesError, PngFile, self.write('not a PNG'))
+        self.assertRaises(EyesError, PngFile, self.write(''))
+
+    def test_a_png_file_is_copied_into_the_match_request(self):
+        png_bytes = png(seed=1)
+        image = PngFile(self.write(png_bytes))
+        try:
+            data = create_match_data(APP_OUTPUT, [], 'Home', True, image)
+        finally:
+            image.close()
+        self.assertEqual(data, create_match_data(APP_OUTPUT, [], 'Home', True, Screenshot(png_bytes)))
+        match_data, screenshot = split(data)
+        self.assertEqual((match_data['tag'], match_data['ignoreMismatch'], screenshot), ('Home', True, png_bytes))
+
+    def test_a_request_is_retagged_with_the_same_screenshot(self):
+        png_bytes = png(seed=2)
+        data = create_match_data(APP_OUTPUT, [], 'Home', True, Screenshot(png_bytes))
+        match_data, screenshot = split(retag_match_data(data, {'title': 'Other', 'screenshot64': None}, [], 'Other',
+                                                        False))
+        self.assertEqual((match_data['tag'], match_data['ignoreMismatch'], match_data['appOutput']['title']),
+                         ('Other', False, 'Other'))
+        self.assertEqual(screenshot, png_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
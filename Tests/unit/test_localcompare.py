@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import shutil
+import tempfile
+import unittest
+from support import png
+from RobotAppEyes.imagesource import create_match_data
+from RobotAppEyes.localcompare import LocalAgentConnector
+
+
+class Screenshot(object):
+
+    def __init__(self, seed):
+        self.seed = seed
+
+    def get_bytes(self):
+        return png(seed=self.seed)
+
+
+class LocalAgentConnectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.baselines = tempfile.mkdtemp()
+        self.connector = LocalAgentConnector(self.baselines)
+
+    def tearDown(self):
+        shutil.rmtree(self.baselines)
+
+    def run_session(self, matches):
+        """
+        Matches (tag, seed, ignore_mismatch) in a session and returns what each match returned and the results.
+        """
+        start_info = {'appIdOrName': 'app', 'scenarioIdOrName': 'test', 'envName': 'env'}
+        running_session = self.connector.start_session(start_info)
+        returned = [self.connector.match_window(running_session, create_match_data(
+            {'title': '', 'screenshot64': None}, [], tag, ignore_mismatch, Screenshot(seed)))
+            for tag, seed, ignore_mismatch in matches]
+        return returned, self.connector.stop_session(running_session, False, True)
+
+    def counts(self, results):
+        return results.steps, results.matches, results.mismatches, results.missing
+
+    def test_a_retried_attempt_is_replaced_by_the_next_one(self):
+        self.run_session([('a', 1, False), ('b', 2, False)])
+        returned, results = self.run_session([('a', 3, True), ('a', 1, False), ('b', 2, False)])
+        self.assertEqual(returned, [False, True, True])
+        self.assertEqual(self.counts(results), (2, 2, 0, 0))
+
+    def test_an_attempt_that_is_not_retried_is_the_step(self):
+        self.run_session([('a', 1, False), ('b', 2, False)])
+        returned, results = self.run_session([('a', 3, True), ('b', 2, False)])
+        self.assertEqual(returned, [False, True])
+        self.assertEqual(self.counts(results), (2, 1, 1, 0))
+        self.assertEqual([result.tag for result in self.connector.results[-2:]], ['a', 'b'])
+
+    def test_the_last_attempt_is_the_step_when_the_session_stops(self):
+        self.run_session([('a', 1, False)])
+        returned, results = self.run_session([('a', 3, True)])
+        self.assertEqual(self.counts(results), (1, 0, 1, 0))
+        self.assertIsNotNone(self.connector.results[-1].diff_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import unittest
+import support  # noqa: puts the library on the path
+from applitools.errors import EyesError
+from selenium.common.exceptions import InvalidElementStateException
+from RobotAppEyes.locators import ElementRect, LocatorCache, parse_locator, selector_name
+
+
+class Browser(object):
+    """
+    Runs the cached regions script as a browser would: every locator is found at a rectangle as wide as its value is long,
+    and the document has a version that the tests change.
+    """
+
+    def __init__(self):
+        self.version = 1
+        self.resolved = []
+
+    def execute_script(self, script, version, missing, unique):
+        locators = unique if version != self.version else missing
+        self.resolved.append([tuple(locator) for locator in locators])
+        return self.version, [[len(value), 0, 10, 10] for selector, value in locators]
+
+
+class ParseLocatorTest(unittest.TestCase):
+
+    def test_prefixed_locators(self):
+        self.assertEqual(parse_locator('css=.navbar'), ('CSS SELECTOR', '.navbar'))
+        self.assertEqual(parse_locator('XPATH://div'), ('XPATH', '//div'))
+        self.assertEqual(parse_locator('id:main'), ('ID', 'main'))
+
+    def test_xpaths_need_no_prefix(self):
+        self.assertEqual(parse_locator('//div'), ('XPATH', '//div'))
+        self.assertEqual(parse_locator('(//a)[1]'), ('XPATH', '(//a)[1]'))
+
+    def test_invalid_locators(self):
+        self.assertRaises(EyesError, parse_locator, 'navbar')
+        self.assertRaises(EyesError, parse_locator, 'color=red')
+
+    def test_selector_name(self):
+        self.assertEqual(selector_name('css'), 'CSS SELECTOR')
+        self.assertEqual(selector_name(' class name '), 'CLASS NAME')
+        self.assertRaises(InvalidElementStateException, selector_name, 'color')
+
+
+class LocatorCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.browser = Browser()
+        self.cache = LocatorCache()
+
+    def test_only_new_locators_are_resolved_while_the_document_is_unchanged(self):
+        nav, main = ('CSS SELECTOR', '.nav'), ('ID', 'main')
+        self.assertEqual(self.cache.rects(self.browser, [nav, nav]), [[4, 0, 10, 10], [4, 0, 10, 10]])
+        self.assertEqual(self.cache.rects(self.browser, [nav, main]), [[4, 0, 10, 10], [4, 0, 10, 10]])
+        self.assertEqual(self.browser.resolved, [[nav], [main]])
+        self.assertEqual((self.cache.hits, self.cache.misses, self.cache.scripts), (2, 2, 2))
+        self.assertEqual(self.cache.hit_rate, 50.0)
+
+    def test_cached_locators_still_read_the_version(self):
+        nav = ('CSS SELECTOR', '.nav')
+        self.cache.rects(self.browser, [nav])
+        self.cache.rects(self.browser, [nav])
+        self.assertEqual(self.browser.resolved, [[nav], []])
+        self.assertEqual((self.cache.hits, self.cache.scripts), (1, 2))
+
+    def test_every_locator_is_resolved_once_the_document_changed(self):
+        nav, main = ('CSS SELECTOR', '.nav'), ('ID', 'main')
+        self.cache.rects(self.browser, [nav, main])
+        self.browser.version = 2
+        self.cache.rects(self.browser, [nav])
+        self.assertEqual(self.browser.resolved, [[nav, main], [nav]])
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_mark_dirty_forgets_the_rectangles(self):
+        nav = ('CSS SELECTOR', '.nav')
+        self.cache.rects(self.browser, [nav])
+        self.cache.mark_dirty()
+        self.cache.rects(self.browser, [nav])
+        self.assertEqual(self.browser.resolved, [[nav], [nav]])
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_element_rect(self):
+        rect = ElementRect(1, 2, 3, 4)
+        self.assertEqual((rect.location, rect.size), ({'x': 1, 'y': 2}, {'width': 3, 'height': 4}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import random
+import unittest
+import png as pypng
+from support import png
+from RobotAppEyes import payload
+from applitools.utils import _image_utils
+from RobotAppEyes.payload import PayloadReducer, content_box, palette_rows
+
+
+class Screenshot(object):
+
+    def __init__(self, png_bytes):
+        self.png_bytes = png_bytes
+
+    def get_bytes(self):
+        return self.png_bytes
+
+
+class DecodedScreenshot(object):
+    """
+    A screenshot Eyes holds as decoded pixels, as an EyesScreenshot does.
+    """
+
+    def __init__(self, png_bytes):
+        self._screenshot = _image_utils.png_image_from_bytes(png_bytes)
+
+    def get_bytes(self):
+        raise AssertionError('The screenshot was encoded')
+
+
+def encode(width, height, rows, alpha=True):
+    output = []
+
+    class Output(object):
+        write = output.append
+    pypng.Writer(width, height, greyscale=False, alpha=alpha).write(Output(), rows)
+    return ''.join(output)
+
+
+def pixels(png_bytes):
+    width, height, rows, info = pypng.Reader(bytes=png_bytes).asRGBA8()
+    return width, height, [list(row) for row in rows]
+
+
+class PayloadReducerTest(unittest.TestCase):
+
+    def reduce(self, png_bytes, **options):
+        reducer = PayloadReducer(compression=9, **options)
+        try:
+            sent = reducer.reduce('Home', Screenshot(png_bytes)).get_bytes()
+            return sent, reducer.drain()[0]
+        finally:
+            reducer.close()
+
+    def test_the_pixels_are_unchanged(self):
+        original = png(width=80, height=60, seed=3)
+        sent, record = self.reduce(original)
+        self.assertEqual(pixels(sent), pixels(original))
+        self.assertLessEqual(record.sent_size, record.original_size)
+
+    def test_an_image_of_few_colours_becomes_a_smaller_palette_image(self):
+        rows = [[255, 0, 0, 255] * 20 if y % 2 else [0, 0, 255, 255] * 20 for y in range(30)]
+        original = encode(20, 30, rows)
+        sent, record = self.reduce(original)
+        self.assertEqual(pixels(sent), pixels(original))
+        self.assertIn('palette of 2 colours', record.changes)
+        self.assertIn('opaque alpha dropped', record.changes)
+
+    def test_large_images_are_compressed_in_pieces_into_one_stream(self):
+        original = png(width=400, height=300, seed=4)
+        chunk_size, payload.DEFLATE_CHUNK_SIZE = payload.DEFLATE_CHUNK_SIZE, 16 * 1024
+        try:
+            sent, record = self.reduce(original, palette=False, workers=4)
+        finally:
+            payload.DEFLATE_CHUNK_SIZE = chunk_size
+        self.assertEqual(pixels(sent), pixels(original))
+
+    def test_the_content_is_cropped_when_asked_for(self):
+        noise = random.Random(5)
+        rows = [[255] * 4 * 100 for _ in range(100)]
+        for y in range(40, 50):
+            rows[y][30 * 4:50 * 4] = [noise.randint(0, 254) for _ in range(20 * 4)]
+        sent, record = self.reduce(encode(100, 100, rows), crop=True)
+        width, height, sent_rows = pixels(sent)
+        self.assertEqual((width, height), (20, 10))
+        self.assertEqual(sent_rows[0], rows[40][30 * 4:50 * 4])
+        self.assertIn('cropped to 20x10 at 30,40', record.changes)
+
+    def test_content_box_and_palette_rows(self):
+        background, ink = '\x00\x00\x00', '\xff\xff\xff'
+        rows = [background * 4, background + ink + background * 2, background * 4]
+        self.assertEqual(content_box(rows, 4, 3), (1, 1, 2, 2))
+        colours, indexes = palette_rows(rows, 3)
+        self.assertEqual(colours, [background, ink])
+        self.assertEqual(indexes[1], '\x00\x01\x00\x00')
+        self.assertIsNone(palette_rows(rows, 3, max_colours=1))
+
+    def test_numpy_filters_and_palettes_the_rows_as_python_does(self):
+        noise = random.Random(8)
+        for pixel_size in (3, 4):
+            colours = [''.join(chr(noise.randint(0, 255)) for _ in range(pixel_size)) for _ in range(20)]
+            rows = [''.join(noise.choice(colours) for _ in range(30)) for _ in range(25)]
+            rows[5:9] = [rows[4]] * 4
+            self.assertEqual(payload._python_filter_rows(rows, pixel_size),
+                             payload._numpy_filter_rows(rows, pixel_size))
+            self.assertEqual(payload._python_palette_rows(rows, pixel_size, 256),
+                             payload._numpy_palette_rows(rows, pixel_size, 256))
+            self.assertIsNone(payload._numpy_palette_rows(rows, pixel_size, 10))
+
+    def test_a_decoded_screenshot_is_not_encoded_to_be_measured(self):
+        original = png(width=80, height=60, seed=6)
+        reducer = PayloadReducer()
+        sent = reducer.reduce('Home', DecodedScreenshot(original)).get_bytes()
+        record = reducer.drain()[0]
+        self.assertEqual(pixels(sent), pixels(original))
+        self.assertEqual((record.original_size, record.sent_size, record.saved), (None, len(sent), None))
+        self.assertEqual((reducer.checks, reducer.measured, reducer.sent_bytes), (1, 0, len(sent)))
+
+
+class WithoutNumPyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.numpy, payload.numpy = payload._import_numpy(), False
+
+    def tearDown(self):
+        payload.numpy = self.numpy
+
+    def test_large_images_are_sent_as_they_were(self):
+        original = png(width=80, height=60, seed=7)
+        max_pixels, payload.PURE_PYTHON_MAX_PIXELS = payload.PURE_PYTHON_MAX_PIXELS, 1000
+        try:
+            reducer = PayloadReducer()
+            self.assertEqual(reducer.reduce('Home', Screenshot(original)).get_bytes(), original)
+        finally:
+            payload.PURE_PYTHON_MAX_PIXELS = max_pixels
+        self.assertIn('NumPy is needed', reducer.drain()[0].changes[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from support import png
+from RobotAppEyes.imagesource import PngFile
+from RobotAppEyes.screenshotcache import ScreenshotCache, image_digest
+
+VIEWPORT = {'width': 1024, 'height': 768}
+
+
+class ScreenshotCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ScreenshotCache(self.directory, max_entries=3, max_age_days=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def key(self, tag, image_hash='hash', viewport=VIEWPORT):
+        return ScreenshotCache.key(image_hash, 'app', 'test', tag, viewport, 'STRICT')
+
+    def test_a_passing_check_is_known_until_it_expires(self):
+        key = self.key('Home')
+        self.assertFalse(self.cache.is_known_passing(key))
+        self.cache.record_pass(key, app='app', test='test', tag='Home')
+        self.assertTrue(self.cache.is_known_passing(key))
+        path = os.path.join(self.directory, key + '.json')
+        old = time.time() - 2 * 24 * 60 * 60
+        os.utime(path, (old, old))
+        self.assertFalse(self.cache.is_known_passing(key))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_the_key_changes_with_every_field(self):
+        keys = set([self.key('Home'), self.key('Other'), self.key('Home', 'other hash'),
+                    self.key('Home', viewport={'width': 800, 'height': 600}), self.key('Home', viewport=None)])
+        self.assertEqual(len(keys), 5)
+
+    def test_the_least_recently_used_entries_are_evicted(self):
+        for number in range(5):
+            key = self.key('Step %d' % number)
+            self.cache.record_pass(key)
+            then = time.time() - 100 + number
+            os.utime(os.path.join(self.directory, key + '.json'), (then, then))
+        # A lookup makes the oldest entry the most recently used.
+        self.assertTrue(self.cache.is_known_passing(self.key('Step 0')))
+        self.assertEqual(self.cache.evict(), 2)
+        self.assertEqual([self.cache.is_known_passing(self.key('Step %d' % number)) for number in range(5)],
+                         [True, False, False, True, True])
+
+    def test_entries_are_invalidated_by_their_metadata(self):
+        self.cache.record_pass(self.key('Home'), app='app', tag='Home')
+        self.cache.record_pass(self.key('Other'), app='app', tag='Other')
+        self.assertEqual(self.cache.invalidate(tag='Home'), 1)
+        self.assertEqual(self.cache.invalidate(), 1)
+
+    def test_a_png_file_is_hashed_by_its_content(self):
+        path = os.path.join(self.directory, 'image.png')
+        with open(path, 'wb') as image_file:
+            image_file.write(png(seed=1))
+        image = PngFile(path)
+        try:
+            digest = image_digest(image)
+            self.assertEqual(digest, image_digest(PngFile(path)))
+            self.assertNotEqual(digest, image_digest(image.get_image()))
+        finally:
+            image.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
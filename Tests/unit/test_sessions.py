@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+import unittest
+import support  # noqa: puts the library on the path
+from RobotAppEyes.sessions import SessionRegistry
+from applitools.errors import EyesError
+
+
+class Session(object):
+    pass
+
+
+class SessionRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = SessionRegistry()
+
+    def in_thread(self, function):
+        """
+        Runs a function on another thread and returns what it returned or raised.
+        """
+        outcome = []
+
+        def run():
+            try:
+                outcome.append(function())
+            except EyesError as error:
+                outcome.append(error)
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        return outcome[0]
+
+    def test_a_thread_that_selected_no_session_uses_the_last_one_opened(self):
+        session = Session()
+        self.registry.register(session)
+        self.assertIs(self.in_thread(lambda: self.registry.current), session)
+
+    def test_each_thread_has_its_own_current_session(self):
+        first, second = Session(), Session()
+        self.registry.register(first)
+        self.assertIs(self.in_thread(lambda: self.registry.register(second) and self.registry.current), second)
+        self.assertIs(self.registry.current, first)
+
+    def test_a_thread_whose_session_was_closed_does_not_use_another_threads_session(self):
+        first, second = Session(), Session()
+        self.registry.register(first)
+
+        def open_and_close():
+            self.registry.register(second)
+            self.registry.remove(second)
+            return self.registry.current
+        self.assertIsInstance(self.in_thread(open_and_close), EyesError)
+        self.assertIs(self.registry.current, first)
+
+    def test_a_session_closed_by_another_thread_is_not_current(self):
+        first, second = Session(), Session()
+        self.registry.register(first)
+        self.in_thread(lambda: self.registry.register(second))
+        self.registry.remove(first)
+        self.assertRaises(EyesError, lambda: self.registry.current)
+        self.registry.switch(2)
+        self.assertIs(self.registry.current, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from support import ScreenshotDriver, library, start_server
+from RobotAppEyes import spool
+
+
+class SpoolTest(unittest.TestCase):
+    """
+    A session recorded to a spool directory and uploaded later gets the results it would have got from Eyes.
+    """
+
+    def setUp(self):
+        self.server = start_server(baselines=True)
+        self.driver = ScreenshotDriver()
+        self.library, self.builtin = library(self.driver)
+        self.spool = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.spool)
+
+    def run_session(self, seeds, **options):
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url, **options)
+        self.library._sessions.current.eyes.match_timeout = 100
+        for number, seed in enumerate(seeds):
+            self.driver.show(seed)
+            self.library.check_eyes_window('Step %d' % number)
+        self.library.close_eyes_session()
+
+    def test_a_recorded_session_is_uploaded_with_all_its_steps(self):
+        self.run_session([1, 2])
+        self.run_session([1, 3], recordDirectory=self.spool)
+        requests = self.server.requests
+        results = spool.upload(self.spool, 'key', self.server.url)
+        self.assertEqual(len(results), 1)
+        result = results[0]
+        self.assertEqual((result['status'], result['steps'], result['mismatched']), ('unresolved', 2, ['Step 1']))
+        self.assertEqual(self.server.stopped[-1].results()['missing'], 0)
+        # The session start, a match per step and the session stop.
+        self.assertEqual(self.server.requests - requests, 4)
+        with open(os.path.join(self.spool, os.listdir(self.spool)[0], spool.RESULT_FILE)) as result_file:
+            self.assertEqual(json.load(result_file)['status'], 'unresolved')
+
+    def test_uploaded_sessions_are_not_uploaded_again(self):
+        self.run_session([1], recordDirectory=self.spool)
+        self.assertEqual([result['status'] for result in spool.upload(self.spool, 'key', self.server.url)], ['new'])
+        self.assertEqual(spool.upload(self.spool, 'key', self.server.url), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
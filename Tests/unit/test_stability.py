@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import base64
+import unittest
+import png as pypng
+from support import ScreenshotDriver, png
+from applitools.errors import EyesError
+from RobotAppEyes import stability
+from RobotAppEyes.stability import changed_area, frame_signature, region_signature, wait_for_stable_frames
+
+
+def encode(width, height, rows):
+    output = []
+
+    class Output(object):
+        write = output.append
+    pypng.Writer(width, height, greyscale=False).write(Output(), rows)
+    return ''.join(output)
+
+
+def white(width, height, dot=None):
+    """
+    Returns a white PNG, with a black pixel at `dot` when given.
+    """
+    rows = [[255] * (width * 3) for _ in range(height)]
+    if dot is not None:
+        x, y = dot
+        rows[y][x * 3:x * 3 + 3] = [0, 0, 0]
+    return encode(width, height, rows)
+
+
+class Signatures(object):
+    """
+    Takes the signatures it is given one after the other, repeating the last one.
+    """
+
+    def __init__(self, *signatures):
+        self.signatures = list(signatures)
+
+    def __call__(self):
+        if len(self.signatures) > 1:
+            return self.signatures.pop(0)
+        return self.signatures[0]
+
+
+class RegionSignatureTest(unittest.TestCase):
+
+    def test_the_changed_area_covers_the_changed_tiles(self):
+        before = region_signature(white(40, 30), 0, 0, 40, 30, tile_size=16)
+        after = region_signature(white(40, 30, dot=(20, 5)), 0, 0, 40, 30, tile_size=16)
+        self.assertEqual(changed_area(before, after, tile_size=16), '16,0 16x16')
+        self.assertEqual(changed_area(before, before, tile_size=16), None)
+
+    def test_a_region_is_clipped_to_the_screenshot(self):
+        signature = region_signature(white(40, 30), 30, 20, 50, 50, tile_size=16)
+        self.assertEqual(signature[:4], (30, 20, 10, 10))
+        self.assertEqual(region_signature(white(40, 30), 50, 0, 10, 10)[:4], (50, 0, 0, 0))
+
+    def test_regions_of_other_rectangles_are_not_compared(self):
+        image = white(40, 30)
+        self.assertEqual(changed_area(region_signature(image, 0, 0, 20, 20), region_signature(image, 0, 0, 30, 20)),
+                         None)
+
+    def test_frame_signature_of_the_page(self):
+        driver = ScreenshotDriver()
+        first = frame_signature(driver)
+        self.assertEqual(frame_signature(driver), first)
+        driver.show(1)
+        self.assertNotEqual(frame_signature(driver), first)
+
+    def test_frame_signature_of_an_element(self):
+        driver = ScreenshotDriver()
+        driver.execute_script = lambda script, *locator: [8, 4, 16, 16, 0, 0, 48]
+        signature = frame_signature(driver, ('ID', 'main'))
+        image = base64.b64decode(driver.get_screenshot_as_base64())
+        self.assertEqual(signature, region_signature(image, 8, 4, 16, 16))
+        driver.execute_script = lambda script, *locator: None
+        self.assertEqual(frame_signature(driver, ('ID', 'main')), None)
+
+
+class WaitForStableFramesTest(unittest.TestCase):
+
+    def test_returns_once_enough_frames_match(self):
+        waited, taken = wait_for_stable_frames(Signatures(1, 2, 2, 3, 3, 3), 3, 5, 0)
+        self.assertEqual(taken, 6)
+
+    def test_raises_after_the_timeout_with_the_last_change(self):
+        signatures = Signatures(*range(1000000))
+        try:
+            wait_for_stable_frames(signatures, 2, 0.05, 0.001, lambda previous, current: 'tile %d' % current)
+        except EyesError as error:
+            self.assertIn('not visually stable after 0.05 seconds', str(error))
+            self.assertIn('at most 1 in a row matched, the last change was in tile', str(error))
+        else:
+            self.fail('The page was stable')
+
+    def test_a_missing_element_never_matches(self):
+        try:
+            wait_for_stable_frames(Signatures(None), 2, 0.02, 0.001)
+        except EyesError as error:
+            self.assertIn('the element was not found', str(error))
+        else:
+            self.fail('The element was stable')
+
+    def test_the_page_signature_of_a_unicode_screenshot(self):
+        screenshot64 = base64.b64encode(png())
+        self.assertEqual(stability.page_signature(screenshot64), stability.page_signature(unicode(screenshot64)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import shutil
+import tempfile
+import unittest
+from support import ScreenshotDriver, library, start_server
+
+
+class StepPairingTest(unittest.TestCase):
+    """
+    Eyes pairs the steps of a session with the steps of its baseline by their position: a check answered
+    without Eyes must not shift the steps sent after it.
+    """
+
+    def setUp(self):
+        self.server = start_server(baselines=True)
+        self.driver = ScreenshotDriver()
+        self.library, self.builtin = library(self.driver)
+        self.cache = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.cache)
+
+    def run_session(self, seeds, **options):
+        """
+        Checks the screenshot of each seed in a session and returns the results of Close Eyes Session.
+        """
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url, **options)
+        session = self.library._sessions.current
+        # Eyes waits for the match timeout before matching the steps of a new test.
+        session.eyes.match_timeout = 100
+        for number, seed in enumerate(seeds):
+            self.driver.show(seed)
+            self.library.check_eyes_window('Step %d' % number)
+        self.library.close_eyes_session()
+        return session.eyes
+
+    def last_session(self):
+        return self.server.stopped[-1]
+
+    def test_cache_hits_are_sent_before_a_later_step(self):
+        self.run_session([1, 2])
+        self.run_session([1, 2], screenshotCache=self.cache)
+        # Both steps passed and are cached: the first is held back and sent before the second, which changed.
+        with self.assertRaises(Exception) as raised:
+            self.run_session([1, 3], screenshotCache=self.cache)
+        results = raised.exception.test_results
+        self.assertEqual((results.steps, results.matches, results.mismatches, results.missing), (2, 1, 1, 0))
+
+    def test_cache_hits_at_the_end_of_a_session_are_not_sent(self):
+        self.run_session([1, 2])
+        self.run_session([1, 2], screenshotCache=self.cache)
+        requests = self.server.requests
+        self.run_session([1, 2], screenshotCache=self.cache)
+        results = self.last_session().results()
+        self.assertEqual((results['steps'], results['missing']), (0, 2))
+        # The session start and stop only.
+        self.assertEqual(self.server.requests - requests, 2)
+
+    def test_a_mismatch_is_retried_within_the_match_timeout(self):
+        self.run_session([1])
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url,
+                                       screenshotCache=self.cache)
+        eyes = self.library._sessions.current.eyes
+        eyes.match_timeout = 600
+        shown = iter([2, 2, 1])
+        original = self.driver.get_screenshot_as_base64
+
+        def changing_screenshot():
+            self.driver.show(next(shown, 1))
+            return original()
+        self.driver.get_screenshot_as_base64 = changing_screenshot
+        self.library.check_eyes_window('Step 0')
+        self.library.close_eyes_session()
+        results = self.last_session().results()
+        self.assertEqual((results['steps'], results['matches']), (1, 1))
+
+    def test_skipped_duplicates_are_sent_before_a_later_step(self):
+        self.run_session([1, 1, 2])
+        self.run_session([1, 1, 2], duplicatePolicy='skip', duplicateScope='session')
+        results = self.last_session().results()
+        self.assertEqual((results['steps'], results['matches'], results['missing']), (3, 3, 0))
+
+    def test_reused_duplicates_keep_the_queued_steps_aligned(self):
+        self.run_session([1, 1, 2])
+        self.run_session([1, 1, 2], duplicatePolicy='reuse', duplicateScope='session', asyncChecks=True)
+        results = self.last_session().results()
+        self.assertEqual((results['steps'], results['matches'], results['missing']), (3, 3, 0))
+
+    def test_skipped_duplicates_at_the_end_of_a_session_are_not_sent(self):
+        self.run_session([1, 2, 2])
+        self.run_session([1, 2, 2], duplicatePolicy='skip', duplicateScope='session')
+        results = self.last_session().results()
+        self.assertEqual((results['steps'], results['matches'], results['missing']), (2, 2, 1))
+
+    def test_the_cache_counts_of_a_deferred_close_are_logged(self):
+        self.run_session([1, 2])
+        self.run_session([1, 2], screenshotCache=self.cache)
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url, screenshotCache=self.cache)
+        self.library._sessions.current.eyes.match_timeout = 100
+        for number, seed in enumerate([1, 2]):
+            self.driver.show(seed)
+            self.library.check_eyes_window('Step %d' % number)
+        self.library.close_eyes_session(deferred=True)
+        self.library.wait_for_eyes_sessions_to_close()
+        self.assertIn(('INFO', 'Screenshot cache: 2 hits, 0 misses, 2 checks at the end of the session not sent to '
+                               'Eyes'), self.builtin.messages)
+
+
+if __name__ == '__main__':
+    unittest.main()
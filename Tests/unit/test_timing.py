@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+from support import ScreenshotDriver, library, start_server
+from RobotAppEyes.timing import CAPTURE, UPLOAD_AND_MATCH, TimingRecorder
+
+
+class TimingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = start_server()
+        self.driver = ScreenshotDriver()
+        self.library, self.builtin = library(self.driver)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_the_phases_of_a_check_are_timed(self):
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url, timing=True)
+        session = self.library._sessions.current
+        self.library.check_eyes_window('Home')
+        self.library.close_eyes_session()
+        checks, total, phases = session.timing.summary()
+        self.assertEqual(checks, 1)
+        self.assertGreater(phases[CAPTURE], 0)
+        self.assertGreater(phases[UPLOAD_AND_MATCH], 0)
+
+    def test_the_web_driver_is_not_instrumented(self):
+        get_screenshot = self.driver.get_screenshot_as_base64
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url, timing=True)
+        self.library.check_eyes_window('Home')
+        self.library.close_eyes_session()
+        self.assertNotIn('get_screenshot_as_base64', vars(self.driver))
+        self.assertEqual(self.driver.get_screenshot_as_base64, get_screenshot)
+
+
+class PrometheusExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'eyes.prom')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_labels_that_are_not_ascii_are_written_as_utf8(self):
+        TimingRecorder(u'App', u'T\xe9st').export(self.path)
+        TimingRecorder('App', 'Other \xc3\xa9').export(self.path)
+        TimingRecorder(u'App', u'T\xe9st').export(self.path)
+        with open(self.path) as textfile:
+            text = textfile.read().decode('utf-8')
+        self.assertEqual(text.count(u'robotappeyes_checks_total{app="App",test="T\xe9st"} 0'), 1)
+        self.assertEqual(text.count(u'robotappeyes_checks_total{app="App",test="Other \xe9"} 0'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
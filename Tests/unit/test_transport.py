@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import socket
+import unittest
+import requests
+from support import start_server
+from fakeeyes import DROP
+from RobotAppEyes import transport
+from RobotAppEyes.transport import HttpPool, PooledAgentConnector
+
+START_INFO = {'appIdOrName': 'app', 'scenarioIdOrName': 'test'}
+
+
+class HttpPoolTest(unittest.TestCase):
+    """
+    A match or a session start is only sent again when the server did not handle it, the request closing a
+    session whenever it failed.
+    """
+
+    def setUp(self):
+        self.server = start_server()
+        self.pool = HttpPool(max_retries=3)
+        self.connector = PooledAgentConnector(self.pool, self.server.url)
+        self.backoff_delay = transport.backoff_delay
+        transport.backoff_delay = lambda retry: 0
+
+    def tearDown(self):
+        transport.backoff_delay = self.backoff_delay
+        self.pool.close()
+        self.server.stop()
+
+    def retries(self, name):
+        return dict((summary[0], summary[2]) for summary in self.connector.stats.summary())[name]
+
+    def match(self, running_session):
+        return self.connector.match_window(running_session, '\x00\x00\x00\x0f{"tag": "Step"}')
+
+    def test_a_request_answered_with_503_is_sent_again(self):
+        self.server.fail_next(2, 503)
+        self.connector.start_session(START_INFO)
+        self.assertEqual(self.retries('start_session'), 2)
+
+    def test_a_match_answered_by_a_gateway_error_is_not_sent_again(self):
+        running_session = self.connector.start_session(START_INFO)
+        self.server.fail_next(1, 502)
+        self.assertRaises(requests.HTTPError, self.match, running_session)
+        self.assertEqual(self.retries('match_window'), 0)
+
+    def test_a_match_whose_connection_dropped_is_not_sent_again(self):
+        running_session = self.connector.start_session(START_INFO)
+        self.server.fail_next(1, DROP)
+        requests_sent = self.server.requests
+        self.assertRaises(requests.ConnectionError, self.match, running_session)
+        self.assertEqual(self.server.requests - requests_sent, 1)
+
+    def test_closing_a_session_is_sent_again_after_a_gateway_error_or_a_dropped_connection(self):
+        running_session = self.connector.start_session(START_INFO)
+        self.match(running_session)
+        self.server.fail_next(1, 504)
+        self.server.fail_next(1, DROP)
+        results = self.connector.stop_session(running_session, False, False)
+        self.assertEqual(results.steps, 1)
+        self.assertEqual(self.retries('stop_session'), 2)
+
+    def test_a_request_that_could_not_connect_is_sent_again(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        connector = PooledAgentConnector(self.pool, 'http://127.0.0.1:%d' % port)
+        self.assertRaises(requests.ConnectionError, connector.start_session, START_INFO)
+        self.assertEqual(connector.stats.summary()[0][1:3], (1, 3))
+
+    def test_a_closed_pool_connects_again(self):
+        running_session = self.connector.start_session(START_INFO)
+        self.pool.close()
+        self.assertTrue(self.match(running_session))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2013-2014 NaviNet Inc.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import base64
+import unittest
+from support import ScreenshotDriver, library, png, start_server
+from applitools import _viewport_size
+from applitools.errors import EyesError
+from RobotAppEyes.timing import CAPTURE, SESSION, UPLOAD_AND_MATCH
+from RobotAppEyes.viewports import parse_sizes, size_name
+
+
+class ResizableDriver(ScreenshotDriver):
+    """
+    A fake browser whose viewport is the size of its window, with a screenshot of that size.
+    """
+
+    def execute_script(self, script, *args):
+        if 'innerHeight' in script and 'innerWidth' in script or 'var height = undefined' in script:
+            return [self.width, self.height]
+        return ScreenshotDriver.execute_script(self, script, *args)
+
+    def set_window_size(self, width, height):
+        self.width, self.height = width, height
+        self._screenshot64 = base64.b64encode(png(width, height))
+
+    def get_window_size(self):
+        return {'width': self.width, 'height': self.height}
+
+
+class NoSleep(object):
+
+    @staticmethod
+    def sleep(seconds):
+        pass
+
+
+class ViewportsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = start_server()
+        self.driver = ResizableDriver(800, 600)
+        self.library, self.builtin = library(self.driver)
+        # The SDK waits a second for the browser after each resize.
+        self.time, _viewport_size.time = _viewport_size.time, NoSleep
+
+    def tearDown(self):
+        _viewport_size.time = self.time
+        self.server.stop()
+
+    def test_each_size_is_checked_in_a_session_of_its_own(self):
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url)
+        self.library.check_eyes_window_at_viewports('Home', '1024x768, 375x667')
+        self.library.close_eyes_session()
+        sizes = sorted((session.start_info['environment']['displaySize']['width'], session.tags)
+                       for session in self.server.stopped)
+        self.assertEqual(sizes, [(375, ['Home']), (1024, ['Home'])])
+        self.assertEqual(self.driver.get_window_size(), {'width': 800, 'height': 600})
+
+    def test_the_sizes_share_a_batch_without_changing_the_session(self):
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url)
+        session = self.library._sessions.current
+        self.library.check_eyes_window_at_viewports('Home', '1024x768, 375x667')
+        self.assertIsNone(session.eyes.batch)
+        self.library.close_eyes_session()
+        batches = set(session.start_info['batchInfo']['id'] for session in self.server.stopped
+                      if session.tags == ['Home'])
+        self.assertEqual(len(batches), 1)
+
+    def test_the_sizes_are_reported_in_the_batch_of_the_session(self):
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url)
+        self.library.check_eyes_window('Home')
+        session = self.library._sessions.current
+        batch = session.eyes.batch
+        self.library.check_eyes_window_at_viewports('Home', '1024x768, 375x667')
+        self.assertIs(session.eyes.batch, batch)
+        self.library.close_eyes_session()
+        batches = set(session.start_info['batchInfo']['id'] for session in self.server.stopped)
+        self.assertEqual(batches, set([batch.id_]))
+
+    def test_the_keyword_is_timed_as_one_check(self):
+        self.library.open_eyes_session('app', 'test', 'key', serverUrl=self.server.url, timing=True)
+        session = self.library._sessions.current
+        self.library.check_eyes_window_at_viewports('Home', '1024x768, 375x667')
+        self.library.close_eyes_session()
+        checks, total, phases = session.timing.summary()
+        self.assertEqual(checks, 1)
+        self.assertEqual(session.timing.records[0].keyword, 'Check Eyes Window At Viewports')
+        for name in (CAPTURE, SESSION, UPLOAD_AND_MATCH):
+            self.assertGreater(phases[name], 0)
+
+    def test_parse_sizes(self):
+        self.assertEqual(parse_sizes('1024x768, 375 X 667'), [{'width': 1024, 'height': 768},
+                                                               {'width': 375, 'height': 667}])
+        self.assertEqual(parse_sizes(['1280*800']), [{'width': 1280, 'height': 800}])
+        self.assertEqual(size_name({'width': 1280, 'height': 800}), '1280x800')
+        self.assertRaises(EyesError, parse_sizes, '12x')
+        self.assertRaises(EyesError, parse_sizes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
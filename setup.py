@@ -52,6 +52,7 @@ setup(name='Robot-AppEyes',
           'eyes-selenium >= 3.2'
       ],
       packages=['RobotAppEyes'],
+      scripts=['scripts/robotappeyes-upload'],
       data_files=[('AppEyesTests', ['Tests/acceptance/RobotAppEyesTest.txt', 'Tests/acceptance/pictureOne.png',
                                     'Tests/acceptance/pictureTwo.png', 'doc/RobotAppEyes-KeywordDocumentation.html',
                                     'doc/ChangeLog.txt'])],